@@ -43,6 +43,8 @@ async def lifespan(app: FastAPI):
         from services.docker_service import docker_service
         from services.websocket_service import connection_manager
         from services.monitoring_service import monitoring_service
+        from services.system_sampler import system_sampler
+        from services.traffic_service import traffic_service
         from database.connection import init_db
 
         # Inicializar banco de dados
@@ -53,9 +55,11 @@ async def lifespan(app: FastAPI):
         security = SecurityValidator()
 
         # Inicializar serviços
+        await system_sampler.start()
         await ssh_service.start_service()
         await docker_service.start_service()
         await monitoring_service.start_service()
+        await traffic_service.start_service()
 
         logger.info("✅ Banco de dados PostgreSQL conectado")
         logger.info("✅ Sistema de segurança inicializado")
@@ -78,6 +82,8 @@ async def lifespan(app: FastAPI):
         await ssh_service.stop_service()
         await docker_service.stop_service()
         await monitoring_service.stop_service()
+        await traffic_service.stop_service()
+        await system_sampler.stop()
         await connection_manager.cleanup()
         logger.info("✅ Serviço SSH finalizado")
         logger.info("✅ Serviço Docker finalizado")
@@ -119,6 +125,7 @@ from routes.monitoring_routes import router as monitoring_router
 from routes.config_routes import router as config_router
 from routes.claude_routes import router as claude_router
 from routes.git_routes import router as git_router
+from routes.metrics_routes import router as metrics_router
 
 app.include_router(nginx_router, prefix="/nginx", tags=["Nginx Operations"])
 app.include_router(ssl_router, prefix="/ssl", tags=["SSL Operations"])
@@ -133,6 +140,7 @@ app.include_router(monitoring_router, prefix="/monitoring", tags=["Advanced Moni
 app.include_router(config_router, tags=["Configuration Generation"])
 app.include_router(claude_router, tags=["Claude Code AI"])
 app.include_router(git_router, tags=["Git Operations"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 @app.get("/", response_model=dict)
 async def root():
@@ -178,5 +186,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=port,
         reload=debug,
-        log_level="info" if debug else "warning"
+        log_level="info" if debug else "warning",
+        # Compressão permessage-deflate dos frames WebSocket (negociada com o navegador)
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
     )
\ No newline at end of file
@@ -200,6 +200,12 @@ class LogsRequest(BaseModel):
     until: Optional[str] = Field(default=None, description="Logs até timestamp")
     follow: bool = Field(default=False, description="Seguir logs (stream)")
 
+class LogStreamRequest(LogsRequest):
+    """Requisição de leitura paginada de logs (NDJSON)"""
+    cursor: Optional[str] = Field(default=None, description="Cursor retornado pela página anterior")
+    limit: Optional[int] = Field(default=1000, ge=1, description="Máximo de linhas na página (None = sem limite)")
+    pattern: Optional[str] = Field(default=None, description="Expressão regular aplicada às mensagens")
+
 # ===========================
 # MODELOS DE RESPOSTA
 # ===========================
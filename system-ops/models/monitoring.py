@@ -101,13 +101,14 @@ class AlertRule(BaseModel):
     id: str = Field(..., description="ID único da regra")
     name: str = Field(..., description="Nome da regra")
     description: str = Field(..., description="Descrição da regra")
-    metric: str = Field(..., description="Métrica a ser monitorada")
+    metric: str = Field(..., description="Métrica a ser monitorada (aceita glob, ex.: docker.container.*.cpu_percent)")
     condition: str = Field(..., description="Condição do alerta (>, <, ==, etc)")
     threshold: float = Field(..., description="Valor limite")
     severity: AlertSeverity = Field(..., description="Severidade do alerta")
     enabled: bool = Field(default=True, description="Se a regra está ativa")
     duration: int = Field(default=60, description="Duração em segundos antes de disparar")
     labels: Dict[str, str] = Field(default_factory=dict, description="Labels adicionais")
+    match_labels: Dict[str, str] = Field(default_factory=dict, description="Filtro por labels da métrica (glob), ex.: {'container': 'web-*'}")
 
 class Alert(BaseModel):
     """Alerta ativo"""
@@ -173,6 +174,8 @@ class MetricsRequest(BaseModel):
     metrics: Optional[List[str]] = Field(default=None, description="Métricas específicas")
     labels: Optional[Dict[str, str]] = Field(default=None, description="Filtros por label")
     step: Optional[int] = Field(default=60, description="Intervalo entre pontos em segundos")
+    max_points: Optional[int] = Field(default=None, ge=1, description="Máximo de pontos por série (aumenta o step se necessário)")
+    aggregation: Literal["avg", "min", "max", "last"] = Field(default="avg", description="Agregação usada ao reduzir a resolução")
 
 class AlertsRequest(BaseModel):
     """Requisição para listar alertas"""
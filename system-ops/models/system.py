@@ -3,7 +3,10 @@ NetPilot System Operations - System Models
 """
 
 from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field
+import ipaddress
+import re
+
+from pydantic import BaseModel, Field, validator
 from datetime import datetime
 from enum import Enum
 
@@ -189,6 +192,81 @@ class TrafficRule(BaseModel):
     comment: Optional[str] = Field(None, description="Comentário")
     expires_at: Optional[datetime] = Field(None, description="Data de expiração")
 
+    # Os campos vão para o texto do iptables-restore / nft -f: só valores conhecidos
+    @validator('protocol')
+    def validate_protocol(cls, v):
+        v = v.strip().lower()
+        if v not in TRAFFIC_PROTOCOLS:
+            raise ValueError(f"Protocolo inválido: {v} (use {', '.join(TRAFFIC_PROTOCOLS)})")
+        return v
+
+    @validator('source_ip', 'destination_ip')
+    def validate_address(cls, v):
+        if v is None:
+            return v
+        try:
+            ipaddress.ip_network(v.strip(), strict=False)
+        except ValueError:
+            raise ValueError(f"Endereço IP inválido: {v}")
+        return v.strip()
+
+    @validator('source_port', 'destination_port')
+    def validate_port(cls, v):
+        if v is not None and not 1 <= v <= 65535:
+            raise ValueError(f"Porta inválida: {v}")
+        return v
+
+    @validator('rate_limit')
+    def validate_rate_limit(cls, v):
+        """requests_per_minute e burst, quando presentes, são inteiros positivos"""
+        if v is None:
+            return v
+        normalized = dict(v)
+        for key in ("requests_per_minute", "burst"):
+            if key not in v:
+                continue
+            value = v[key]
+            if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit() \
+                    or int(value) < 1:
+                raise ValueError(f"rate_limit.{key} inválido: {value!r} (use um inteiro positivo)")
+            normalized[key] = int(value)
+        return normalized
+
+    @validator('redirect_to')
+    def validate_redirect_to(cls, v):
+        """IP, IP:porta ou [IPv6]:porta, normalizados"""
+        if v is None:
+            return v
+        match = _REDIRECT_TARGET.match(v.strip())
+        try:
+            if not match:
+                raise ValueError
+            address = ipaddress.ip_address(match.group("v6") or match.group("address"))
+            port = int(match.group("port")) if match.group("port") else None
+            if port is not None and not 1 <= port <= 65535:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Destino de redirecionamento inválido: {v}")
+        if port is None:
+            return str(address)
+        return f"[{address}]:{port}" if address.version == 6 else f"{address}:{port}"
+
+
+TRAFFIC_PROTOCOLS = ("tcp", "udp", "icmp", "icmpv6", "sctp", "all")
+
+# 10.0.0.1, 10.0.0.1:8080, 2001:db8::1, [2001:db8::1]:8080
+_REDIRECT_TARGET = re.compile(
+    r"^(?:\[(?P<v6>[0-9A-Fa-f:.]+)\]|(?P<address>[0-9.]+|[0-9A-Fa-f:.]*:[0-9A-Fa-f:.]*))"
+    r"(?::(?P<port>\d{1,5}))?$"
+)
+
+
+class IpBlockRequest(BaseModel):
+    """Bloqueio/desbloqueio de IPs em lote"""
+    ip_addresses: List[str] = Field(..., description="IPs ou redes CIDR")
+    duration_minutes: Optional[int] = Field(None, description="Duração do bloqueio (sem valor = permanente)")
+    reason: str = Field(default="Manual block", description="Motivo do bloqueio")
+
 
 class TrafficStats(BaseModel):
     """Estatísticas de tráfego"""
@@ -4,7 +4,9 @@ Endpoints para gerenciamento de Docker no NetPilot
 """
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+import json
 import logging
 
 from models.docker import (
@@ -19,6 +21,7 @@ from models.docker import (
     ContainerStats,
     LogEntry,
     LogsRequest,
+    LogStreamRequest,
 
     # Image models
     ImageInfo,
@@ -208,6 +211,58 @@ async def get_container_logs(
         logger.error(f"Erro ao obter logs do container {container_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/containers/{container_id}/logs/stream")
+async def stream_container_logs(
+    container_id: str,
+    stdout: bool = Query(default=True, description="Incluir stdout"),
+    stderr: bool = Query(default=True, description="Incluir stderr"),
+    tail: Optional[int] = Query(default=None, description="Últimas N linhas"),
+    since: Optional[str] = Query(default=None, description="Logs desde timestamp (epoch ou ISO 8601)"),
+    until: Optional[str] = Query(default=None, description="Logs até timestamp (epoch ou ISO 8601)"),
+    follow: bool = Query(default=False, description="Seguir logs até atingir o limite"),
+    cursor: Optional[str] = Query(default=None, description="Cursor retornado pela página anterior"),
+    limit: int = Query(default=1000, ge=1, le=100000, description="Máximo de linhas na página"),
+    pattern: Optional[str] = Query(default=None, description="Expressão regular aplicada às mensagens")
+):
+    """Logs do container em NDJSON, paginados por cursor
+
+    Cada linha é {timestamp, stream, message, cursor}; a última é
+    {type: "page", next_cursor, has_more, returned, scanned}.
+    """
+    try:
+        logs_request = LogStreamRequest(
+            stdout=stdout,
+            stderr=stderr,
+            tail=tail,
+            since=since,
+            until=until,
+            follow=follow,
+            cursor=cursor,
+            limit=limit,
+            pattern=pattern
+        )
+        reader = await docker_service.open_container_logs(container_id, logs_request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao abrir logs do container {container_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def lines():
+        try:
+            async for record in reader.records():
+                yield json.dumps(record) + "\n"
+            yield json.dumps(reader.summary()) + "\n"
+        except Exception as e:
+            logger.error(f"Erro no stream de logs do container {container_id}: {e}")
+            yield json.dumps({**reader.summary(), "type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/containers/{container_id}/stats", response_model=ContainerStats)
 async def get_container_stats(container_id: str):
     """Obtém estatísticas de um container"""
@@ -218,6 +273,24 @@ async def get_container_stats(container_id: str):
         logger.error(f"Erro ao obter estatísticas do container {container_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/containers/{container_id}/stats/stream")
+async def stream_container_stats(container_id: str):
+    """Estatísticas do container em tempo real (Server-Sent Events, ~1 Hz)"""
+    async def events():
+        try:
+            async for stats in docker_service.stream_container_stats(container_id):
+                yield f"event: stats\ndata: {json.dumps(stats.dict())}\n\n"
+            yield "event: end\ndata: {}\n\n"
+        except Exception as e:
+            logger.error(f"Erro no stream de estatísticas do container {container_id}: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ===========================
 # IMAGE ENDPOINTS
 # ===========================
@@ -264,6 +337,38 @@ async def pull_image(
         logger.error(f"Erro ao fazer pull da imagem: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/images/pull/stream")
+async def pull_image_stream(pull_request: ImagePullRequest):
+    """Pull com progresso por camada (Server-Sent Events)
+
+    Eventos: snapshot, layer, status e por fim done ou error. Pedidos da mesma
+    imagem acompanham um único pull; sair do stream não cancela o pull.
+    """
+    try:
+        pull = docker_service.start_image_pull(pull_request)
+    except Exception as e:
+        logger.error(f"Erro ao iniciar pull da imagem: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        async for event in pull.follow():
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/images/pulls", response_model=dict)
+async def list_image_pulls():
+    """Pulls em andamento e concluídos recentemente"""
+    try:
+        return docker_service.image_pulls.get_status()
+    except Exception as e:
+        logger.error(f"Erro ao obter status dos pulls: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/images/{image_id}", response_model=DockerOperationResponse)
 async def remove_image(
     image_id: str,
@@ -515,6 +620,24 @@ async def docker_system_info():
         logger.error(f"Erro ao obter informações do sistema Docker: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/engine/metrics", response_model=dict)
+async def docker_engine_metrics():
+    """Obtém latência por chamada à API Docker e ocupação do executor"""
+    try:
+        return docker_service.get_engine_metrics()
+    except Exception as e:
+        logger.error(f"Erro ao obter métricas do executor Docker: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/inventory/status", response_model=dict)
+async def docker_inventory_status():
+    """Obtém o estado do inventário de containers alimentado por eventos"""
+    try:
+        return docker_service.get_inventory_status()
+    except Exception as e:
+        logger.error(f"Erro ao obter estado do inventário Docker: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/system/prune", response_model=DockerOperationResponse)
 async def docker_system_prune(
     background_tasks: BackgroundTasks,
@@ -0,0 +1,22 @@
+"""
+Rotas de exposição de métricas
+Endpoint /metrics no formato OpenMetrics para scraping pelo Prometheus
+"""
+
+import logging
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from services.metrics_exporter import metrics_exporter, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+@router.get("/metrics", response_class=Response)
+async def metrics():
+    """Exposição das métricas coletadas em formato OpenMetrics"""
+    try:
+        return Response(content=metrics_exporter.render(), media_type=CONTENT_TYPE)
+    except Exception as e:
+        logger.error(f"Erro ao gerar exposição de métricas: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,7 +3,7 @@ NetPilot System Operations - System Routes
 Endpoints para operações gerais do sistema
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field
 import logging
@@ -36,19 +36,25 @@ def get_system_service() -> SystemService:
     return SystemService()
 
 @router.get("/health", response_model=SystemHealth)
-async def get_health(service: SystemService = Depends(get_system_service)):
+async def get_health(
+    fresh: bool = Query(default=False, description="Aguardar a próxima amostra de recursos"),
+    service: SystemService = Depends(get_system_service)
+):
     """Obter health check completo do sistema"""
     try:
-        return await service.get_health()
+        return await service.get_health(fresh=fresh)
     except Exception as e:
         logger.error(f"Erro ao obter health check: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/resources", response_model=SystemResources)
-async def get_resources(service: SystemService = Depends(get_system_service)):
+async def get_resources(
+    fresh: bool = Query(default=False, description="Aguardar a próxima amostra de recursos"),
+    service: SystemService = Depends(get_system_service)
+):
     """Obter recursos detalhados do sistema"""
     try:
-        return await service.get_resources()
+        return await service.get_resources(fresh=fresh)
     except Exception as e:
         logger.error(f"Erro ao obter recursos: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -7,8 +7,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Dict, Any
 import logging
 
-from models.system import TrafficRule, TrafficStats
-from services.traffic_service import TrafficService
+from models.system import TrafficRule, TrafficStats, IpBlockRequest
+from services.traffic_service import TrafficService, traffic_service
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +16,7 @@ router = APIRouter()
 
 # Dependency para obter instância do serviço
 def get_traffic_service() -> TrafficService:
-    return TrafficService()
+    return traffic_service
 
 @router.post("/setup-rules", response_model=Dict[str, Any])
 async def setup_traffic_rules(
@@ -44,6 +44,57 @@ async def block_ip(
         logger.error(f"Erro ao bloquear IP: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/block-ips", response_model=Dict[str, Any])
+async def block_ips(
+    request: IpBlockRequest,
+    service: TrafficService = Depends(get_traffic_service)
+):
+    """Bloquear IPs/redes em lote (uma única transação ipset)"""
+    try:
+        return await service.block_ips(request.ip_addresses, request.duration_minutes, request.reason)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao bloquear IPs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/unblock-ip", response_model=Dict[str, Any])
+async def unblock_ip(
+    ip_address: str,
+    service: TrafficService = Depends(get_traffic_service)
+):
+    """Desbloquear endereço IP"""
+    try:
+        return await service.unblock_ips([ip_address])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao desbloquear IP: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/unblock-ips", response_model=Dict[str, Any])
+async def unblock_ips(
+    request: IpBlockRequest,
+    service: TrafficService = Depends(get_traffic_service)
+):
+    """Desbloquear IPs/redes em lote"""
+    try:
+        return await service.unblock_ips(request.ip_addresses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao desbloquear IPs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/blocked-ips", response_model=List[Dict[str, Any]])
+async def list_blocked_ips(service: TrafficService = Depends(get_traffic_service)):
+    """Listar IPs bloqueados"""
+    try:
+        return await service.list_blocked_ips()
+    except Exception as e:
+        logger.error(f"Erro ao listar IPs bloqueados: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/rate-limit", response_model=Dict[str, Any])
 async def setup_rate_limiting(
     ip_address: str,
@@ -69,6 +120,22 @@ async def get_traffic_stats(service: TrafficService = Depends(get_traffic_servic
         logger.error(f"Erro ao obter estatísticas de tráfego: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/top-talkers", response_model=Dict[str, Any])
+async def get_top_talkers(
+    dimension: str = "ip",
+    window: str = "5m",
+    limit: int = 10,
+    service: TrafficService = Depends(get_traffic_service)
+):
+    """Top talkers na janela 1m, 5m ou 1h: conexões por IP (ip) e porta (port), requisições por IP (http_ip) e caminho (path)"""
+    try:
+        return await service.get_top_talkers(dimension, window, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao obter top talkers: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/rules", response_model=List[TrafficRule])
 async def list_active_rules(service: TrafficService = Depends(get_traffic_service)):
     """Listar regras de tráfego ativas"""
@@ -4,10 +4,13 @@ Endpoints WebSocket para logs Docker, métricas do sistema e eventos
 """
 
 import logging
+import shlex
+from typing import Literal, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.responses import HTMLResponse
 
 from services.websocket_service import connection_manager
+from services.docker_service import docker_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -17,10 +20,11 @@ router = APIRouter()
 # ===========================
 
 @router.websocket("/docker/logs/{container_id}")
-async def websocket_docker_logs(websocket: WebSocket, container_id: str):
-    """WebSocket para streaming de logs de container em tempo real"""
+async def websocket_docker_logs(websocket: WebSocket, container_id: str, since_seq: Optional[int] = None,
+                                encoding: Literal["json", "msgpack"] = "json"):
+    """WebSocket para streaming de logs de container em tempo real (since_seq retoma após reconexão)"""
     try:
-        await connection_manager.connect_docker_logs(websocket, container_id)
+        await connection_manager.connect_docker_logs(websocket, container_id, since_seq, encoding)
 
         # Manter conexão ativa
         while True:
@@ -38,10 +42,11 @@ async def websocket_docker_logs(websocket: WebSocket, container_id: str):
         logger.info(f"🔌 WebSocket desconectado dos logs do container {container_id}")
 
 @router.websocket("/system/metrics")
-async def websocket_system_metrics(websocket: WebSocket):
-    """WebSocket para streaming de métricas do sistema em tempo real"""
+async def websocket_system_metrics(websocket: WebSocket, encoding: Literal["json", "msgpack"] = "json",
+                                   delta: bool = False):
+    """WebSocket para streaming de métricas do sistema em tempo real (delta=true envia só o que mudou)"""
     try:
-        await connection_manager.connect_system_metrics(websocket)
+        await connection_manager.connect_system_metrics(websocket, encoding, delta)
 
         # Manter conexão ativa
         while True:
@@ -59,10 +64,10 @@ async def websocket_system_metrics(websocket: WebSocket):
         logger.info("🔌 WebSocket desconectado das métricas do sistema")
 
 @router.websocket("/docker/events")
-async def websocket_docker_events(websocket: WebSocket):
+async def websocket_docker_events(websocket: WebSocket, encoding: Literal["json", "msgpack"] = "json"):
     """WebSocket para streaming de eventos do Docker em tempo real"""
     try:
-        await connection_manager.connect_docker_events(websocket)
+        await connection_manager.connect_docker_events(websocket, encoding)
 
         # Manter conexão ativa
         while True:
@@ -79,6 +84,45 @@ async def websocket_docker_events(websocket: WebSocket):
         await connection_manager.disconnect_docker_events(websocket)
         logger.info("🔌 WebSocket desconectado dos eventos do Docker")
 
+@router.websocket("/stream")
+async def websocket_stream(websocket: WebSocket, encoding: Literal["json", "msgpack"] = "json",
+                           delta: bool = False):
+    """WebSocket multiplexado: o cliente inscreve-se em tópicos (logs:<id>, stats:<id>, metrics, events)"""
+    await websocket.accept()
+    try:
+        connection_manager.open_stream(websocket, encoding, delta)
+        while True:
+            try:
+                data = await websocket.receive_text()
+            except WebSocketDisconnect:
+                break
+            await connection_manager.handle_stream_message(websocket, data)
+
+    except Exception as e:
+        logger.error(f"❌ Erro no WebSocket multiplexado: {e}")
+    finally:
+        connection_manager.detach(websocket)
+        logger.info("🔌 WebSocket multiplexado desconectado")
+
+@router.websocket("/docker/exec/{container_id}")
+async def websocket_docker_exec(websocket: WebSocket, container_id: str, cmd: str = "/bin/sh",
+                                user: Optional[str] = None, workdir: Optional[str] = None,
+                                cols: int = 80, rows: int = 24):
+    """Exec interativo com TTY: frames binários são stdin/stdout, texto JSON é controle (resize)"""
+    await websocket.accept()
+    try:
+        await docker_service.exec_sessions.run(
+            websocket, container_id, shlex.split(cmd), user=user, workdir=workdir, cols=cols, rows=rows
+        )
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"❌ Erro no exec interativo do container {container_id}: {e}")
+        try:
+            await websocket.close(code=1011, reason=str(e)[:120])
+        except Exception:
+            pass
+
 # ===========================
 # PÁGINAS DE TESTE
 # ===========================
@@ -145,7 +189,11 @@ async def test_docker_logs_page(container_id: str):
 
                 ws.onmessage = function(event) {{
                     const data = JSON.parse(event.data);
-                    addLog(data.message, 'log', data.timestamp);
+                    if (data.type === 'docker_logs') {{
+                        data.lines.forEach(line => addLog(line.message, 'log', line.timestamp));
+                    }} else {{
+                        addLog(data.message, 'log', data.timestamp);
+                    }}
                 }};
 
                 ws.onclose = function(event) {{
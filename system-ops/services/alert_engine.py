@@ -0,0 +1,190 @@
+"""
+Motor de avaliação de alertas
+Regras indexadas por métrica e avaliadas a cada ponto recebido, com estado
+incremental de "condição mantida desde" em vez de reler o histórico
+"""
+
+import fnmatch
+import logging
+import operator
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+from models.monitoring import Alert, AlertRule, AlertStatus
+from services.metrics_exporter import parse_metric_name
+
+logger = logging.getLogger(__name__)
+
+CONDITIONS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class RuleState:
+    """Estado incremental de uma regra para uma métrica"""
+
+    __slots__ = ("held_since", "last_seen")
+
+    def __init__(self):
+        self.held_since: Optional[float] = None
+        self.last_seen = 0.0
+
+
+class AlertEngine:
+    """Avalia regras de alerta conforme os pontos chegam"""
+
+    def __init__(self):
+        self.rules: Dict[str, AlertRule] = {}
+        self.active_alerts: Dict[str, Alert] = {}
+
+        # metric exata -> regras; regras com glob no nome da métrica
+        self._exact_index: Dict[str, List[AlertRule]] = {}
+        self._glob_rules: List[Tuple[AlertRule, Pattern]] = []
+        # métrica -> (regras aplicáveis, labels extraídos do nome), resolvido uma vez
+        self._resolved: Dict[str, Tuple[List[AlertRule], Dict[str, str]]] = {}
+        # (rule_id, métrica) -> estado
+        self._states: Dict[Tuple[str, str], RuleState] = {}
+
+        self.samples_evaluated = 0
+
+    # ===========================
+    # REGRAS
+    # ===========================
+
+    def add_rule(self, rule: AlertRule):
+        """Adiciona ou substitui uma regra"""
+        if rule.condition not in CONDITIONS:
+            raise ValueError(f"Condição inválida: {rule.condition}")
+        self.rules[rule.id] = rule
+        self._rebuild_index()
+
+    def remove_rule(self, rule_id: str) -> List[Alert]:
+        """Remove uma regra e seu estado; retorna os alertas dela, resolvidos"""
+        self.rules.pop(rule_id, None)
+        for key in [key for key in self._states if key[0] == rule_id]:
+            del self._states[key]
+        self._rebuild_index()
+        return [self._resolve(alert_key) for alert_key, alert in list(self.active_alerts.items())
+                if alert.rule_id == rule_id]
+
+    def _rebuild_index(self):
+        self._exact_index = {}
+        self._glob_rules = []
+        for rule in self.rules.values():
+            if GLOB_CHARS.search(rule.metric):
+                self._glob_rules.append((rule, re.compile(fnmatch.translate(rule.metric))))
+            else:
+                self._exact_index.setdefault(rule.metric, []).append(rule)
+        self._resolved.clear()
+
+    def rules_for(self, metric_name: str) -> Tuple[List[AlertRule], Dict[str, str]]:
+        """Regras aplicáveis à métrica (cacheado por métrica)"""
+        resolved = self._resolved.get(metric_name)
+        if resolved is not None:
+            return resolved
+
+        _, labels = parse_metric_name(metric_name)
+        candidates = list(self._exact_index.get(metric_name, []))
+        candidates.extend(rule for rule, pattern in self._glob_rules if pattern.match(metric_name))
+        rules = [rule for rule in candidates if self._labels_match(rule, labels)]
+
+        resolved = self._resolved[metric_name] = (rules, labels)
+        return resolved
+
+    @staticmethod
+    def _labels_match(rule: AlertRule, labels: Dict[str, str]) -> bool:
+        for key, pattern in rule.match_labels.items():
+            value = labels.get(key)
+            if value is None or not fnmatch.fnmatchcase(value, pattern):
+                return False
+        return True
+
+    # ===========================
+    # AVALIAÇÃO
+    # ===========================
+
+    def observe(self, metric_name: str, value: float, timestamp: float) -> List[Alert]:
+        """Avalia as regras da métrica para um novo ponto; retorna alertas que mudaram"""
+        rules, labels = self.rules_for(metric_name)
+        if not rules:
+            return []
+
+        self.samples_evaluated += 1
+        changed = []
+        for rule in rules:
+            if not rule.enabled:
+                continue
+
+            key = (rule.id, metric_name)
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = RuleState()
+            state.last_seen = timestamp
+
+            alert_key = f"{rule.id}_{metric_name}"
+            if CONDITIONS[rule.condition](value, rule.threshold):
+                if state.held_since is None:
+                    state.held_since = timestamp
+                if alert_key not in self.active_alerts and timestamp - state.held_since >= rule.duration:
+                    alert = self._fire(rule, alert_key, value, labels)
+                    changed.append(alert)
+            else:
+                state.held_since = None
+                if alert_key in self.active_alerts:
+                    changed.append(self._resolve(alert_key))
+
+        return changed
+
+    def expire(self, now: float, max_age: float) -> List[Alert]:
+        """Resolve alertas de métricas que deixaram de ser coletadas (ex.: container removido)"""
+        changed = []
+        for key, state in list(self._states.items()):
+            if now - state.last_seen <= max_age:
+                continue
+            del self._states[key]
+            alert_key = f"{key[0]}_{key[1]}"
+            if alert_key in self.active_alerts:
+                changed.append(self._resolve(alert_key))
+        return changed
+
+    def _fire(self, rule: AlertRule, alert_key: str, value: float, labels: Dict[str, str]) -> Alert:
+        alert = Alert(
+            id=alert_key,
+            rule_id=rule.id,
+            rule_name=rule.name,
+            message=f"{rule.description} - Current: {value:.2f}, Threshold: {rule.threshold}",
+            severity=rule.severity,
+            status=AlertStatus.ACTIVE,
+            started_at=datetime.now(),
+            current_value=value,
+            threshold=rule.threshold,
+            labels={**labels, **rule.labels}
+        )
+        self.active_alerts[alert_key] = alert
+        logger.warning(f"🚨 Novo alerta: {alert.message}")
+        return alert
+
+    def _resolve(self, alert_key: str) -> Alert:
+        alert = self.active_alerts.pop(alert_key)
+        alert.status = AlertStatus.RESOLVED
+        alert.resolved_at = datetime.now()
+        logger.info(f"✅ Alerta resolvido: {alert.message}")
+        return alert
+
+    def get_status(self) -> Dict[str, int]:
+        return {
+            "rules": len(self.rules),
+            "exact_metrics": len(self._exact_index),
+            "glob_rules": len(self._glob_rules),
+            "tracked_series": len(self._states),
+            "active_alerts": len(self.active_alerts),
+            "samples_evaluated": self.samples_evaluated
+        }
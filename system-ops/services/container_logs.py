@@ -0,0 +1,268 @@
+"""
+Leitura de logs de containers em stream
+Lê o stream bruto do daemon, separa os frames de stdout/stderr, pagina por
+cursor e filtra por regex sem carregar o log inteiro em memória
+"""
+
+import calendar
+import logging
+import os
+import re
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Pattern, Tuple
+
+from docker.types.daemon import CancellableStream
+
+from models.docker import LogsRequest
+from services.docker_engine import DockerEngine
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalho dos frames multiplexados: tipo (1 byte), 3 bytes nulos, tamanho big-endian
+FRAME_HEADER = struct.Struct(">BxxxL")
+FRAME_STREAMS = {0: "stdout", 1: "stdout", 2: "stderr"}
+
+# Uma linha sem '\n' maior que isso é emitida em pedaços (memória constante)
+LOG_MAX_LINE_BYTES = int(os.getenv("LOG_MAX_LINE_BYTES", "262144"))
+LOG_READ_CHUNK = 65536
+
+NS_PER_SECOND = 1_000_000_000
+
+
+def parse_log_time(value: str) -> str:
+    """Converte since/until (epoch ou ISO 8601) no formato aceito pelo daemon"""
+    value = value.strip()
+    try:
+        float(value)
+        return value
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Timestamp inválido: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return f"{parsed.timestamp():.6f}"
+
+
+def format_cursor(timestamp_ns: int, skip: int) -> str:
+    """Cursor opaco: timestamp da última linha e quantas linhas com ele já foram lidas"""
+    return f"{timestamp_ns}-{skip}"
+
+
+def parse_cursor(cursor: str) -> Tuple[int, int]:
+    timestamp_ns, sep, skip = cursor.partition("-")
+    if not sep or not timestamp_ns.isdigit() or not skip.isdigit():
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return int(timestamp_ns), int(skip)
+
+
+class LogTimestampParser:
+    """Converte o prefixo RFC3339Nano do daemon em nanossegundos desde a epoch
+
+    Linhas do mesmo segundo reaproveitam a conversão da parte inteira, que é a
+    parte cara; a fração é só preenchida até 9 dígitos.
+    """
+
+    def __init__(self):
+        self._second_text = ""
+        self._second_ns = 0
+
+    def parse(self, timestamp: str) -> Optional[int]:
+        if len(timestamp) < 20 or timestamp[4] != "-" or timestamp[10] != "T":
+            return None
+        second_text = timestamp[:19]
+        if second_text != self._second_text:
+            try:
+                seconds = calendar.timegm(time.strptime(second_text, "%Y-%m-%dT%H:%M:%S"))
+            except ValueError:
+                return None
+            self._second_text = second_text
+            self._second_ns = seconds * NS_PER_SECOND
+
+        fraction = timestamp[20:].rstrip("Z") if timestamp[19] == "." else ""
+        if fraction and not fraction.isdigit():
+            # Offsets diferentes de Z não são emitidos pelo daemon
+            return None
+        return self._second_ns + int(fraction[:9].ljust(9, "0") or 0)
+
+
+def iter_frames(read, tty: bool) -> Iterator[Tuple[str, bytes]]:
+    """Demultiplexa o corpo do /logs em (stream, bytes)
+
+    Com TTY o daemon não multiplexa: tudo chega como stdout, em blocos.
+    """
+    if tty:
+        while True:
+            data = read(LOG_READ_CHUNK)
+            if not data:
+                return
+            yield "stdout", data
+
+    while True:
+        header = read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        stream_type, length = FRAME_HEADER.unpack(header)
+        if not length:
+            continue
+        data = read(length)
+        if not data:
+            return
+        yield FRAME_STREAMS.get(stream_type, "stdout"), data
+
+
+def iter_lines(frames: Iterator[Tuple[str, bytes]]) -> Iterator[Tuple[str, str]]:
+    """Remonta linhas por stream (frames podem quebrar ou juntar linhas)"""
+    partial: Dict[str, bytes] = {}
+    for stream, data in frames:
+        data = partial.pop(stream, b"") + data
+        *lines, rest = data.split(b"\n")
+        for line in lines:
+            yield stream, line.decode("utf-8", errors="replace")
+        while len(rest) > LOG_MAX_LINE_BYTES:
+            yield stream, rest[:LOG_MAX_LINE_BYTES].decode("utf-8", errors="replace")
+            rest = rest[LOG_MAX_LINE_BYTES:]
+        if rest:
+            partial[stream] = rest
+
+    for stream, rest in partial.items():
+        yield stream, rest.decode("utf-8", errors="replace")
+
+
+class ContainerLogReader:
+    """Uma leitura paginada dos logs de um container
+
+    Validada na construção (regex, cursor, since/until), para que erros de
+    parâmetro apareçam antes de a resposta começar a ser enviada.
+    """
+
+    def __init__(self, engine: DockerEngine, api_client, container_id: str, tty: bool,
+                 request: LogsRequest, cursor: Optional[str] = None, limit: Optional[int] = None,
+                 pattern: Optional[str] = None):
+        self.engine = engine
+        self.api_client = api_client
+        self.container_id = container_id
+        self.tty = tty
+        self.request = request
+        self.limit = limit
+
+        try:
+            self.pattern: Optional[Pattern] = re.compile(pattern) if pattern else None
+        except re.error as e:
+            raise ValueError(f"Regex inválida: {e}")
+
+        self.cursor = parse_cursor(cursor) if cursor else None
+        self.since = parse_log_time(request.since) if request.since else None
+        self.until = parse_log_time(request.until) if request.until else None
+
+        # Estado da página, preenchido durante a leitura
+        self.scanned = 0
+        self.returned = 0
+        self.has_more = False
+        self.next_cursor: Optional[str] = cursor
+
+    def _params(self) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "stdout": int(self.request.stdout),
+            "stderr": int(self.request.stderr),
+            "timestamps": 1,
+            "follow": int(self.request.follow),
+            "tail": self.request.tail if self.request.tail is not None else "all",
+        }
+        since = self.since
+        if self.cursor:
+            cursor_since = f"{self.cursor[0] // NS_PER_SECOND}.{self.cursor[0] % NS_PER_SECOND:09d}"
+            if since is None or float(cursor_since) > float(since):
+                since = cursor_since
+            # Retomada por cursor ignora o tail: a página começa no cursor
+            params["tail"] = "all"
+        if since is not None:
+            params["since"] = since
+        if self.until is not None:
+            params["until"] = self.until
+        return params
+
+    def _open(self) -> CancellableStream:
+        """Abre o GET /logs bruto (executado na thread do stream)"""
+        api = self.api_client
+        # O SDK só expõe o conteúdo já sem o tipo de stream; lemos o corpo bruto
+        response = api._get(
+            api._url("/containers/{0}/logs", self.container_id),
+            params=self._params(),
+            stream=True,
+        )
+        api._raise_for_status(response)
+        if self.request.follow:
+            api._disable_socket_timeout(api._get_raw_response_socket(response))
+
+        raw = response.raw
+        read = getattr(raw, "read1", None) if self.tty else None
+        return CancellableStream(self._records(read or raw.read), response)
+
+    def _records(self, read) -> Iterator[Dict[str, Any]]:
+        """Linhas já filtradas e com cursor; para uma além do limite (has_more)"""
+        timestamps = LogTimestampParser()
+        cursor_ns, cursor_skip = self.cursor or (-1, 0)
+        last_ns, same_ns = -1, 0
+        at_cursor = 0
+        matched = 0
+
+        for stream, line in iter_lines(iter_frames(read, self.tty)):
+            line = line.rstrip("\r")
+            timestamp, _, message = line.partition(" ")
+            timestamp_ns = timestamps.parse(timestamp)
+            if timestamp_ns is None:
+                # Linha sem prefixo (não deveria ocorrer com timestamps=1)
+                timestamp, message, timestamp_ns = "", line, max(last_ns, 0)
+
+            # Posição da linha entre as de mesmo timestamp, para o cursor
+            if timestamp_ns == last_ns:
+                same_ns += 1
+            else:
+                last_ns, same_ns = timestamp_ns, 1
+
+            # Retomada: pular o que a página anterior já entregou
+            if timestamp_ns < cursor_ns:
+                continue
+            if timestamp_ns == cursor_ns:
+                at_cursor += 1
+                if at_cursor <= cursor_skip:
+                    continue
+
+            self.scanned += 1
+            if self.pattern is not None and not self.pattern.search(message):
+                continue
+
+            matched += 1
+            yield {
+                "timestamp": timestamp,
+                "stream": stream,
+                "message": message,
+                "cursor": format_cursor(timestamp_ns, same_ns),
+            }
+            if self.limit is not None and matched > self.limit:
+                return
+
+    async def records(self) -> AsyncIterator[Dict[str, Any]]:
+        """Linhas da página; ao final has_more e next_cursor ficam preenchidos"""
+        async for record in self.engine.stream("logs.read", self._open, maxsize=256):
+            if self.limit is not None and self.returned >= self.limit:
+                self.has_more = True
+                break
+            self.returned += 1
+            self.next_cursor = record["cursor"]
+            yield record
+
+    def summary(self) -> Dict[str, Any]:
+        """Último registro NDJSON da página"""
+        return {
+            "type": "page",
+            "next_cursor": self.next_cursor,
+            "has_more": self.has_more,
+            "returned": self.returned,
+            "scanned": self.scanned,
+        }
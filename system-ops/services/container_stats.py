@@ -0,0 +1,462 @@
+"""
+Coletor de estatísticas de containers
+Amostra todos os containers em paralelo: lê os arquivos do cgroup v2 quando
+acessíveis e recorre ao endpoint /stats do Docker para os demais
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import psutil
+from docker.errors import InvalidVersion, NotFound
+from docker.types.daemon import CancellableStream
+
+from models.docker import ContainerInfo, ContainerStats
+from services.docker_engine import DockerEngine
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = os.getenv("CGROUP_ROOT", "/sys/fs/cgroup")
+PROC_ROOT = os.getenv("PROC_ROOT", "/proc")
+
+# Layouts de cgroup v2 usados pelo Docker (driver systemd e cgroupfs)
+CGROUP_PATH_TEMPLATES = (
+    "{root}/system.slice/docker-{id}.scope",
+    "{root}/docker/{id}",
+)
+
+
+def cpu_percent_between(current: Dict, previous: Optional[Dict]) -> float:
+    """CPU entre duas amostras de cpu_stats, como o 'docker stats' (100% = um núcleo)
+
+    Usa online_cpus (presente também em cgroup v2, onde percpu_usage não existe).
+    """
+    if not previous:
+        return 0.0
+
+    usage_delta = current.get("cpu_usage", {}).get("total_usage", 0) - \
+        previous.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = current.get("system_cpu_usage", 0) - previous.get("system_cpu_usage", 0)
+    if usage_delta < 0 or system_delta <= 0:
+        return 0.0
+
+    online_cpus = current.get("online_cpus") or \
+        len(current.get("cpu_usage", {}).get("percpu_usage") or []) or os.cpu_count() or 1
+    return round(usage_delta / system_delta * online_cpus * 100, 2)
+
+
+def parse_api_stats(container_id: str, stats: Dict, cpu_usage: float) -> ContainerStats:
+    """Converte o JSON de /containers/{id}/stats em ContainerStats"""
+    memory_stats = stats.get("memory_stats", {})
+    networks = stats.get("networks") or {}
+
+    # Mesmo cálculo do 'docker stats': desconsiderar o page cache inativo
+    memory_usage = memory_stats.get("usage", 0)
+    inactive_file = memory_stats.get("stats", {}).get("inactive_file", 0)
+    memory_usage = max(memory_usage - inactive_file, 0)
+    memory_limit = memory_stats.get("limit", 0)
+    memory_percent = (memory_usage / memory_limit * 100) if memory_limit > 0 else 0
+
+    block_read = block_write = 0
+    for io_stat in stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []:
+        op = io_stat.get("op", "").lower()
+        if op == "read":
+            block_read += io_stat.get("value", 0)
+        elif op == "write":
+            block_write += io_stat.get("value", 0)
+
+    return ContainerStats(
+        container_id=container_id,
+        cpu_usage=cpu_usage,
+        memory_usage=memory_usage,
+        memory_limit=memory_limit,
+        memory_percent=round(memory_percent, 2),
+        network_rx=sum(net.get("rx_bytes", 0) for net in networks.values()),
+        network_tx=sum(net.get("tx_bytes", 0) for net in networks.values()),
+        block_read=block_read,
+        block_write=block_write,
+        pids=stats.get("pids_stats", {}).get("current", 0)
+    )
+
+
+class ContainerStatsCollector:
+    """Coleta estatísticas de todos os containers em uma única varredura"""
+
+    def __init__(self, engine: DockerEngine):
+        self.engine = engine
+        self.api_client = None
+        self.cgroup_v2 = os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers"))
+
+        # container_id -> diretório do cgroup (None = indisponível, usar API)
+        self._cgroup_paths: Dict[str, Optional[str]] = {}
+        # consumidor -> container_id -> (instante, uso de CPU acumulado em ns)
+        # Cada consumidor (monitoramento, WebSocket) mede a CPU no próprio intervalo
+        self._previous_cpu: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        # Varreduras serializadas: o cache de cgroups é alterado no executor
+        self._lock = asyncio.Lock()
+        self._one_shot = True
+
+        self.last_sweep_seconds = 0.0
+        self.last_sweep_cgroup = 0
+        self.last_sweep_api = 0
+
+    def start(self, api_client):
+        """Associa o cliente de baixo nível usado no fallback via API"""
+        self.api_client = api_client
+
+    async def collect(self, containers: List[ContainerInfo], consumer: str = "default") -> Dict[str, ContainerStats]:
+        """Coleta estatísticas dos containers informados
+
+        A CPU é calculada contra a varredura anterior do mesmo consumidor.
+        """
+        async with self._lock:
+            return await self._collect(containers, self._previous_cpu.setdefault(consumer, {}))
+
+    async def _collect(self, containers: List[ContainerInfo],
+                       previous: Dict[str, Tuple[float, int]]) -> Dict[str, ContainerStats]:
+        start = time.perf_counter()
+        container_ids = [container.id for container in containers]
+
+        # Caminho rápido: todos os cgroups lidos em uma única chamada ao executor
+        results: Dict[str, ContainerStats] = {}
+        if self.cgroup_v2:
+            results = await self.engine.run("read", "cgroup.read", self._read_cgroups, container_ids, previous)
+
+        # Demais containers via /stats, em paralelo (limitado pela categoria 'stats')
+        missing = [container_id for container_id in container_ids if container_id not in results]
+        if missing and self.api_client:
+            api_results = await asyncio.gather(
+                *(self._read_api_stats(container_id, previous) for container_id in missing),
+                return_exceptions=True
+            )
+            for container_id, stats in zip(missing, api_results):
+                if isinstance(stats, ContainerStats):
+                    results[container_id] = stats
+                elif not isinstance(stats, NotFound):
+                    logger.debug(f"Erro ao obter stats de {container_id[:12]}: {stats}")
+
+        # Descartar estado de containers que sumiram
+        active = set(container_ids)
+        for state in (previous, self._cgroup_paths):
+            for container_id in [key for key in state if key not in active]:
+                del state[container_id]
+
+        self.last_sweep_seconds = time.perf_counter() - start
+        self.last_sweep_cgroup = len(container_ids) - len(missing)
+        self.last_sweep_api = len(missing)
+        return results
+
+    def get_status(self) -> Dict[str, object]:
+        """Resumo da última varredura"""
+        return {
+            "cgroup_v2": self.cgroup_v2,
+            "last_sweep_ms": round(self.last_sweep_seconds * 1000, 2),
+            "last_sweep_cgroup": self.last_sweep_cgroup,
+            "last_sweep_api": self.last_sweep_api
+        }
+
+    @staticmethod
+    def _cpu_percent(previous: Dict[str, Tuple[float, int]], container_id: str,
+                     now: float, usage_ns: int) -> float:
+        """Percentual de CPU pela diferença entre amostras (100% = um núcleo)"""
+        sample = previous.get(container_id)
+        previous[container_id] = (now, usage_ns)
+        if not sample:
+            return 0.0
+
+        elapsed_ns = (now - sample[0]) * 1e9
+        usage_delta = usage_ns - sample[1]
+        if elapsed_ns <= 0 or usage_delta < 0:
+            return 0.0
+        return round(usage_delta / elapsed_ns * 100, 2)
+
+    # ===========================
+    # CGROUP V2
+    # ===========================
+
+    def _read_cgroups(self, container_ids: List[str],
+                      previous: Dict[str, Tuple[float, int]]) -> Dict[str, ContainerStats]:
+        """Lê os cgroups de vários containers (executado no executor)"""
+        results = {}
+        host_memory = None
+
+        for container_id in container_ids:
+            path = self._resolve_cgroup(container_id)
+            if not path:
+                continue
+            try:
+                now = time.monotonic()
+                cpu_stat = self._read_keyed(os.path.join(path, "cpu.stat"))
+                memory_current = int(self._read_file(os.path.join(path, "memory.current")))
+                memory_max = self._read_file(os.path.join(path, "memory.max"))
+                memory_stat = self._read_keyed(os.path.join(path, "memory.stat"))
+                block_read, block_write = self._read_io_stat(os.path.join(path, "io.stat"))
+                pids = int(self._read_file(os.path.join(path, "pids.current")) or 0)
+                network_rx, network_tx = self._read_net_dev(path)
+            except (OSError, ValueError):
+                # Container parou entre a listagem e a leitura
+                self._cgroup_paths.pop(container_id, None)
+                continue
+
+            if memory_max == "max":
+                if host_memory is None:
+                    host_memory = psutil.virtual_memory().total
+                memory_limit = host_memory
+            else:
+                memory_limit = int(memory_max)
+
+            # Mesmo critério do 'docker stats': descontar page cache inativo
+            memory_usage = max(memory_current - memory_stat.get("inactive_file", 0), 0)
+            memory_percent = (memory_usage / memory_limit * 100) if memory_limit > 0 else 0
+
+            results[container_id] = ContainerStats(
+                container_id=container_id,
+                cpu_usage=self._cpu_percent(previous, container_id, now, cpu_stat.get("usage_usec", 0) * 1000),
+                memory_usage=memory_usage,
+                memory_limit=memory_limit,
+                memory_percent=round(memory_percent, 2),
+                network_rx=network_rx,
+                network_tx=network_tx,
+                block_read=block_read,
+                block_write=block_write,
+                pids=pids
+            )
+
+        return results
+
+    def _resolve_cgroup(self, container_id: str) -> Optional[str]:
+        """Localiza o diretório do cgroup do container"""
+        if container_id in self._cgroup_paths:
+            return self._cgroup_paths[container_id]
+
+        path = None
+        for template in CGROUP_PATH_TEMPLATES:
+            candidate = template.format(root=CGROUP_ROOT, id=container_id)
+            if os.access(os.path.join(candidate, "cpu.stat"), os.R_OK):
+                path = candidate
+                break
+
+        self._cgroup_paths[container_id] = path
+        return path
+
+    @staticmethod
+    def _read_file(path: str) -> str:
+        with open(path) as f:
+            return f.read().strip()
+
+    @staticmethod
+    def _read_keyed(path: str) -> Dict[str, int]:
+        """Lê arquivos no formato 'chave valor' (cpu.stat, memory.stat)"""
+        values = {}
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if value:
+                    values[key] = int(value)
+        return values
+
+    @staticmethod
+    def _read_io_stat(path: str) -> Tuple[int, int]:
+        """Soma rbytes/wbytes de todos os dispositivos em io.stat"""
+        read_bytes = write_bytes = 0
+        try:
+            with open(path) as f:
+                for line in f:
+                    for field in line.split()[1:]:
+                        if field.startswith("rbytes="):
+                            read_bytes += int(field[7:])
+                        elif field.startswith("wbytes="):
+                            write_bytes += int(field[7:])
+        except FileNotFoundError:
+            # Controlador io não habilitado
+            pass
+        return read_bytes, write_bytes
+
+    @staticmethod
+    def _read_net_dev(cgroup_path: str) -> Tuple[int, int]:
+        """Tráfego de rede pelo namespace de um processo do container"""
+        with open(os.path.join(cgroup_path, "cgroup.procs")) as f:
+            pid = f.readline().strip()
+        if not pid:
+            return 0, 0
+
+        rx = tx = 0
+        try:
+            with open(os.path.join(PROC_ROOT, pid, "net", "dev")) as f:
+                for line in f.readlines()[2:]:
+                    interface, _, data = line.partition(":")
+                    if interface.strip() == "lo":
+                        continue
+                    fields = data.split()
+                    rx += int(fields[0])
+                    tx += int(fields[8])
+        except OSError:
+            pass
+        return rx, tx
+
+    # ===========================
+    # FALLBACK VIA API
+    # ===========================
+
+    async def _read_api_stats(self, container_id: str, previous: Dict[str, Tuple[float, int]]) -> ContainerStats:
+        """Lê /containers/{id}/stats (one-shot, sem aguardar a segunda amostra)"""
+        try:
+            stats = await self.engine.run(
+                "stats", "containers.stats", self.api_client.stats, container_id,
+                stream=False, one_shot=True if self._one_shot else None
+            )
+        except InvalidVersion:
+            # Daemon antigo (API < 1.41) não suporta one-shot
+            self._one_shot = False
+            stats = await self.engine.run(
+                "stats", "containers.stats", self.api_client.stats, container_id,
+                stream=False
+            )
+        now = time.monotonic()
+
+        cpu_total = stats.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage", 0)
+        return parse_api_stats(container_id, stats, self._cpu_percent(previous, container_id, now, cpu_total))
+
+
+class ContainerStatsStreams:
+    """Um stream /stats de longa duração por container, compartilhado entre os ouvintes
+
+    Cada amostra (~1 Hz) vira um ContainerStats com CPU calculada contra a amostra
+    anterior do próprio stream. O stream abre com o primeiro ouvinte e fecha
+    alguns segundos após o último sair.
+    """
+
+    def __init__(self, engine: DockerEngine, linger: float = 5.0):
+        self.engine = engine
+        self.api_client = None
+        self.linger = linger
+
+        # container_id -> filas dos ouvintes (tamanho 1: só a amostra mais recente)
+        self.listeners: Dict[str, Set[asyncio.Queue]] = {}
+        self.latest: Dict[str, ContainerStats] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._linger: Dict[str, asyncio.TimerHandle] = {}
+
+    def start(self, api_client):
+        self.api_client = api_client
+
+    async def subscribe(self, container_id: str) -> AsyncIterator[ContainerStats]:
+        """Itera as amostras do container até o stream terminar ou o ouvinte sair"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.listeners.setdefault(container_id, set()).add(queue)
+        self._acquire(container_id)
+
+        try:
+            latest = self.latest.get(container_id)
+            if latest:
+                yield latest
+            while True:
+                stats = await queue.get()
+                if stats is None:
+                    break
+                yield stats
+        finally:
+            listeners = self.listeners.get(container_id)
+            if listeners is not None:
+                listeners.discard(queue)
+                if not listeners:
+                    del self.listeners[container_id]
+                    self._release(container_id)
+
+    async def stop(self):
+        """Encerra todos os streams; os ouvintes recebem o fim da iteração"""
+        for handle in self._linger.values():
+            handle.cancel()
+        self._linger.clear()
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for container_id in list(self.listeners):
+            self._publish(container_id, None)
+        self.latest.clear()
+
+    def get_latest(self, container_id: str) -> Optional[ContainerStats]:
+        """Última amostra, se houver um stream aberto para o container"""
+        if container_id in self._tasks:
+            return self.latest.get(container_id)
+        return None
+
+    def get_status(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._tasks),
+            "listeners": sum(len(queues) for queues in self.listeners.values())
+        }
+
+    def _acquire(self, container_id: str):
+        handle = self._linger.pop(container_id, None)
+        if handle:
+            handle.cancel()
+        if container_id not in self._tasks:
+            self._tasks[container_id] = asyncio.create_task(self._run(container_id))
+
+    def _release(self, container_id: str):
+        if container_id in self._tasks and container_id not in self._linger:
+            self._linger[container_id] = asyncio.get_running_loop().call_later(
+                self.linger, self._stop, container_id
+            )
+
+    def _stop(self, container_id: str):
+        self._linger.pop(container_id, None)
+        if self.listeners.get(container_id):
+            return
+        task = self._tasks.pop(container_id, None)
+        if task:
+            task.cancel()
+        self.latest.pop(container_id, None)
+
+    def _publish(self, container_id: str, stats: Optional[ContainerStats]):
+        for queue in self.listeners.get(container_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(stats)
+
+    def _open(self, container_id: str) -> CancellableStream:
+        """Abre o GET /stats em stream (executado na thread do stream)
+
+        Como o stats(stream=True) do SDK, mas com a resposta exposta para que o
+        stream possa fechá-la ao cancelar.
+        """
+        api = self.api_client
+        response = api._get(api._url("/containers/{0}/stats", container_id), params={"stream": True}, stream=True)
+        api._raise_for_status(response)
+        return CancellableStream(api._stream_helper(response, decode=True), response)
+
+    async def _run(self, container_id: str):
+        """Consome o stream do daemon e distribui as amostras"""
+        previous_cpu = None
+        try:
+            async for raw in self.engine.stream(
+                "stats.stream",
+                lambda: self._open(container_id),
+                maxsize=4
+            ):
+                cpu_stats = raw.get("cpu_stats", {})
+                # Primeira amostra: o daemon preenche precpu_stats quando já tem leitura anterior
+                if previous_cpu is None and raw.get("precpu_stats", {}).get("system_cpu_usage"):
+                    previous_cpu = raw["precpu_stats"]
+
+                stats = parse_api_stats(container_id, raw, cpu_percent_between(cpu_stats, previous_cpu))
+                previous_cpu = cpu_stats
+                self.latest[container_id] = stats
+                self._publish(container_id, stats)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Stream de estatísticas de {container_id[:12]} encerrado: {e}")
+        finally:
+            if self._tasks.get(container_id) is asyncio.current_task():
+                del self._tasks[container_id]
+                self.latest.pop(container_id, None)
+                # Avisar os ouvintes que o stream terminou (ex.: container parou)
+                self._publish(container_id, None)
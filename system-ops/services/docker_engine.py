@@ -0,0 +1,281 @@
+"""
+Docker Engine - Camada assíncrona sobre o SDK Docker
+Executa as chamadas bloqueantes do SDK em um executor dedicado, com limites
+de concorrência por categoria de operação e métricas de latência por chamada
+"""
+
+import asyncio
+import bisect
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Limite de chamadas simultâneas por categoria. A soma das categorias lentas
+# (stats, logs, pull, prune, exec) fica abaixo do total de workers para que
+# leituras rápidas sempre encontrem uma thread livre.
+DEFAULT_OPERATION_LIMITS: Dict[str, int] = {
+    "read": 16,     # list, inspect, info, version, ping
+    "write": 8,     # create, start, stop, remove, connect
+    "stats": 12,    # stats(stream=False) ~1-2s por container
+    "logs": 4,
+    "pull": 2,
+    "exec": 4,
+    "prune": 1,
+}
+
+# Buckets (segundos) do histograma de latência; durações acima do último vão para +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Marcador de fim de stream
+_STREAM_END = object()
+
+
+class OperationLatency:
+    """Métricas de latência de uma operação da API Docker"""
+
+    __slots__ = ("category", "count", "errors", "in_flight", "total_seconds",
+                 "max_seconds", "last_seconds", "buckets")
+
+    def __init__(self, category: str):
+        self.category = category
+        self.count = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        # Um contador por bucket e o último para o overflow (+Inf)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, duration: float, error: bool = False):
+        """Registra a duração de uma chamada"""
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total_seconds += duration
+        self.last_seconds = duration
+        if duration > self.max_seconds:
+            self.max_seconds = duration
+
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa as métricas"""
+        return {
+            "category": self.category,
+            "count": self.count,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 2),
+            "last_ms": round(self.last_seconds * 1000, 2),
+            "total_seconds": round(self.total_seconds, 4),
+            "buckets": {
+                **{str(bound): n for bound, n in zip(LATENCY_BUCKETS, self.buckets)},
+                "+Inf": self.buckets[-1]
+            }
+        }
+
+
+class DockerEngine:
+    """Executor dedicado para chamadas ao SDK Docker"""
+
+    def __init__(self, max_workers: Optional[int] = None, limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers or int(os.getenv("DOCKER_EXECUTOR_WORKERS", 32))
+
+        self.limits = dict(DEFAULT_OPERATION_LIMITS)
+        for category in self.limits:
+            env_value = os.getenv(f"DOCKER_LIMIT_{category.upper()}")
+            if env_value:
+                self.limits[category] = int(env_value)
+        if limits:
+            self.limits.update(limits)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.latency: Dict[str, OperationLatency] = {}
+        self.active_streams: Dict[str, int] = {}
+
+    def start(self):
+        """Cria o executor (idempotente)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="docker-engine"
+            )
+            logger.info(f"🐳 Executor Docker iniciado ({self.max_workers} workers)")
+
+    def shutdown(self):
+        """Encerra o executor sem aguardar chamadas pendentes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphores.clear()
+
+    async def run(self, category: str, operation: str, func: Callable, /, *args, **kwargs) -> Any:
+        """Executa uma chamada bloqueante do SDK fora do event loop"""
+        if self._executor is None:
+            self.start()
+
+        semaphore = self._get_semaphore(category)
+        stats = self.latency.get(operation)
+        if stats is None:
+            stats = self.latency[operation] = OperationLatency(category)
+
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            stats.in_flight += 1
+            start = time.perf_counter()
+            error = False
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(func, *args, **kwargs)
+                )
+            except Exception:
+                error = True
+                raise
+            finally:
+                stats.in_flight -= 1
+                stats.observe(time.perf_counter() - start, error)
+
+    async def stream(self, operation: str, factory: Callable[[], Iterable],
+                     maxsize: int = 1000, category: Optional[str] = None) -> AsyncIterator[Any]:
+        """Consome um gerador bloqueante do SDK (events, logs, stats) em thread dedicada
+
+        Os itens chegam ao event loop por um buffer limitado: se o consumidor
+        atrasar, a thread leitora bloqueia em vez de acumular memória. O loop só é
+        acordado quando o buffer passa de vazio a não vazio, e então drena tudo o
+        que chegou de uma vez. Ao sair do iterador o socket da resposta é fechado, o
+        que desbloqueia a leitura na thread. Com category, o stream ocupa uma vaga do
+        limite da categoria enquanto estiver aberto (ex.: pulls).
+        """
+        loop = asyncio.get_running_loop()
+        buffer: Deque[Any] = deque()
+        condition = threading.Condition()
+        wakeup = asyncio.Event()
+        stop = threading.Event()
+        holder: Dict[str, Any] = {"notified": False}
+
+        stats = self.latency.get(operation)
+        if stats is None:
+            stats = self.latency[operation] = OperationLatency(category or "stream")
+
+        def put(item):
+            with condition:
+                while len(buffer) >= maxsize and not stop.is_set():
+                    condition.wait(0.5)
+                if stop.is_set():
+                    return
+                buffer.append(item)
+                if not holder["notified"]:
+                    holder["notified"] = True
+                    loop.call_soon_threadsafe(wakeup.set)
+
+        def reader():
+            start = time.perf_counter()
+            try:
+                source = holder["source"] = factory()
+                stats.observe(time.perf_counter() - start)
+                for item in source:
+                    if stop.is_set():
+                        break
+                    put(item)
+            except BaseException as e:
+                if not stop.is_set():
+                    stats.errors += 1
+                    put(e)
+            finally:
+                source = holder.get("source")
+                if inspect.isgenerator(source):
+                    # Fora de execução só aqui: a própria thread libera a resposta
+                    source.close()
+                try:
+                    put(_STREAM_END)
+                except RuntimeError:
+                    # Event loop já encerrado
+                    pass
+
+        semaphore = self._get_semaphore(category) if category else None
+        if semaphore is not None:
+            await semaphore.acquire()
+
+        thread = threading.Thread(target=reader, name=f"docker-stream-{operation}", daemon=True)
+        self.active_streams[operation] = self.active_streams.get(operation, 0) + 1
+        stats.in_flight += 1
+        thread.start()
+
+        try:
+            while True:
+                await wakeup.wait()
+                with condition:
+                    items = list(buffer)
+                    buffer.clear()
+                    holder["notified"] = False
+                    wakeup.clear()
+                    condition.notify()
+
+                for item in items:
+                    if item is _STREAM_END:
+                        return
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+        finally:
+            stop.set()
+            with condition:
+                buffer.clear()
+                condition.notify_all()
+            stats.in_flight -= 1
+            self.active_streams[operation] -= 1
+            if semaphore is not None:
+                semaphore.release()
+
+            source = holder.get("source")
+            if source is not None:
+                try:
+                    self._interrupt(source)
+                except Exception as e:
+                    logger.debug(f"Erro ao fechar stream {operation}: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Retorna limites, ocupação e latência por operação"""
+        in_use: Dict[str, int] = {category: 0 for category in self.limits}
+        for stats in self.latency.values():
+            in_use[stats.category] = in_use.get(stats.category, 0) + stats.in_flight
+
+        return {
+            "max_workers": self.max_workers,
+            "limits": dict(self.limits),
+            "in_use": in_use,
+            "active_streams": {name: n for name, n in self.active_streams.items() if n},
+            "operations": {name: stats.to_dict() for name, stats in sorted(self.latency.items())}
+        }
+
+    @staticmethod
+    def _interrupt(source: Iterable):
+        """Desbloqueia a thread leitora fechando a fonte
+
+        Geradores não podem ser fechados enquanto a thread está dentro deles
+        ("generator already executing"): fontes que bloqueiam lendo uma resposta
+        HTTP (logs, stats, pull) devem vir como CancellableStream, cujo close()
+        fecha o socket da resposta.
+        """
+        if not inspect.isgenerator(source) and hasattr(source, "close"):
+            source.close()
+
+    def _get_semaphore(self, category: str) -> asyncio.Semaphore:
+        """Obtém o semáforo da categoria (criado sob demanda)"""
+        semaphore = self._semaphores.get(category)
+        if semaphore is None:
+            limit = self.limits.get(category, self.limits["read"])
+            semaphore = self._semaphores[category] = asyncio.Semaphore(limit)
+        return semaphore
@@ -0,0 +1,286 @@
+"""
+Inventário de containers Docker
+Cache em memória de containers e imagens, inicializado uma vez e mantido
+atualizado pelo stream /events do daemon
+"""
+
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from models.docker import ContainerInfo, ContainerListRequest, ContainerPort, ContainerMount
+from services.docker_engine import DockerEngine
+
+logger = logging.getLogger(__name__)
+
+# Ações de container que não alteram o estado listado
+IGNORED_CONTAINER_ACTIONS = ("exec_create", "exec_start", "exec_die", "exec_detach",
+                             "attach", "detach", "top", "resize", "commit", "copy",
+                             "export", "archive-path", "extract-to-dir")
+
+
+class ContainerInventory:
+    """Inventário de containers/imagens alimentado por eventos do Docker"""
+
+    def __init__(self, engine: DockerEngine, refresh_delay: float = 0.05):
+        self.engine = engine
+        self.api_client = None
+        self.refresh_delay = refresh_delay
+
+        # container_id -> resumo retornado por /containers/json
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        # image_id -> tags
+        self.images: Dict[str, List[str]] = {}
+        # container_id -> ContainerInfo já convertido
+        self._info_cache: Dict[str, ContainerInfo] = {}
+
+        self.ready = False
+        self.last_sync: Optional[datetime] = None
+        self.resync_count = 0
+        self.events_processed = 0
+
+        self._pending_refresh: Set[str] = set()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._events_task: Optional[asyncio.Task] = None
+
+    async def start(self, api_client):
+        """Inicia o inventário e o consumo de eventos"""
+        self.api_client = api_client
+        if not self._events_task:
+            self._events_task = asyncio.create_task(self._events_loop())
+
+    async def stop(self):
+        """Para o consumo de eventos"""
+        tasks = [task for task in (self._events_task, self._refresh_task) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._events_task = None
+        self._refresh_task = None
+        self.ready = False
+
+    async def resync(self):
+        """Recarrega containers e imagens do daemon"""
+        containers, images = await asyncio.gather(
+            self.engine.run("read", "inventory.containers", self.api_client.containers, all=True),
+            self.engine.run("read", "inventory.images", self.api_client.images)
+        )
+
+        self.containers = {c["Id"]: c for c in containers}
+        self.images = {img["Id"]: img.get("RepoTags") or [] for img in images}
+        self._info_cache.clear()
+
+        self.ready = True
+        self.last_sync = datetime.now()
+        self.resync_count += 1
+        logger.info(f"📦 Inventário Docker sincronizado: {len(self.containers)} containers, {len(self.images)} imagens")
+
+    def list(self, request: ContainerListRequest) -> List[ContainerInfo]:
+        """Lista containers aplicando os filtros localmente"""
+        label_key, label_value = None, None
+        if request.label:
+            label_key, _, label_value = request.label.partition("=")
+
+        name_pattern = None
+        if request.name:
+            try:
+                name_pattern = re.compile(request.name)
+            except re.error:
+                name_pattern = re.compile(re.escape(request.name))
+
+        result = []
+        for container_id, summary in self.containers.items():
+            state = summary.get("State", "")
+            if not request.all and state != "running":
+                continue
+            if request.status and state != request.status:
+                continue
+            if request.image and not self._matches_image(summary, request.image):
+                continue
+            if name_pattern and not any(name_pattern.search(n.lstrip("/")) for n in summary.get("Names") or []):
+                continue
+            if label_key:
+                labels = summary.get("Labels") or {}
+                if label_key not in labels or (label_value and labels[label_key] != label_value):
+                    continue
+
+            info = self._info_cache.get(container_id)
+            if info is None:
+                info = self._info_cache[container_id] = self._convert_summary_to_info(summary)
+            result.append(info)
+
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """Estado do inventário"""
+        return {
+            "ready": self.ready,
+            "containers": len(self.containers),
+            "images": len(self.images),
+            "last_sync": self.last_sync.isoformat() if self.last_sync else None,
+            "resync_count": self.resync_count,
+            "events_processed": self.events_processed,
+            "pending_refresh": len(self._pending_refresh)
+        }
+
+    # ===========================
+    # EVENTOS
+    # ===========================
+
+    async def _events_loop(self):
+        """Consome /events; a cada (re)conexão faz uma sincronização completa"""
+        backoff = 1
+        while True:
+            try:
+                # Eventos a partir de antes do resync, para não perder nada entre os dois
+                since = int(time.time())
+                await self.resync()
+                backoff = 1
+
+                filters = {"type": ["container", "image"]}
+                async for event in self.engine.stream(
+                    "inventory.events",
+                    lambda: self.api_client.events(decode=True, since=since, filters=filters)
+                ):
+                    self._apply_event(event)
+
+                logger.warning("⚠️ Stream de eventos do Docker encerrado, reconectando")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Erro no stream de eventos do inventário: {e}")
+
+            self.ready = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _apply_event(self, event: Dict[str, Any]):
+        """Aplica um evento ao inventário"""
+        self.events_processed += 1
+        event_type = event.get("Type")
+        action = event.get("Action", "")
+        actor_id = event.get("Actor", {}).get("ID") or event.get("id")
+
+        if not actor_id:
+            return
+
+        if event_type == "container":
+            if action.startswith(IGNORED_CONTAINER_ACTIONS):
+                return
+            if action == "destroy":
+                self.containers.pop(actor_id, None)
+                self._info_cache.pop(actor_id, None)
+                self._pending_refresh.discard(actor_id)
+                return
+            self._schedule_refresh(actor_id)
+
+        elif event_type == "image":
+            # Tags mudaram: atualizar a imagem e os containers que a usam
+            self._schedule_refresh(f"image:{actor_id}")
+            for container_id, summary in self.containers.items():
+                if summary.get("ImageID") == actor_id:
+                    self._schedule_refresh(container_id)
+
+    def _schedule_refresh(self, key: str):
+        """Agrupa atualizações próximas em uma única chamada ao daemon"""
+        self._pending_refresh.add(key)
+        if not self._refresh_task or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._flush_refresh())
+
+    async def _flush_refresh(self):
+        """Recarrega em lote os containers/imagens afetados por eventos"""
+        await asyncio.sleep(self.refresh_delay)
+
+        while self._pending_refresh:
+            pending = self._pending_refresh
+            self._pending_refresh = set()
+
+            container_ids = [key for key in pending if not key.startswith("image:")]
+            image_changed = len(container_ids) != len(pending)
+
+            try:
+                if container_ids:
+                    summaries = await self.engine.run(
+                        "read", "inventory.containers", self.api_client.containers,
+                        all=True, filters={"id": container_ids}
+                    )
+                    found = {s["Id"]: s for s in summaries}
+                    for container_id in container_ids:
+                        if container_id in found:
+                            self.containers[container_id] = found[container_id]
+                        else:
+                            self.containers.pop(container_id, None)
+                        self._info_cache.pop(container_id, None)
+
+                if image_changed:
+                    images = await self.engine.run("read", "inventory.images", self.api_client.images)
+                    self.images = {img["Id"]: img.get("RepoTags") or [] for img in images}
+                    self._info_cache.clear()
+
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao atualizar inventário Docker: {e}")
+
+    # ===========================
+    # CONVERSÃO
+    # ===========================
+
+    def _matches_image(self, summary: Dict[str, Any], image: str) -> bool:
+        """Equivalente local do filtro 'ancestor'"""
+        image_name = summary.get("Image", "")
+        image_id = summary.get("ImageID", "")
+        tags = self.images.get(image_id, [])
+
+        candidates = {image, f"{image}:latest"} if ":" not in image else {image}
+        if image_name in candidates or candidates.intersection(tags):
+            return True
+        return image_id == image or image_id.startswith(f"sha256:{image}")
+
+    def _convert_summary_to_info(self, summary: Dict[str, Any]) -> ContainerInfo:
+        """Converte o resumo de /containers/json para ContainerInfo"""
+        ports = []
+        seen_ports = set()
+        for port in summary.get("Ports") or []:
+            key = (port.get("PrivatePort"), port.get("Type", "tcp"))
+            if key in seen_ports:
+                continue
+            seen_ports.add(key)
+            ports.append(ContainerPort(
+                private_port=port.get("PrivatePort", 0),
+                public_port=port.get("PublicPort"),
+                type=port.get("Type", "tcp")
+            ))
+
+        mounts = [
+            ContainerMount(
+                type=mount.get("Type", "unknown"),
+                source=mount.get("Source", ""),
+                destination=mount.get("Destination", ""),
+                readonly=mount.get("RW", True) == False
+            )
+            for mount in summary.get("Mounts") or []
+        ]
+
+        networks = list((summary.get("NetworkSettings") or {}).get("Networks", {}).keys())
+
+        image_id = summary.get("ImageID", "")
+        tags = self.images.get(image_id)
+        names = summary.get("Names") or [summary["Id"][:12]]
+        state = summary.get("State", "unknown")
+
+        return ContainerInfo(
+            id=summary["Id"],
+            name=names[0].lstrip("/"),
+            image=tags[0] if tags else summary.get("Image", image_id),
+            image_id=image_id,
+            status=state,
+            state=state,
+            created=datetime.fromtimestamp(summary.get("Created", 0), tz=timezone.utc),
+            ports=ports,
+            labels=summary.get("Labels") or {},
+            networks=networks,
+            mounts=mounts
+        )
@@ -2,17 +2,25 @@ import asyncio
 import logging
 import time
 import json
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Union
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 import docker
 from docker.errors import DockerException, NotFound, APIError, ImageNotFound, ContainerError
 
+from services.docker_engine import DockerEngine
+from services.docker_inventory import ContainerInventory
+from services.container_logs import ContainerLogReader, NS_PER_SECOND
+from services.image_pull import ImagePull, ImagePullManager
+from services.exec_sessions import ExecSessionManager
+from services.container_stats import (
+    ContainerStatsCollector, ContainerStatsStreams, cpu_percent_between, parse_api_stats
+)
 from models.docker import (
     ContainerInfo, ContainerInspectInfo, CreateContainerRequest, ContainerActionRequest,
     ContainerListRequest, ImageInfo, ImageListRequest, ImagePullRequest, ImageRemoveRequest,
     VolumeInfo, CreateVolumeRequest, VolumeListRequest, NetworkInfo, CreateNetworkRequest,
     NetworkConnectRequest, NetworkDisconnectRequest, ContainerStats, LogEntry, LogsRequest,
-    DockerOperationResponse, DockerHealthResponse, DockerSystemInfo,
+    LogStreamRequest, DockerOperationResponse, DockerHealthResponse, DockerSystemInfo,
     ContainerExecRequest, ContainerExecResponse, ContainerPort, ContainerMount
 )
 
@@ -24,6 +32,12 @@ class DockerService:
     def __init__(self):
         self.client: Optional[docker.DockerClient] = None
         self.api_client: Optional[docker.APIClient] = None
+        self.engine = DockerEngine()
+        self.inventory = ContainerInventory(self.engine)
+        self.stats_collector = ContainerStatsCollector(self.engine)
+        self.stats_streams = ContainerStatsStreams(self.engine)
+        self.image_pulls = ImagePullManager(self.engine)
+        self.exec_sessions = ExecSessionManager(self.engine)
         self.service_started_at = datetime.now()
 
     async def start_service(self):
@@ -31,13 +45,21 @@ class DockerService:
         try:
             logger.info("🐳 Iniciando serviço Docker...")
 
-            # Inicializar clientes Docker
-            self.client = docker.from_env()
-            self.api_client = docker.APIClient()
+            # Inicializar executor e clientes Docker (a negociação de versão faz I/O)
+            self.engine.start()
+            self.client = await self.engine.run("read", "client.from_env", docker.from_env)
+            self.api_client = await self.engine.run("read", "client.api_client", docker.APIClient)
 
             # Verificar conectividade
             await self._verify_docker_connection()
 
+            # Inventário de containers mantido pelo stream de eventos
+            await self.inventory.start(self.api_client)
+            self.stats_collector.start(self.api_client)
+            self.stats_streams.start(self.api_client)
+            self.image_pulls.start(self.client, self.api_client)
+            self.exec_sessions.start(self.api_client)
+
             logger.info("✅ Serviço Docker iniciado com sucesso")
 
         except Exception as e:
@@ -49,12 +71,19 @@ class DockerService:
         try:
             logger.info("🐳 Parando serviço Docker...")
 
+            await self.inventory.stop()
+            await self.image_pulls.stop()
+            await self.stats_streams.stop()
+            await self.exec_sessions.stop()
+
             if self.client:
                 self.client.close()
 
             if self.api_client:
                 self.api_client.close()
 
+            self.engine.shutdown()
+
             logger.info("✅ Serviço Docker parado")
 
         except Exception as e:
@@ -69,6 +98,12 @@ class DockerService:
         try:
             logger.info(f"📋 Listando containers (all={request.all})")
 
+            # Servir do inventário quando sincronizado
+            if self.inventory.ready:
+                container_infos = self.inventory.list(request)
+                logger.info(f"✅ {len(container_infos)} containers encontrados (inventário)")
+                return container_infos
+
             # Preparar filtros
             filters = {}
             if request.status:
@@ -81,7 +116,10 @@ class DockerService:
                 filters['label'] = request.label
 
             # Listar containers
-            containers = self.client.containers.list(all=request.all, filters=filters)
+            containers = await self.engine.run(
+                "read", "containers.list", self.client.containers.list,
+                all=request.all, filters=filters
+            )
 
             # Converter para modelo
             container_infos = []
@@ -101,8 +139,7 @@ class DockerService:
         try:
             logger.info(f"🔍 Obtendo container: {container_id}")
 
-            container = self.client.containers.get(container_id)
-            container.reload()
+            container = await self.engine.run("read", "containers.get", self.client.containers.get, container_id)
 
             # Converter dados para o modelo
             info = ContainerInspectInfo(
@@ -191,14 +228,14 @@ class DockerService:
                 create_kwargs['auto_remove'] = True
 
             # Criar container
-            container = self.client.containers.create(**create_kwargs)
+            container = await self.engine.run("write", "containers.create", self.client.containers.create, **create_kwargs)
 
             # Conectar a redes adicionais
             if request.networks and len(request.networks) > 1:
                 for network_name in request.networks[1:]:
                     try:
-                        network = self.client.networks.get(network_name)
-                        network.connect(container)
+                        network = await self.engine.run("read", "networks.get", self.client.networks.get, network_name)
+                        await self.engine.run("write", "networks.connect", network.connect, container)
                     except Exception as net_error:
                         logger.warning(f"⚠️ Erro ao conectar à rede {network_name}: {net_error}")
 
@@ -229,24 +266,24 @@ class DockerService:
         try:
             logger.info(f"⚡ Executando ação {request.action} no container {container_id}")
 
-            container = self.client.containers.get(container_id)
+            container = await self.engine.run("read", "containers.get", self.client.containers.get, container_id)
 
             # Executar ação
             if request.action == 'start':
-                container.start()
+                await self.engine.run("write", "containers.start", container.start)
             elif request.action == 'stop':
-                container.stop(timeout=request.timeout)
+                await self.engine.run("write", "containers.stop", container.stop, timeout=request.timeout)
             elif request.action == 'restart':
-                container.restart(timeout=request.timeout)
+                await self.engine.run("write", "containers.restart", container.restart, timeout=request.timeout)
             elif request.action == 'pause':
-                container.pause()
+                await self.engine.run("write", "containers.pause", container.pause)
             elif request.action == 'unpause':
-                container.unpause()
+                await self.engine.run("write", "containers.unpause", container.unpause)
             elif request.action == 'kill':
-                container.kill()
+                await self.engine.run("write", "containers.kill", container.kill)
 
             # Recarregar status
-            container.reload()
+            await self.engine.run("read", "containers.reload", container.reload)
 
             logger.info(f"✅ Ação {request.action} executada no container {container_id}")
 
@@ -269,8 +306,8 @@ class DockerService:
         try:
             logger.info(f"🗑️ Removendo container: {container_id}")
 
-            container = self.client.containers.get(container_id)
-            container.remove(force=force)
+            container = await self.engine.run("read", "containers.get", self.client.containers.get, container_id)
+            await self.engine.run("write", "containers.remove", container.remove, force=force)
 
             logger.info(f"✅ Container {container_id} removido")
 
@@ -288,123 +325,66 @@ class DockerService:
             logger.error(f"❌ Erro ao remover container: {e}")
             raise
 
+    async def open_container_logs(self, container_id: str, request: LogStreamRequest) -> ContainerLogReader:
+        """Prepara a leitura paginada dos logs (NDJSON); nada é lido até iterar records()"""
+        try:
+            container = await self.engine.run("read", "containers.get", self.client.containers.get, container_id)
+        except NotFound:
+            logger.error(f"❌ Container {container_id} não encontrado")
+            raise ValueError(f"Container {container_id} não encontrado")
+
+        tty = bool(container.attrs.get('Config', {}).get('Tty'))
+        return ContainerLogReader(
+            self.engine, self.api_client, container.id, tty, request,
+            cursor=request.cursor, limit=request.limit, pattern=request.pattern
+        )
+
     async def get_container_logs(self, container_id: str, request: LogsRequest) -> List[LogEntry]:
         """Obtém logs de um container"""
         try:
             logger.info(f"📄 Obtendo logs do container: {container_id}")
 
-            container = self.client.containers.get(container_id)
-
-            # Configurar parâmetros de log
-            logs_kwargs = {
-                'stdout': request.stdout,
-                'stderr': request.stderr,
-                'timestamps': request.timestamps,
-                'stream': False
-            }
-
-            if request.tail:
-                logs_kwargs['tail'] = request.tail
-            if request.since:
-                logs_kwargs['since'] = request.since
-            if request.until:
-                logs_kwargs['until'] = request.until
-
-            # Obter logs
-            logs = container.logs(**logs_kwargs)
+            # Mesmo leitor do stream NDJSON, sem limite de página (limitado pelo tail)
+            reader = await self.open_container_logs(
+                container_id, LogStreamRequest(**request.dict(), limit=None)
+            )
 
-            # Processar logs
             log_entries = []
-            if isinstance(logs, bytes):
-                logs = logs.decode('utf-8')
-
-            for line in logs.split('\n'):
-                if line.strip():
-                    # Parse básico de timestamp se disponível
-                    if request.timestamps and ' ' in line:
-                        parts = line.split(' ', 1)
-                        try:
-                            timestamp = datetime.fromisoformat(parts[0].replace('Z', '+00:00'))
-                            message = parts[1] if len(parts) > 1 else ''
-                        except:
-                            timestamp = datetime.now()
-                            message = line
-                    else:
-                        timestamp = datetime.now()
-                        message = line
-
-                    log_entries.append(LogEntry(
-                        timestamp=timestamp,
-                        stream='stdout',  # Simplificado, em produção seria mais específico
-                        message=message
-                    ))
+            async for record in reader.records():
+                timestamp_ns = int(record['cursor'].partition('-')[0])
+                log_entries.append(LogEntry(
+                    timestamp=datetime.fromtimestamp(timestamp_ns / NS_PER_SECOND, tz=timezone.utc),
+                    stream=record['stream'],
+                    message=record['message']
+                ))
 
             logger.info(f"✅ {len(log_entries)} entradas de log obtidas")
             return log_entries
 
-        except NotFound:
-            logger.error(f"❌ Container {container_id} não encontrado")
-            raise ValueError(f"Container {container_id} não encontrado")
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"❌ Erro ao obter logs: {e}")
             raise
 
     async def get_container_stats(self, container_id: str) -> ContainerStats:
         """Obtém estatísticas de um container"""
+        # Com um stream aberto para o container, a última amostra já está em memória
+        latest = self.stats_streams.get_latest(container_id)
+        if latest:
+            return latest
+
         try:
             logger.info(f"📊 Obtendo estatísticas do container: {container_id}")
 
-            container = self.client.containers.get(container_id)
-
-            # Obter stats (sem stream)
-            stats = container.stats(stream=False, decode=True)
-
-            # Processar estatísticas
-            cpu_stats = stats.get('cpu_stats', {})
-            precpu_stats = stats.get('precpu_stats', {})
-            memory_stats = stats.get('memory_stats', {})
-            networks = stats.get('networks', {})
-            blkio_stats = stats.get('blkio_stats', {})
-
-            # Calcular CPU usage
-            cpu_usage = 0.0
-            if cpu_stats.get('cpu_usage') and precpu_stats.get('cpu_usage'):
-                cpu_delta = cpu_stats['cpu_usage']['total_usage'] - precpu_stats['cpu_usage']['total_usage']
-                system_delta = cpu_stats['system_cpu_usage'] - precpu_stats['system_cpu_usage']
-                if system_delta > 0:
-                    cpu_usage = (cpu_delta / system_delta) * len(cpu_stats['cpu_usage'].get('percpu_usage', [1])) * 100
-
-            # Calcular memory
-            memory_usage = memory_stats.get('usage', 0)
-            memory_limit = memory_stats.get('limit', 0)
-            memory_percent = (memory_usage / memory_limit * 100) if memory_limit > 0 else 0
-
-            # Calcular network
-            network_rx = sum(net.get('rx_bytes', 0) for net in networks.values())
-            network_tx = sum(net.get('tx_bytes', 0) for net in networks.values())
-
-            # Calcular block I/O
-            block_read = 0
-            block_write = 0
-            for io_stat in blkio_stats.get('io_service_bytes_recursive', []):
-                if io_stat.get('op') == 'Read':
-                    block_read += io_stat.get('value', 0)
-                elif io_stat.get('op') == 'Write':
-                    block_write += io_stat.get('value', 0)
-
-            pids = stats.get('pids_stats', {}).get('current', 0)
-
-            container_stats = ContainerStats(
-                container_id=container_id,
-                cpu_usage=round(cpu_usage, 2),
-                memory_usage=memory_usage,
-                memory_limit=memory_limit,
-                memory_percent=round(memory_percent, 2),
-                network_rx=network_rx,
-                network_tx=network_tx,
-                block_read=block_read,
-                block_write=block_write,
-                pids=pids
+            # Sem stream o daemon aguarda ~1s para preencher precpu_stats
+            stats = await self.engine.run(
+                "stats", "containers.stats", self.api_client.stats, container_id, stream=False
+            )
+
+            container_stats = parse_api_stats(
+                container_id, stats,
+                cpu_percent_between(stats.get('cpu_stats', {}), stats.get('precpu_stats'))
             )
 
             logger.info(f"✅ Estatísticas do container {container_id} obtidas")
@@ -417,6 +397,20 @@ class DockerService:
             logger.error(f"❌ Erro ao obter estatísticas: {e}")
             raise
 
+    def stream_container_stats(self, container_id: str) -> AsyncIterator[ContainerStats]:
+        """Amostras de ~1 Hz do container, de um stream compartilhado entre os ouvintes"""
+        return self.stats_streams.subscribe(container_id)
+
+    async def collect_container_stats(self, containers: Optional[List[ContainerInfo]] = None,
+                                      consumer: str = "default") -> Dict[str, ContainerStats]:
+        """Obtém estatísticas de vários containers em uma única varredura paralela
+
+        consumer identifica quem coleta: a CPU de cada um é medida no próprio intervalo.
+        """
+        if containers is None:
+            containers = await self.list_containers(ContainerListRequest(all=False))
+        return await self.stats_collector.collect(containers, consumer)
+
     # ===========================
     # OPERAÇÕES DE IMAGENS
     # ===========================
@@ -433,7 +427,10 @@ class DockerService:
             if request.name:
                 filters['reference'] = request.name
 
-            images = self.client.images.list(all=request.all, filters=filters)
+            images = await self.engine.run(
+                "read", "images.list", self.client.images.list,
+                all=request.all, filters=filters
+            )
 
             image_infos = []
             for image in images:
@@ -455,29 +452,22 @@ class DockerService:
             logger.error(f"❌ Erro ao listar imagens: {e}")
             raise
 
+    def start_image_pull(self, request: ImagePullRequest) -> ImagePull:
+        """Inicia o pull (ou junta-se ao já em andamento para a mesma referência)"""
+        return self.image_pulls.pull(request.repository, request.tag, request.auth)
+
     async def pull_image(self, request: ImagePullRequest) -> DockerOperationResponse:
         """Faz pull de uma imagem Docker"""
         try:
             logger.info(f"⬇️ Fazendo pull da imagem: {request.repository}:{request.tag}")
 
-            # Configurar autenticação se fornecida
-            auth_config = None
-            if request.auth:
-                auth_config = request.auth
-
-            # Fazer pull da imagem
-            image = self.client.images.pull(
-                repository=request.repository,
-                tag=request.tag,
-                auth_config=auth_config
-            )
-
-            logger.info(f"✅ Pull da imagem {request.repository}:{request.tag} concluído")
+            pull = self.start_image_pull(request)
+            result = await pull.wait()
 
             return DockerOperationResponse(
                 success=True,
-                message=f"Imagem {request.repository}:{request.tag} baixada com sucesso",
-                data={'image_id': image.id, 'tags': image.tags},
+                message=f"Imagem {pull.reference} baixada com sucesso",
+                data=result,
                 operation='pull_image'
             )
 
@@ -491,7 +481,8 @@ class DockerService:
             logger.info(f"🗑️ Removendo imagem: {image_id}")
 
             # Remover imagem
-            self.client.images.remove(
+            await self.engine.run(
+                "write", "images.remove", self.client.images.remove,
                 image=image_id,
                 force=request.force,
                 noprune=request.noprune
@@ -531,7 +522,7 @@ class DockerService:
             if request.label:
                 filters['label'] = request.label
 
-            volumes = self.client.volumes.list(filters=filters)
+            volumes = await self.engine.run("read", "volumes.list", self.client.volumes.list, filters=filters)
 
             volume_infos = []
             for volume in volumes:
@@ -559,7 +550,8 @@ class DockerService:
             logger.info(f"🆕 Criando volume: {request.name}")
 
             # Criar volume
-            volume = self.client.volumes.create(
+            volume = await self.engine.run(
+                "write", "volumes.create", self.client.volumes.create,
                 name=request.name,
                 driver=request.driver,
                 driver_opts=request.driver_opts,
@@ -590,8 +582,8 @@ class DockerService:
         try:
             logger.info(f"🗑️ Removendo volume: {volume_name}")
 
-            volume = self.client.volumes.get(volume_name)
-            volume.remove(force=force)
+            volume = await self.engine.run("read", "volumes.get", self.client.volumes.get, volume_name)
+            await self.engine.run("write", "volumes.remove", volume.remove, force=force)
 
             logger.info(f"✅ Volume {volume_name} removido")
 
@@ -618,7 +610,7 @@ class DockerService:
         try:
             logger.info("📋 Listando redes Docker")
 
-            networks = self.client.networks.list()
+            networks = await self.engine.run("read", "networks.list", self.client.networks.list)
 
             network_infos = []
             for network in networks:
@@ -648,7 +640,8 @@ class DockerService:
             logger.info(f"🆕 Criando rede: {request.name}")
 
             # Criar rede
-            network = self.client.networks.create(
+            network = await self.engine.run(
+                "write", "networks.create", self.client.networks.create,
                 name=request.name,
                 driver=request.driver,
                 options=request.options,
@@ -683,8 +676,8 @@ class DockerService:
         try:
             logger.info(f"🗑️ Removendo rede: {network_id}")
 
-            network = self.client.networks.get(network_id)
-            network.remove()
+            network = await self.engine.run("read", "networks.get", self.client.networks.get, network_id)
+            await self.engine.run("write", "networks.remove", network.remove)
 
             logger.info(f"✅ Rede {network_id} removida")
 
@@ -707,7 +700,7 @@ class DockerService:
         try:
             logger.info(f"🔗 Conectando container {request.container} à rede {network_id}")
 
-            network = self.client.networks.get(network_id)
+            network = await self.engine.run("read", "networks.get", self.client.networks.get, network_id)
 
             # Preparar configuração da conexão
             kwargs = {}
@@ -718,7 +711,7 @@ class DockerService:
             if request.ipv6_address:
                 kwargs['ipv6_address'] = request.ipv6_address
 
-            network.connect(request.container, **kwargs)
+            await self.engine.run("write", "networks.connect", network.connect, request.container, **kwargs)
 
             logger.info(f"✅ Container {request.container} conectado à rede {network_id}")
 
@@ -745,8 +738,8 @@ class DockerService:
         try:
             logger.info(f"❌ Desconectando container {request.container} da rede {network_id}")
 
-            network = self.client.networks.get(network_id)
-            network.disconnect(request.container, force=request.force)
+            network = await self.engine.run("read", "networks.get", self.client.networks.get, network_id)
+            await self.engine.run("write", "networks.disconnect", network.disconnect, request.container, force=request.force)
 
             logger.info(f"✅ Container {request.container} desconectado da rede {network_id}")
 
@@ -777,10 +770,11 @@ class DockerService:
         try:
             logger.info(f"⚡ Executando comando no container {container_id}")
 
-            container = self.client.containers.get(container_id)
+            await self.engine.run("read", "containers.get", self.client.containers.get, container_id)
 
             # Criar exec
-            exec_instance = self.api_client.exec_create(
+            exec_instance = await self.engine.run(
+                "exec", "exec.create", self.api_client.exec_create,
                 container=container_id,
                 cmd=request.cmd,
                 stdout=True,
@@ -793,14 +787,15 @@ class DockerService:
             )
 
             # Executar comando
-            exec_result = self.api_client.exec_start(
+            exec_result = await self.engine.run(
+                "exec", "exec.start", self.api_client.exec_start,
                 exec_id=exec_instance['Id'],
                 detach=False,
                 tty=request.tty
             )
 
             # Obter informações da execução
-            exec_info = self.api_client.exec_inspect(exec_instance['Id'])
+            exec_info = await self.engine.run("read", "exec.inspect", self.api_client.exec_inspect, exec_instance['Id'])
 
             # Processar output
             if isinstance(exec_result, bytes):
@@ -842,22 +837,22 @@ class DockerService:
 
             # Limpar containers parados
             if containers:
-                container_prune = self.client.containers.prune()
+                container_prune = await self.engine.run("prune", "containers.prune", self.client.containers.prune)
                 pruned_data['containers'] = container_prune
 
             # Limpar imagens não utilizadas
             if images:
-                image_prune = self.client.images.prune(filters={'dangling': False})
+                image_prune = await self.engine.run("prune", "images.prune", self.client.images.prune, filters={'dangling': False})
                 pruned_data['images'] = image_prune
 
             # Limpar volumes não utilizados
             if volumes:
-                volume_prune = self.client.volumes.prune()
+                volume_prune = await self.engine.run("prune", "volumes.prune", self.client.volumes.prune)
                 pruned_data['volumes'] = volume_prune
 
             # Limpar redes não utilizadas
             if networks:
-                network_prune = self.client.networks.prune()
+                network_prune = await self.engine.run("prune", "networks.prune", self.client.networks.prune)
                 pruned_data['networks'] = network_prune
 
             logger.info("✅ Limpeza do sistema Docker concluída")
@@ -877,6 +872,22 @@ class DockerService:
         """Obtém status de saúde do Docker (alias para get_health_status)"""
         return await self.get_health_status()
 
+    def get_engine_metrics(self) -> Dict[str, Any]:
+        """Obtém métricas de latência e concorrência das chamadas à API Docker"""
+        metrics = self.engine.get_metrics()
+        metrics["container_stats"] = self.stats_collector.get_status()
+        metrics["container_stats_streams"] = self.stats_streams.get_status()
+        metrics["image_pulls"] = {
+            "in_flight": len(self.image_pulls.pulls),
+            "coalesced": self.image_pulls.coalesced
+        }
+        metrics["exec_sessions"] = self.exec_sessions.get_status()
+        return metrics
+
+    def get_inventory_status(self) -> Dict[str, Any]:
+        """Obtém o estado do inventário de containers"""
+        return self.inventory.get_status()
+
     # ===========================
     # SISTEMA E HEALTH CHECK
     # ===========================
@@ -886,8 +897,12 @@ class DockerService:
         try:
             logger.info("🔍 Obtendo informações do sistema Docker")
 
-            info = self.client.info()
-            version = self.client.version()
+            info, version, volumes, networks = await asyncio.gather(
+                self.engine.run("read", "system.info", self.client.info),
+                self.engine.run("read", "system.version", self.client.version),
+                self.engine.run("read", "volumes.list", self.client.volumes.list),
+                self.engine.run("read", "networks.list", self.client.networks.list)
+            )
 
             system_info = DockerSystemInfo(
                 version=version.get('Version', 'unknown'),
@@ -897,8 +912,8 @@ class DockerService:
                 containers_paused=info.get('ContainersPaused', 0),
                 containers_stopped=info.get('ContainersStopped', 0),
                 images=info.get('Images', 0),
-                volumes=len(self.client.volumes.list()),
-                networks=len(self.client.networks.list()),
+                volumes=len(volumes),
+                networks=len(networks),
                 server_version=info.get('ServerVersion', 'unknown'),
                 storage_driver=info.get('Driver', 'unknown'),
                 total_memory=info.get('MemTotal', 0),
@@ -919,7 +934,7 @@ class DockerService:
         """Obtém status de saúde do serviço Docker"""
         try:
             # Verificar conectividade
-            ping_result = self.client.ping()
+            ping_result = await self.engine.run("read", "system.ping", self.client.ping)
 
             if not ping_result:
                 return DockerHealthResponse(
@@ -934,8 +949,10 @@ class DockerService:
                 )
 
             # Obter informações
-            info = self.client.info()
-            version = self.client.version()
+            info, version = await asyncio.gather(
+                self.engine.run("read", "system.info", self.client.info),
+                self.engine.run("read", "system.version", self.client.version)
+            )
 
             # Contadores
             containers_running = info.get('ContainersRunning', 0)
@@ -943,8 +960,12 @@ class DockerService:
             images_total = info.get('Images', 0)
 
             try:
-                volumes_total = len(self.client.volumes.list())
-                networks_total = len(self.client.networks.list())
+                volumes, networks = await asyncio.gather(
+                    self.engine.run("read", "volumes.list", self.client.volumes.list),
+                    self.engine.run("read", "networks.list", self.client.networks.list)
+                )
+                volumes_total = len(volumes)
+                networks_total = len(networks)
             except:
                 volumes_total = 0
                 networks_total = 0
@@ -988,9 +1009,9 @@ class DockerService:
     async def _verify_docker_connection(self):
         """Verifica conectividade com Docker"""
         try:
-            ping_result = self.client.ping()
+            ping_result = await self.engine.run("read", "system.ping", self.client.ping)
             if ping_result:
-                version = self.client.version()
+                version = await self.engine.run("read", "system.version", self.client.version)
                 logger.info(f"✅ Docker conectado - Versão: {version.get('Version', 'unknown')}")
             else:
                 raise Exception("Ping falhou")
@@ -999,6 +1020,11 @@ class DockerService:
 
     async def _convert_container_to_info(self, container) -> ContainerInfo:
         """Converte container Docker para modelo ContainerInfo"""
+        # container.image faz uma chamada /images/{id}/json, então a conversão roda no executor
+        return await self.engine.run("read", "images.get", self._build_container_info, container)
+
+    def _build_container_info(self, container) -> ContainerInfo:
+        """Monta o ContainerInfo (bloqueante, executado no executor Docker)"""
         try:
             # Processar portas
             ports = []
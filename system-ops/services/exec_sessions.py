@@ -0,0 +1,237 @@
+"""
+Sessões de exec interativas
+Liga um WebSocket a um exec com TTY: a conexão de exec do daemon é entregue
+ao event loop (sem thread por sessão) e os dois sentidos são copiados com
+backpressure, em blocos limitados
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import ssl
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from fastapi import WebSocket
+
+from services.docker_engine import DockerEngine
+
+logger = logging.getLogger(__name__)
+
+EXEC_MAX_SESSIONS = int(os.getenv("DOCKER_EXEC_MAX_SESSIONS", "64"))
+# Maior bloco lido do container ou aceito do cliente por vez
+EXEC_CHUNK_BYTES = 65536
+
+CLOSE_CODE_TRY_AGAIN = 1013
+
+
+class ExecSession:
+    """Um exec com TTY e sua conexão com o daemon"""
+
+    def __init__(self, engine: DockerEngine, api_client, container_id: str, exec_id: str):
+        self.engine = engine
+        self.api_client = api_client
+        self.container_id = container_id
+        self.exec_id = exec_id
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._blocking_sock = None
+        self._origin_sock = None
+
+    async def open(self):
+        """Inicia o exec e assume a conexão (upgrade para TCP cru)"""
+        sock = await self.engine.run(
+            "exec", "exec.start", self.api_client.exec_start, self.exec_id, tty=True, socket=True
+        )
+        raw = getattr(sock, "_sock", sock)
+
+        if isinstance(raw, socket.socket) and not isinstance(raw, ssl.SSLSocket):
+            # Unix/TCP: o event loop passa a dono de uma cópia do descritor
+            self._origin_sock = raw
+            stream_sock = raw.dup()
+            stream_sock.setblocking(False)
+            self._reader, self._writer = await asyncio.open_connection(
+                sock=stream_sock, limit=EXEC_CHUNK_BYTES
+            )
+        else:
+            # TLS/SSH/npipe: leitura em uma thread do stream, escrita pelo executor
+            self._blocking_sock = raw
+
+    async def output(self) -> AsyncIterator[bytes]:
+        """Blocos de saída do TTY até o processo terminar"""
+        if self._reader is not None:
+            while True:
+                data = await self._reader.read(EXEC_CHUNK_BYTES)
+                if not data:
+                    return
+                self.bytes_out += len(data)
+                yield data
+        else:
+            recv = functools.partial(self._blocking_sock.recv, EXEC_CHUNK_BYTES)
+            async for data in self.engine.stream("exec.output", lambda: iter(recv, b""), maxsize=16):
+                self.bytes_out += len(data)
+                yield data
+
+    async def write(self, data: bytes):
+        """Envia stdin aguardando o buffer do socket esvaziar (backpressure)"""
+        self.bytes_in += len(data)
+        if self._writer is not None:
+            self._writer.write(data)
+            await self._writer.drain()
+        else:
+            await self.engine.run("exec", "exec.stdin", self._blocking_sock.sendall, data)
+
+    async def resize(self, cols: int, rows: int):
+        await self.engine.run(
+            "exec", "exec.resize", self.api_client.exec_resize, self.exec_id, height=rows, width=cols
+        )
+
+    async def exit_code(self) -> Optional[int]:
+        info = await self.engine.run("read", "exec.inspect", self.api_client.exec_inspect, self.exec_id)
+        return info.get("ExitCode")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        for sock in (self._origin_sock, self._blocking_sock):
+            if sock is None:
+                continue
+            try:
+                sock.close()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar exec {self.exec_id}: {e}")
+
+
+class ExecSessionManager:
+    """Cria e acompanha as sessões de exec ligadas a WebSockets
+
+    Protocolo: frames binários são stdin/stdout crus; frames de texto são JSON de
+    controle ({"type": "resize", "cols", "rows"} do cliente; started e exit do servidor).
+    """
+
+    def __init__(self, engine: DockerEngine, max_sessions: int = EXEC_MAX_SESSIONS):
+        self.engine = engine
+        self.api_client = None
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, ExecSession] = {}
+        self.total_sessions = 0
+        # Vagas ocupadas, reservadas antes do primeiro await (sessions só tem as já criadas)
+        self._slots = 0
+
+    def start(self, api_client):
+        self.api_client = api_client
+
+    async def run(self, websocket: WebSocket, container_id: str, cmd: Union[str, List[str]],
+                  user: Optional[str] = None, workdir: Optional[str] = None,
+                  env: Optional[List[str]] = None, cols: int = 80, rows: int = 24):
+        """Atende o WebSocket (já aceito) até o processo ou o cliente terminar"""
+        if self._slots >= self.max_sessions:
+            await websocket.close(code=CLOSE_CODE_TRY_AGAIN, reason="Limite de sessões de exec atingido")
+            return
+
+        self._slots += 1
+        try:
+            await self._serve(websocket, container_id, cmd, user, workdir, env, cols, rows)
+        finally:
+            self._slots -= 1
+
+    async def _serve(self, websocket: WebSocket, container_id: str, cmd: Union[str, List[str]],
+                     user: Optional[str], workdir: Optional[str], env: Optional[List[str]],
+                     cols: int, rows: int):
+        exec_instance = await self.engine.run(
+            "exec", "exec.create", self.api_client.exec_create,
+            container=container_id, cmd=cmd, stdout=True, stderr=True, stdin=True, tty=True,
+            environment=env, workdir=workdir, user=user
+        )
+        session = ExecSession(self.engine, self.api_client, container_id, exec_instance["Id"])
+        self.sessions[session.exec_id] = session
+        self.total_sessions += 1
+
+        try:
+            await session.open()
+            await session.resize(cols, rows)
+            await websocket.send_text(json.dumps({"type": "started", "exec_id": session.exec_id}))
+            logger.info(f"⚡ Sessão de exec {session.exec_id[:12]} aberta no container {container_id}")
+
+            output = asyncio.create_task(self._pump_output(websocket, session))
+            stdin = asyncio.create_task(self._pump_input(websocket, session))
+            done, pending = await asyncio.wait({output, stdin}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                if task.exception():
+                    raise task.exception()
+
+            # Processo terminou (a saída fechou): informar o código e encerrar
+            if output in done:
+                exit_code = await session.exit_code()
+                await websocket.send_text(json.dumps({"type": "exit", "exit_code": exit_code}))
+                await websocket.close()
+        finally:
+            session.close()
+            self.sessions.pop(session.exec_id, None)
+            logger.info(f"🔌 Sessão de exec {session.exec_id[:12]} encerrada "
+                        f"({session.bytes_in} B in, {session.bytes_out} B out)")
+
+    @staticmethod
+    async def _pump_output(websocket: WebSocket, session: ExecSession):
+        # Só lê o próximo bloco depois de enviar o anterior: um cliente lento
+        # segura o processo pelo buffer do socket, não pela memória do serviço
+        async for data in session.output():
+            await websocket.send_bytes(data)
+
+    @staticmethod
+    async def _pump_input(websocket: WebSocket, session: ExecSession):
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+            data = message.get("bytes")
+            if data is not None:
+                for start in range(0, len(data), EXEC_CHUNK_BYTES):
+                    await session.write(data[start:start + EXEC_CHUNK_BYTES])
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                continue
+            # Frames de controle malformados são ignorados, não derrubam a sessão
+            if not isinstance(control, dict):
+                continue
+            if control.get("type") == "resize":
+                try:
+                    cols, rows = int(control.get("cols", 80)), int(control.get("rows", 24))
+                except (TypeError, ValueError):
+                    continue
+                await session.resize(cols, rows)
+            elif control.get("type") == "stdin" and isinstance(control.get("data"), str):
+                await session.write(control["data"].encode())
+
+    async def stop(self):
+        """Fecha os sockets das sessões abertas; cada run() encerra o próprio WebSocket"""
+        for session in list(self.sessions.values()):
+            session.close()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "active": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "total": self.total_sessions,
+            "sessions": [
+                {
+                    "exec_id": session.exec_id,
+                    "container_id": session.container_id,
+                    "bytes_in": session.bytes_in,
+                    "bytes_out": session.bytes_out,
+                }
+                for session in self.sessions.values()
+            ]
+        }
@@ -0,0 +1,322 @@
+"""
+Backends de firewall
+Interface comum para aplicar o conjunto de regras da NetPilot, com as
+implementações iptables (iptables-restore) e nftables (nft -f)
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.system import TrafficAction, TrafficRule
+from services.iptables_restore import (
+    IptablesRestoreCompiler, PORT_PROTOCOLS, RenderedRuleset
+)
+from utils.system import SystemUtils
+
+logger = logging.getLogger(__name__)
+
+FIREWALL_BACKEND = os.getenv("FIREWALL_BACKEND", "iptables")
+NFT_BINARY = os.getenv("NFT_BINARY", "nft")
+NFT_TABLE = "netpilot"
+
+# Erros do nft -f -: "/dev/stdin:12:9-22: Error: ..."
+_NFT_ERROR_LINE = re.compile(r"^[^\n:]*:(\d+):\d+(?:-\d+)?: Error", re.MULTILINE)
+# Identificadores do nft (nomes de meter) não aceitam ':' nem '-' no meio de todo contexto
+_UNSAFE_ID = re.compile(r"[^A-Za-z0-9_]")
+
+# Protocolos que, sem portas, casam qualquer tráfego (como no backend iptables)
+MAP_PROTOCOLS = ("tcp", "all")
+
+VERDICTS = {
+    TrafficAction.ALLOW: "accept",
+    TrafficAction.DENY: "drop",
+    TrafficAction.BLOCK: "drop",
+}
+
+
+def _safe_id(rule: TrafficRule) -> str:
+    """ID da regra restrito a caracteres aceitos em comentários e nomes do nft"""
+    return _UNSAFE_ID.sub("_", rule.rule_id or rule.name)
+
+
+class FirewallBackend(ABC):
+    """Aplica o conjunto completo de regras ativas de uma vez
+
+    apply() recebe o estado desejado inteiro e retorna {rule_id: {success,
+    message}}; regras rejeitadas não impedem as demais. Falhas da transação
+    levantam exceção sem deixar o ruleset pela metade.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def apply(self, rules: List[TrafficRule]) -> Dict[str, Dict[str, Any]]:
+        ...
+
+
+class IptablesBackend(IptablesRestoreCompiler, FirewallBackend):
+    """Chains NETPILOT_* via iptables-restore --noflush"""
+
+    name = "iptables"
+
+
+class NftablesBackend(FirewallBackend):
+    """Tabela 'inet netpilot' compilada em sets/verdict maps e carregada com um único nft -f
+
+    Regras só de origem viram elementos de um vmap por endereço e regras só de
+    porta viram elementos de um vmap protocolo . porta, então o custo no kernel
+    é de uma busca em set, não do tamanho da chain. Combinações (origem e
+    porta, destino, porta de origem, outro protocolo), rate limits e
+    redirecionamentos ficam como regras explícitas. Tudo é avaliado na ordem de
+    prioridade, como no backend iptables.
+    """
+
+    name = "nftables"
+
+    def __init__(self, system_utils: Optional[SystemUtils] = None, binary: str = NFT_BINARY):
+        self.system_utils = system_utils or SystemUtils()
+        self.binary = binary
+        self._lock = asyncio.Lock()
+
+    def render(self, rules: List[TrafficRule]) -> RenderedRuleset:
+        """Script do nft -f: recria a tabela inteira na mesma transação
+
+        A chain segue a ordem de prioridade: regras de map consecutivas formam
+        uma sequência com seus próprios maps, consultados naquela posição, e
+        uma regra explícita (ou uma rede sobreposta à da sequência) abre a próxima.
+        """
+        # Passos da chain input: ("rule", rule_id, linha) ou ("src"|"port", sequência)
+        steps: List[Tuple[Any, ...]] = []
+        runs: List[Dict[str, Any]] = []
+        nat_rules: List[Tuple[str, str]] = []
+        seen_keys = set()
+
+        for rule in sorted(rules, key=lambda r: r.priority):
+            kind, payload = self._classify(rule)
+            if kind == "nat":
+                nat_rules.extend((rule.rule_id, line) for line in payload)
+                continue
+            if kind == "rule":
+                steps.extend(("rule", rule.rule_id, line) for line in payload)
+                continue
+
+            # Mesma chave em duas regras: vale a de maior prioridade (primeira)
+            if payload[0] in seen_keys:
+                continue
+            seen_keys.add(payload[0])
+
+            run = runs[steps[-1][1]] if steps and steps[-1][0] == kind else None
+            if kind == "src":
+                network = ipaddress.ip_network(payload[1])
+                if run is None or self._overlaps(run, network):
+                    run = {"kind": "src", "elements": {4: [], 6: []},
+                           "members": set(), "prefixes": set(), "ancestors": set()}
+                    runs.append(run)
+                    steps.append(("src", len(runs) - 1))
+                run["elements"][network.version].append((rule.rule_id, f"{network} : {payload[2]}"))
+                run["members"].add(str(network))
+                run["prefixes"].add((network.version, network.prefixlen))
+                run["ancestors"].update(
+                    str(network.supernet(new_prefix=prefixlen)) for prefixlen in range(network.prefixlen + 1)
+                )
+            else:
+                if run is None:
+                    run = {"kind": "port", "elements": []}
+                    runs.append(run)
+                    steps.append(("port", len(runs) - 1))
+                protocol, port = payload[1]
+                run["elements"].append((rule.rule_id, f"{protocol} . {port} : {payload[2]}"))
+
+        lines: List[str] = []
+        line_rules: Dict[int, str] = {}
+
+        def emit(text: str, rule_id: Optional[str] = None):
+            lines.append(text)
+            if rule_id:
+                line_rules[len(lines)] = rule_id
+
+        # 'table' antes do 'delete' garante que o delete não falhe na primeira carga
+        emit(f"table inet {NFT_TABLE} {{}}")
+        emit(f"delete table inet {NFT_TABLE}")
+        emit(f"table inet {NFT_TABLE} {{")
+
+        lookups: Dict[int, List[str]] = {}
+        for index, run in enumerate(runs):
+            lookups[index] = []
+            if run["kind"] == "src":
+                for family, addr_type, match in ((4, "ipv4_addr", "ip saddr"), (6, "ipv6_addr", "ip6 saddr")):
+                    if not run["elements"][family]:
+                        continue
+                    name = f"src_v{family}_{index}"
+                    emit(f"\tmap {name} {{")
+                    emit(f"\t\ttype {addr_type} : verdict")
+                    emit("\t\tflags interval")
+                    self._emit_elements(emit, run["elements"][family])
+                    emit("\t}")
+                    lookups[index].append(f"{match} vmap @{name}")
+            else:
+                name = f"ports_{index}"
+                emit(f"\tmap {name} {{")
+                emit("\t\ttype inet_proto . inet_service : verdict")
+                self._emit_elements(emit, run["elements"])
+                emit("\t}")
+                lookups[index].append(f"meta l4proto . th dport vmap @{name}")
+
+        emit("\tchain input {")
+        emit("\t\ttype filter hook input priority filter; policy accept;")
+        for step in steps:
+            if step[0] == "rule":
+                emit(f"\t\t{step[2]}", step[1])
+            else:
+                for line in lookups[step[1]]:
+                    emit(f"\t\t{line}")
+        emit("\t}")
+
+        emit("\tchain prerouting {")
+        emit("\t\ttype nat hook prerouting priority dstnat; policy accept;")
+        for rule_id, line in nat_rules:
+            emit(f"\t\t{line}", rule_id)
+        emit("\t}")
+        emit("}")
+
+        return RenderedRuleset("\n".join(lines) + "\n", line_rules)
+
+    @staticmethod
+    def _overlaps(run: Dict[str, Any], network) -> bool:
+        """Se a rede contém ou está contida em alguma da sequência (intervalos não podem se sobrepor)"""
+        if str(network) in run["ancestors"]:
+            return True
+        return any(
+            str(network.supernet(new_prefix=prefixlen)) in run["members"]
+            for version, prefixlen in run["prefixes"]
+            if version == network.version and prefixlen <= network.prefixlen
+        )
+
+    @staticmethod
+    def _emit_elements(emit, elements: List[Tuple[str, str]]):
+        if not elements:
+            return
+        emit("\t\telements = {")
+        for rule_id, element in elements:
+            emit(f"\t\t\t{element},", rule_id)
+        emit("\t\t}")
+
+    def _classify(self, rule: TrafficRule) -> Tuple[str, Any]:
+        """('src'|'port', (chave, ...)) para elementos de map; ('rule'|'nat', linhas) caso contrário"""
+        has_ports = bool(rule.source_port or rule.destination_port) and rule.protocol in PORT_PROTOCOLS
+        verdict = VERDICTS.get(rule.action)
+
+        # Sem portas, tcp (padrão do modelo) e all não restringem o protocolo; os demais exigem regra explícita
+        if verdict and rule.source_ip and not (has_ports or rule.destination_ip) \
+                and rule.protocol in MAP_PROTOCOLS:
+            network = ipaddress.ip_network(rule.source_ip, strict=False)
+            return "src", (f"src:{network}", str(network), verdict)
+        if verdict and rule.destination_port and not (rule.source_ip or rule.destination_ip or rule.source_port) \
+                and rule.protocol in PORT_PROTOCOLS:
+            key = (rule.protocol, rule.destination_port)
+            return "port", (f"port:{key}", key, verdict)
+
+        match = self._match(rule, has_ports)
+        comment = f'comment "netpilot:{_safe_id(rule)}"'
+
+        if verdict:
+            return "rule", [f"{match} {verdict} {comment}".strip()]
+        if rule.action == TrafficAction.RATE_LIMIT:
+            if not rule.rate_limit:
+                raise ValueError("Configuração de rate limiting não fornecida")
+            limit = int(rule.rate_limit.get("requests_per_minute", 60))
+            burst = int(rule.rate_limit.get("burst", limit))
+            rate = f"limit rate over {limit}/minute burst {burst} packets"
+            # Excedente descartado e o resto aceito, como o par ACCEPT/DROP do iptables
+            accept = f"{match} accept {comment}".strip()
+            if rule.source_ip:
+                return "rule", [f"{match} {rate} drop {comment}", accept]
+            # Sem origem definida o limite vale por IP de origem (meter)
+            meter = f"rl_{_safe_id(rule)}"
+            return "rule", [
+                f"{match} meter {meter}_v4 {{ ip saddr {rate} }} drop {comment}".strip(),
+                f"{match} meter {meter}_v6 {{ ip6 saddr {rate} }} drop {comment}".strip(),
+                accept,
+            ]
+        if rule.action == TrafficAction.REDIRECT:
+            if not rule.redirect_to:
+                raise ValueError("Destino de redirecionamento não fornecido")
+            family = "ip6" if rule.redirect_to.startswith("[") or rule.redirect_to.count(":") > 1 else "ip"
+            return "nat", [f"{match} dnat {family} to {rule.redirect_to} {comment}".strip()]
+        raise ValueError(f"Ação não suportada: {rule.action}")
+
+    @staticmethod
+    def _match(rule: TrafficRule, has_ports: bool) -> str:
+        parts = []
+        for address, direction in ((rule.source_ip, "saddr"), (rule.destination_ip, "daddr")):
+            if address and not (direction == "daddr" and rule.action == TrafficAction.REDIRECT):
+                network = ipaddress.ip_network(address, strict=False)
+                parts.append(f"{'ip' if network.version == 4 else 'ip6'} {direction} {network}")
+        if has_ports:
+            if rule.source_port:
+                parts.append(f"{rule.protocol} sport {rule.source_port}")
+            if rule.destination_port:
+                parts.append(f"{rule.protocol} dport {rule.destination_port}")
+        elif rule.protocol not in MAP_PROTOCOLS:
+            parts.append(f"meta l4proto {rule.protocol}")
+        return " ".join(parts)
+
+    async def apply(self, rules: List[TrafficRule]) -> Dict[str, Dict[str, Any]]:
+        """Valida com 'nft -c', separando regras rejeitadas, e carrega tudo num único 'nft -f'
+
+        O nft aplica o arquivo como uma transação: se a carga falhar, o kernel
+        continua com o ruleset anterior, sem necessidade de snapshot.
+        """
+        async with self._lock:
+            return await self._apply(rules)
+
+    async def _apply(self, rules: List[TrafficRule]) -> Dict[str, Dict[str, Any]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        valid: List[TrafficRule] = []
+        # Nomes de meter e comentários saem do ID sanitizado: dois IDs não podem coincidir nele
+        safe_ids: Dict[str, str] = {}
+        for rule in rules:
+            try:
+                safe_id = _safe_id(rule)
+                if safe_ids.setdefault(safe_id, rule.rule_id) != rule.rule_id:
+                    raise ValueError(f"ID da regra colide com '{safe_ids[safe_id]}' após normalização: {safe_id}")
+                self._classify(rule)
+                valid.append(rule)
+            except ValueError as e:
+                results[rule.rule_id] = {"success": False, "message": str(e)}
+
+        while True:
+            ruleset = self.render(valid)
+            check = await self.system_utils.run_command_with_input([self.binary, "-c", "-f", "-"], ruleset.text)
+            if check.returncode == 0:
+                break
+
+            match = _NFT_ERROR_LINE.search(check.stderr)
+            rule_id = ruleset.line_rules.get(int(match.group(1))) if match else None
+            if rule_id is None:
+                raise Exception(f"{self.binary} -c falhou: {check.stderr.strip()}")
+            results[rule_id] = {"success": False, "message": check.stderr.strip()}
+            valid = [rule for rule in valid if rule.rule_id != rule_id]
+
+        result = await self.system_utils.run_command_with_input([self.binary, "-f", "-"], ruleset.text)
+        if result.returncode != 0:
+            raise Exception(f"{self.binary} -f falhou: {result.stderr.strip()}")
+
+        for rule in valid:
+            results[rule.rule_id] = {"success": True, "message": "Regra aplicada"}
+        return results
+
+
+def create_firewall_backend(system_utils: Optional[SystemUtils] = None,
+                            name: str = FIREWALL_BACKEND) -> FirewallBackend:
+    """Backend configurado em FIREWALL_BACKEND (iptables ou nftables)"""
+    backends = {"iptables": IptablesBackend, "nftables": NftablesBackend}
+    if name not in backends:
+        raise ValueError(f"Backend de firewall desconhecido: {name}")
+    logger.info(f"🧱 Backend de firewall: {name}")
+    return backends[name](system_utils)
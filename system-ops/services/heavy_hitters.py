@@ -0,0 +1,338 @@
+"""
+Detecção de heavy hitters
+Top-N de IPs de origem (conexões e requisições HTTP), portas e caminhos em
+janelas deslizantes (1m, 5m, 1h)
+com memória limitada: count-min sketch para estimar contagens e Space-Saving
+para manter os candidatos, em anéis de buckets por janela
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from utils.connection_table import ConnectionTable, connection_table
+
+logger = logging.getLogger(__name__)
+
+SKETCH_WIDTH = int(os.getenv("HEAVY_HITTERS_WIDTH", "2048"))
+SKETCH_DEPTH = int(os.getenv("HEAVY_HITTERS_DEPTH", "4"))
+TOP_K = int(os.getenv("HEAVY_HITTERS_TOP_K", "64"))
+COLLECT_INTERVAL = float(os.getenv("HEAVY_HITTERS_INTERVAL", "5"))
+ACCESS_LOG = os.getenv(
+    "NGINX_ACCESS_LOG", os.path.join(os.getenv("NGINX_LOG_PATH", "/var/log/nginx"), "access.log")
+)
+# Maior trecho do access log lido por coleta (o restante fica para a próxima)
+ACCESS_LOG_CHUNK_BYTES = 8 * 1024 * 1024
+
+# janela -> (duração em segundos, buckets no anel)
+WINDOWS = {
+    "1m": (60, 6),
+    "5m": (300, 5),
+    "1h": (3600, 12),
+}
+# ip/port: conexões TCP novas; http_ip/path: requisições do access log
+DIMENSIONS = ("ip", "port", "http_ip", "path")
+
+# Formato combined/common do nginx: IP ... [data] "MÉTODO caminho PROTOCOLO" status
+_ACCESS_LINE = re.compile(r'^(\S+) \S+ \S+ \[[^\]]*\] "\S+ ([^" ]+)[^"]*" (\d{3})')
+
+
+def sketch_indexes(key: Hashable, width: int, depth: int) -> List[int]:
+    """Uma posição por linha do sketch, por hash duplo (Kirsch-Mitzenmacher)
+
+    As duas metades de um único hash de 64 bits geram as linhas; hash((linha, chave))
+    não serve, porque chaves que colidem numa linha tendem a colidir em todas.
+    O hash da tupla espalha também inteiros (portas), cujo hash é o próprio valor.
+    """
+    value = hash((key,)) & 0xFFFFFFFFFFFFFFFF
+    low, high = value & 0xFFFFFFFF, (value >> 32) | 1
+    return [(low + row * high) % width for row in range(depth)]
+
+
+class CountMinSketch:
+    """Contagens aproximadas (nunca subestimadas) em width x depth contadores"""
+
+    __slots__ = ("width", "depth", "rows")
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def add(self, indexes: List[int], weight: int = 1):
+        for row, index in zip(self.rows, indexes):
+            row[index] += weight
+
+    def estimate(self, indexes: List[int]) -> int:
+        return min(row[index] for row, index in zip(self.rows, indexes))
+
+
+class SpaceSaving:
+    """Top-k aproximado em capacity entradas (Metwally et al.)
+
+    Uma chave nova com o resumo cheio substitui a de menor contagem e herda
+    essa contagem, então todo item com frequência acima de N/capacity fica.
+    """
+
+    __slots__ = ("capacity", "counts", "_heap")
+
+    def __init__(self, capacity: int = TOP_K):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        # (contagem, chave); contagens só crescem, então entradas antigas ficam abaixo do real
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def add(self, key: Hashable, weight: int = 1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            heapq.heappush(self._heap, (weight, key))
+            return
+
+        count = self.minimum()
+        victim = self._heap[0][1]
+        del counts[victim]
+        counts[key] = count + weight
+        heapq.heapreplace(self._heap, (count + weight, key))
+
+    def full(self) -> bool:
+        return len(self.counts) >= self.capacity
+
+    def minimum(self) -> int:
+        """Menor contagem do resumo (corrige o topo do heap até ele refletir a real)"""
+        heap = self._heap
+        if not heap:
+            return 0
+        while True:
+            count, key = heap[0]
+            actual = self.counts[key]
+            if actual == count:
+                return count
+            heapq.heapreplace(heap, (actual, key))
+
+
+class SlidingTopK:
+    """Uma janela deslizante: anel de buckets, cada um com sketch e Space-Saving"""
+
+    def __init__(self, seconds: int, buckets: int, width: int = SKETCH_WIDTH,
+                 depth: int = SKETCH_DEPTH, capacity: int = TOP_K):
+        self.bucket_seconds = seconds / buckets
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        # slot -> (época do bucket, sketch, candidatos)
+        self.ring: List[Optional[Tuple[int, CountMinSketch, SpaceSaving]]] = [None] * buckets
+
+    def _bucket(self, now: float) -> Tuple[int, CountMinSketch, SpaceSaving]:
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % len(self.ring)
+        bucket = self.ring[slot]
+        if bucket is None or bucket[0] != epoch:
+            bucket = self.ring[slot] = (epoch, CountMinSketch(self.width, self.depth), SpaceSaving(self.capacity))
+        return bucket
+
+    def _live(self, now: float) -> List[Tuple[int, CountMinSketch, SpaceSaving]]:
+        oldest = int(now // self.bucket_seconds) - len(self.ring) + 1
+        return [bucket for bucket in self.ring if bucket is not None and bucket[0] >= oldest]
+
+    def add(self, key: Hashable, indexes: List[int], weight: int, now: float):
+        _, sketch, summary = self._bucket(now)
+        sketch.add(indexes, weight)
+        # Chave nova só entra no resumo cheio se o sketch já a estima acima do mínimo:
+        # numa varredura, milhares de chaves de contagem 1 não expulsam os candidatos reais
+        if key in summary.counts or not summary.full() or sketch.estimate(indexes) > summary.minimum():
+            summary.add(key, weight)
+
+    def estimate(self, indexes: List[int], now: float) -> int:
+        # Soma dos mínimos por bucket: ainda um limite superior, mais justo que o mínimo das somas
+        return sum(sketch.estimate(indexes) for _, sketch, _ in self._live(now))
+
+    def top(self, n: int, now: float) -> List[Tuple[Hashable, int]]:
+        """Candidatos de todos os buckets, ordenados pela estimativa da janela inteira"""
+        live = self._live(now)
+        candidates = set()
+        for _, _, summary in live:
+            candidates.update(summary.counts)
+        scored = []
+        for key in candidates:
+            indexes = sketch_indexes(key, self.width, self.depth)
+            scored.append((key, sum(sketch.estimate(indexes) for _, sketch, _ in live)))
+        return heapq.nlargest(n, scored, key=lambda item: item[1])
+
+
+class HeavyHitters:
+    """Janelas 1m/5m/1h para cada dimensão (ip, port, http_ip, path)
+
+    Memória fixa: dimensões x buckets x (width x depth contadores + TOP_K candidatos),
+    independente de quantas chaves distintas aparecem (varreduras, DDoS).
+    """
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, capacity: int = TOP_K):
+        self.width = width
+        self.depth = depth
+        self.windows: Dict[str, Dict[str, SlidingTopK]] = {
+            dimension: {
+                name: SlidingTopK(seconds, buckets, width, depth, capacity)
+                for name, (seconds, buckets) in WINDOWS.items()
+            }
+            for dimension in DIMENSIONS
+        }
+        self.events = {dimension: 0 for dimension in DIMENSIONS}
+        # Alimentado pela coleta em thread e lido pelas rotas no event loop
+        self._lock = threading.Lock()
+
+    def add(self, dimension: str, key: Hashable, weight: int = 1, now: Optional[float] = None):
+        self.add_many(dimension, {key: weight}, now)
+
+    def add_many(self, dimension: str, counts: Dict[Hashable, int], now: Optional[float] = None):
+        """Registra várias chaves de uma vez (um lock, um instante)"""
+        now = time.time() if now is None else now
+        windows = self.windows[dimension].values()
+        with self._lock:
+            for key, weight in counts.items():
+                if weight <= 0:
+                    continue
+                indexes = sketch_indexes(key, self.width, self.depth)
+                for window in windows:
+                    window.add(key, indexes, weight, now)
+                self.events[dimension] += weight
+
+    def top(self, dimension: str, window: str = "5m", n: int = 10) -> List[Tuple[Hashable, int]]:
+        """Top-N (chave, contagem estimada); ValueError para dimensão ou janela desconhecida"""
+        if dimension not in self.windows:
+            raise ValueError(f"Dimensão desconhecida: {dimension} (use {', '.join(DIMENSIONS)})")
+        if window not in WINDOWS:
+            raise ValueError(f"Janela desconhecida: {window} (use {', '.join(WINDOWS)})")
+        with self._lock:
+            return self.windows[dimension][window].top(n, time.time())
+
+    def estimate(self, dimension: str, key: Hashable, window: str = "5m") -> int:
+        """Contagem estimada de uma chave qualquer na janela (limite superior)"""
+        with self._lock:
+            return self.windows[dimension][window].estimate(
+                sketch_indexes(key, self.width, self.depth), time.time()
+            )
+
+
+class AccessLogTail:
+    """Lê as linhas novas do access log do nginx a cada chamada, seguindo rotações"""
+
+    def __init__(self, path: str = ACCESS_LOG):
+        self.path = path
+        self._file = None
+        self._inode: Optional[int] = None
+        self._partial = b""
+
+    def read_lines(self) -> List[str]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.close()
+            return []
+
+        if self._file is None or stat.st_ino != self._inode or stat.st_size < self._file.tell():
+            start_at_end = self._file is None and self._inode is None
+            self.close()
+            self._file = open(self.path, "rb")
+            self._inode = stat.st_ino
+            # Primeira abertura começa no fim (histórico não entra na janela); após rotação, do início
+            if start_at_end:
+                self._file.seek(0, os.SEEK_END)
+
+        data = self._partial + self._file.read(ACCESS_LOG_CHUNK_BYTES)
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        return [line.decode("utf-8", "replace") for line in lines if line]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._partial = b""
+
+
+class HeavyHitterCollector:
+    """Alimenta o HeavyHitters periodicamente com conexões novas e requisições HTTP
+
+    Conexões (ip, port): conexões de entrada presentes numa leitura de
+    /proc/net/tcp{,6} e ausentes na anterior, pela identidade do socket. Conexões
+    abertas e fechadas entre duas leituras não aparecem. Requisições (http_ip,
+    path): linhas novas do access log.
+    """
+
+    def __init__(self, heavy_hitters: HeavyHitters, connections: ConnectionTable = connection_table,
+                 access_log: Optional[str] = ACCESS_LOG, interval: float = COLLECT_INTERVAL):
+        self.heavy_hitters = heavy_hitters
+        self.connections = connections
+        self.access_log = AccessLogTail(access_log) if access_log else None
+        self.interval = interval
+        self._previous: Optional[FrozenSet[Tuple[str, str]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._collect_loop())
+        logger.info(f"🔥 Coleta de heavy hitters iniciada (intervalo {self.interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.access_log:
+            self.access_log.close()
+
+    async def _collect_loop(self):
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"❌ Erro na coleta de heavy hitters: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def collect(self):
+        snapshot = await self.connections.get_snapshot(max_age=self.interval / 2)
+        await asyncio.to_thread(self._feed, snapshot.inbound)
+
+    def _feed(self, inbound: FrozenSet[Tuple[str, str]]):
+        """Registra conexões novas e requisições (executado em thread)"""
+        now = time.time()
+        # Primeira leitura: as conexões já abertas contam uma vez
+        new = inbound if self._previous is None else inbound - self._previous
+        self._previous = inbound
+
+        ips: Dict[str, int] = {}
+        ports: Dict[int, int] = {}
+        for peer in new:
+            ip, port = self.connections.decode_peer(peer)
+            ips[ip] = ips.get(ip, 0) + 1
+            ports[port] = ports.get(port, 0) + 1
+        self.heavy_hitters.add_many("ip", ips, now)
+        self.heavy_hitters.add_many("port", ports, now)
+
+        if not self.access_log:
+            return
+        ips: Dict[str, int] = {}
+        paths: Dict[str, int] = {}
+        for line in self.access_log.read_lines():
+            match = _ACCESS_LINE.match(line)
+            if not match:
+                continue
+            ip, path = match.group(1), match.group(2).split("?", 1)[0]
+            ips[ip] = ips.get(ip, 0) + 1
+            paths[path] = paths.get(path, 0) + 1
+        self.heavy_hitters.add_many("http_ip", ips, now)
+        self.heavy_hitters.add_many("path", paths, now)
@@ -0,0 +1,256 @@
+"""
+Gerenciador de pulls de imagens
+Um único pull em andamento por referência, compartilhado por todos que pedirem
+a mesma imagem, com progresso por camada lido do stream JSON do daemon
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from docker import auth as docker_auth
+from docker.types.daemon import CancellableStream
+from docker.utils import parse_repository_tag
+
+from services.docker_engine import DockerEngine
+
+logger = logging.getLogger(__name__)
+
+# Quantos pulls concluídos ficam visíveis em get_status()
+RECENT_PULLS = 20
+
+
+def image_reference(repository: str, tag: Optional[str] = None) -> str:
+    """Referência canônica repo:tag ou repo@digest (tag embutida no repositório vence)"""
+    if "@" in repository:
+        return repository
+    last_segment = repository.rsplit("/", 1)[-1]
+    if ":" in last_segment:
+        return repository
+    return f"{repository}:{tag or 'latest'}"
+
+
+class ImagePull:
+    """Estado de um pull: camadas, ouvintes e resultado"""
+
+    def __init__(self, reference: str):
+        self.reference = reference
+        self.status = "queued"
+        self.message = ""
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.layers: Dict[str, Dict[str, Any]] = {}
+        self.waiters = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+        # Ouvinte -> eventos pendentes por chave (camada), só o mais recente de cada
+        self._listeners: List[Dict[str, Any]] = []
+
+    def progress(self) -> Dict[str, int]:
+        """Bytes baixados/total somados entre as camadas com tamanho conhecido"""
+        current = total = 0
+        for layer in self.layers.values():
+            if layer.get("total"):
+                total += layer["total"]
+                current += min(layer.get("current", 0), layer["total"])
+        return {"current": current, "total": total}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "reference": self.reference,
+            "status": self.status,
+            "message": self.message,
+            "error": self.error,
+            "result": self.result,
+            "waiters": self.waiters,
+            "layers": self.layers,
+            "progress": self.progress(),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    async def wait(self) -> Dict[str, Any]:
+        """Aguarda o fim do pull; levanta RuntimeError se falhou"""
+        self.waiters += 1
+        try:
+            await self.done.wait()
+        finally:
+            self.waiters -= 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.result
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """Snapshot inicial e depois eventos (layer, status) até done/error
+
+        Atualizações de uma mesma camada que o ouvinte ainda não consumiu são
+        substituídas pela mais recente, então um cliente lento não acumula memória.
+        """
+        listener: Dict[str, Any] = {"pending": {}, "event": asyncio.Event()}
+        self._listeners.append(listener)
+        self.waiters += 1
+        try:
+            yield {"type": "snapshot", **self.to_dict()}
+            while True:
+                finished = self.done.is_set()
+                if not finished:
+                    await listener["event"].wait()
+                listener["event"].clear()
+                pending, listener["pending"] = listener["pending"], {}
+                for event in pending.values():
+                    yield event
+                if finished:
+                    break
+            if self.error:
+                yield {"type": "error", "reference": self.reference, "detail": self.error}
+            else:
+                yield {"type": "done", "reference": self.reference, **(self.result or {})}
+        finally:
+            self.waiters -= 1
+            self._listeners.remove(listener)
+
+    def _publish(self, key: str, event: Dict[str, Any]):
+        for listener in self._listeners:
+            listener["pending"][key] = event
+            listener["event"].set()
+
+    def apply(self, message: Dict[str, Any]):
+        """Incorpora uma mensagem do stream JSON do /images/create"""
+        if message.get("error"):
+            raise RuntimeError(message.get("errorDetail", {}).get("message") or message["error"])
+
+        self.status = "pulling"
+        layer_id = message.get("id")
+        status = message.get("status", "")
+
+        if layer_id and not status.startswith(("Pulling from", "Digest:", "Status:")):
+            layer = self.layers.setdefault(layer_id, {"id": layer_id})
+            layer["status"] = status
+            detail = message.get("progressDetail") or {}
+            if detail.get("total"):
+                layer["current"] = detail.get("current", 0)
+                layer["total"] = detail["total"]
+            elif status in ("Download complete", "Pull complete", "Already exists") and layer.get("total"):
+                layer["current"] = layer["total"]
+            self._publish(layer_id, {"type": "layer", **layer, "progress": self.progress()})
+        else:
+            self.message = status
+            self._publish("_status", {"type": "status", "message": status})
+
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.result = result
+        self.error = error
+        self.status = "error" if error else "done"
+        self.finished_at = time.time()
+        self.done.set()
+        for listener in self._listeners:
+            listener["event"].set()
+
+
+class ImagePullManager:
+    """Coalesce pulls da mesma referência e limita pulls simultâneos
+
+    O limite é o da categoria "pull" do DockerEngine (DOCKER_LIMIT_PULL): pulls
+    além dele ficam em "queued" até uma vaga abrir.
+    """
+
+    def __init__(self, engine: DockerEngine):
+        self.engine = engine
+        self.client = None
+        self.api_client = None
+        self.pulls: Dict[str, ImagePull] = {}
+        self.recent: Dict[str, ImagePull] = {}
+        self.coalesced = 0
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, client, api_client):
+        self.client = client
+        self.api_client = api_client
+
+    def pull(self, repository: str, tag: Optional[str] = None,
+             auth: Optional[Dict[str, str]] = None) -> ImagePull:
+        """Pull em andamento para a referência, iniciando um se não houver"""
+        reference = image_reference(repository, tag)
+        # Credenciais diferentes não compartilham pull (acesso a repositórios privados)
+        key = f"{reference}|{auth.get('username', '')}" if auth else reference
+
+        current = self.pulls.get(key)
+        if current is not None:
+            self.coalesced += 1
+            logger.info(f"🔗 Pull de {reference} já em andamento, aguardando o mesmo")
+            return current
+
+        pull = self.pulls[key] = ImagePull(reference)
+        self._tasks[key] = asyncio.create_task(self._run(key, pull, auth))
+        return pull
+
+    def _open(self, repository: str, tag: Optional[str], auth: Optional[Dict[str, str]]) -> CancellableStream:
+        """Abre o POST /images/create em stream (executado na thread do stream)
+
+        Como o pull(stream=True) do SDK, mas com a resposta exposta para que o
+        stream possa fechá-la ao cancelar.
+        """
+        api = self.api_client
+        repository, image_tag = parse_repository_tag(repository)
+        if auth is None:
+            header = docker_auth.get_config_header(api, docker_auth.resolve_repository_name(repository)[0])
+        else:
+            header = docker_auth.encode_header(auth)
+        response = api._post(
+            api._url("/images/create"),
+            params={"tag": tag or image_tag or "latest", "fromImage": repository},
+            headers={"X-Registry-Auth": header} if header else {},
+            stream=True, timeout=None,
+        )
+        api._raise_for_status(response)
+        return CancellableStream(api._stream_helper(response, decode=True), response)
+
+    async def _run(self, key: str, pull: ImagePull, auth: Optional[Dict[str, str]]):
+        repository, _, tag = pull.reference.rpartition(":")
+        if "@" in pull.reference or "/" in tag:
+            repository, tag = pull.reference, None
+
+        logger.info(f"⬇️ Iniciando pull de {pull.reference}")
+        try:
+            async for message in self.engine.stream(
+                "images.pull",
+                lambda: self._open(repository, tag, auth),
+                maxsize=256, category="pull"
+            ):
+                pull.apply(message)
+
+            image = await self.engine.run("read", "images.get", self.client.images.get, pull.reference)
+            pull.finish({"image_id": image.id, "tags": image.tags})
+            logger.info(f"✅ Pull de {pull.reference} concluído")
+        except asyncio.CancelledError:
+            pull.finish(error="Pull cancelado")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Erro no pull de {pull.reference}: {e}")
+            pull.finish(error=str(e))
+        finally:
+            self.pulls.pop(key, None)
+            self._tasks.pop(key, None)
+            self.recent.pop(key, None)
+            self.recent[key] = pull
+            while len(self.recent) > RECENT_PULLS:
+                self.recent.pop(next(iter(self.recent)))
+
+    async def stop(self):
+        """Cancela pulls em andamento (encerramento do serviço)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "in_flight": [pull.to_dict() for pull in self.pulls.values()],
+            "recent": [pull.to_dict() for pull in reversed(list(self.recent.values()))],
+            "coalesced": self.coalesced,
+            "limit": self.engine.limits.get("pull"),
+        }
@@ -0,0 +1,269 @@
+"""
+Blocklist de IPs com ipset
+Endereços e redes bloqueados ficam em sets do kernel (hash:ip / hash:net) com
+timeout por entrada, atrás de uma única regra estática por família; o serviço
+mantém um espelho em memória para consultas sem ir ao kernel
+"""
+
+import asyncio
+import heapq
+import ipaddress
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.system import SystemUtils
+
+logger = logging.getLogger(__name__)
+
+IPSET_BINARY = os.getenv("IPSET_BINARY", "ipset")
+IPSET_MAXELEM = int(os.getenv("IPSET_MAXELEM", "262144"))
+
+# Maior timeout aceito pelo ipset (segundos)
+IPSET_MAX_TIMEOUT = 2147483
+
+SET_PREFIX = "NETPILOT_BLOCK"
+
+# família -> (nome do list:set da regra, comando iptables, família do ipset)
+FAMILIES = {
+    4: (f"{SET_PREFIX}4", "iptables", "inet"),
+    6: (f"{SET_PREFIX}6", "ip6tables", "inet6"),
+}
+
+
+def parse_target(value: str) -> Tuple[str, str]:
+    """(entrada normalizada, set de destino) para um IP ou CIDR; ValueError se inválido
+
+    Hosts vão para o hash:ip; redes (bits de host zerados) para o hash:net.
+    """
+    value = value.strip()
+    try:
+        if "/" not in value:
+            address = ipaddress.ip_address(value)
+            return str(address), f"{FAMILIES[address.version][0]}_IP"
+        network = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        raise ValueError(f"Endereço IP inválido: {value}")
+
+    if network.prefixlen == 0:
+        # hash:net não aceita /0; bloquear tudo não é papel do blocklist
+        raise ValueError(f"Rede {network} bloquearia todos os endereços")
+    base = FAMILIES[network.version][0]
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address), f"{base}_IP"
+    return str(network), f"{base}_NET"
+
+
+class BlockEntry:
+    """Entrada do espelho em memória"""
+
+    __slots__ = ("target", "reason", "blocked_at", "expires_at")
+
+    def __init__(self, target: str, reason: str, blocked_at: float, expires_at: Optional[float]):
+        self.target = target
+        self.reason = reason
+        self.blocked_at = blocked_at
+        self.expires_at = expires_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ip_address": self.target,
+            "reason": self.reason,
+            "blocked_at": self.blocked_at,
+            "expires_at": self.expires_at,
+        }
+
+
+class IpBlocklist:
+    """Bloqueios em lote via 'ipset restore', com espelho em memória
+
+    Cada família tem um list:set com um hash:ip e um hash:net; uma regra
+    '-m set --match-set ... src -j DROP' por família aponta para ele, então o
+    custo por pacote não depende de quantos IPs estão bloqueados.
+    """
+
+    def __init__(self, system_utils: Optional[SystemUtils] = None):
+        self.system_utils = system_utils or SystemUtils()
+        self.entries: Dict[str, BlockEntry] = {}
+        # (versão, prefixo) -> quantas redes com esse prefixo, para contains() em O(prefixos)
+        self._prefixes: Dict[Tuple[int, int], int] = {}
+        # (expira em, alvo): heap para expirar o espelho sem varrer todas as entradas
+        self._expiry: List[Tuple[float, str]] = []
+        # Famílias com a regra de DROP instalada (sem ip6tables, só IPv4)
+        self.families = set(FAMILIES)
+        self._ready = False
+        # Primeiras chamadas concorrentes esperam a mesma preparação
+        self._lock = asyncio.Lock()
+
+    async def ensure(self):
+        """Cria sets e regras estáticas (idempotente) e carrega o espelho do kernel"""
+        if self._ready:
+            return
+        async with self._lock:
+            if not self._ready:
+                await self._setup()
+
+    async def _setup(self):
+        lines = []
+        for list_set, _, family in FAMILIES.values():
+            for suffix, set_type in (("_IP", "hash:ip"), ("_NET", "hash:net")):
+                lines.append(f"create {list_set}{suffix} {set_type} family {family} "
+                             f"timeout 0 maxelem {IPSET_MAXELEM}")
+            lines.append(f"create {list_set} list:set")
+            lines.append(f"add {list_set} {list_set}_IP")
+            lines.append(f"add {list_set} {list_set}_NET")
+        await self._restore(lines)
+
+        for version, (list_set, iptables, _) in FAMILIES.items():
+            rule = ["INPUT", "-m", "set", "--match-set", list_set, "src", "-j", "DROP"]
+            check = await self.system_utils.run_command([iptables, "-C", *rule])
+            if check.returncode != 0:
+                result = await self.system_utils.run_command([iptables, "-I", *rule])
+                if result.returncode != 0:
+                    if version == 4:
+                        raise Exception(f"Falha ao criar regra do blocklist ({iptables}): {result.stderr}")
+                    # Host/container sem ip6tables: o blocklist segue só com IPv4
+                    logger.warning(f"⚠️ Blocklist IPv6 desativado ({iptables}): {result.stderr.strip()}")
+                    self.families.discard(version)
+
+        await self._load()
+        self._ready = True
+        logger.info(f"🛡️ Blocklist ipset pronto ({len(self.entries)} entradas)")
+
+    async def add(self, targets: Iterable[str], timeout: Optional[int] = None,
+                  reason: str = "Manual block") -> List[str]:
+        """Bloqueia IPs/redes numa única chamada ao kernel; timeout em segundos"""
+        parsed = [parse_target(target) for target in targets]
+        if not parsed:
+            return []
+        await self.ensure()
+        for key, set_name in parsed:
+            if set_name.startswith(FAMILIES[6][0]) and 6 not in self.families:
+                raise ValueError(f"Bloqueio IPv6 indisponível neste host (sem {FAMILIES[6][1]}): {key}")
+
+        timeout = min(int(timeout), IPSET_MAX_TIMEOUT) if timeout else 0
+        await self._restore_or_reload([f"add {set_name} {key} timeout {timeout}" for key, set_name in parsed])
+
+        now = time.time()
+        expires_at = now + timeout if timeout else None
+        for key, _ in parsed:
+            self._put(BlockEntry(key, reason, now, expires_at))
+        return [key for key, _ in parsed]
+
+    async def remove(self, targets: Iterable[str]) -> List[str]:
+        """Desbloqueia IPs/redes numa única chamada; ignora os que não estão no set"""
+        parsed = [parse_target(target) for target in targets]
+        if not parsed:
+            return []
+        await self.ensure()
+
+        # -exist torna 'del' de entrada ausente (ou já expirada) um no-op
+        await self._restore_or_reload([f"del {set_name} {key}" for key, set_name in parsed])
+
+        return [key for key, _ in parsed if self._drop(key)]
+
+    def contains(self, ip_address: str) -> bool:
+        """Se o IP está bloqueado (por entrada exata ou rede), sem ir ao kernel"""
+        self._expire()
+        address = ipaddress.ip_address(ip_address)
+        if str(address) in self.entries:
+            return True
+        return any(
+            str(ipaddress.ip_network(f"{address}/{prefixlen}", strict=False)) in self.entries
+            for version, prefixlen in self._prefixes
+            if version == address.version
+        )
+
+    def list(self) -> List[Dict[str, Any]]:
+        self._expire()
+        return [entry.to_dict() for entry in self.entries.values()]
+
+    def count(self) -> int:
+        self._expire()
+        return len(self.entries)
+
+    def _expire(self):
+        """Espelha os timeouts do kernel (entradas expiradas somem do set sozinhas)"""
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self.entries.get(key)
+            # Entrada renovada ou removida depois de entrar no heap: ignorar
+            if entry is not None and entry.expires_at == expires_at:
+                self._drop(key)
+
+    def _put(self, entry: BlockEntry):
+        if entry.target not in self.entries and "/" in entry.target:
+            network = ipaddress.ip_network(entry.target)
+            prefix = (network.version, network.prefixlen)
+            self._prefixes[prefix] = self._prefixes.get(prefix, 0) + 1
+        self.entries[entry.target] = entry
+        if entry.expires_at is not None:
+            heapq.heappush(self._expiry, (entry.expires_at, entry.target))
+
+    def _drop(self, key: str) -> bool:
+        if self.entries.pop(key, None) is None:
+            return False
+        if "/" in key:
+            network = ipaddress.ip_network(key)
+            prefix = (network.version, network.prefixlen)
+            self._prefixes[prefix] -= 1
+            if not self._prefixes[prefix]:
+                del self._prefixes[prefix]
+        return True
+
+    async def _load(self):
+        """Reconstrói o espelho a partir do 'ipset save' (bloqueios anteriores ao processo)"""
+        now = time.time()
+        known = dict(self.entries)
+        self.entries.clear()
+        self._prefixes.clear()
+        self._expiry.clear()
+        for list_set, _, _ in FAMILIES.values():
+            for suffix in ("_IP", "_NET"):
+                result = await self.system_utils.run_command([IPSET_BINARY, "save", f"{list_set}{suffix}"])
+                if result.returncode != 0:
+                    continue
+                for target, timeout in self._parse_save(result.stdout):
+                    expires_at = now + timeout if timeout else None
+                    # Entradas já conhecidas mantêm motivo e horário do bloqueio
+                    entry = known.get(target)
+                    reason, blocked_at = (entry.reason, entry.blocked_at) if entry else ("Restored", now)
+                    self._put(BlockEntry(target, reason, blocked_at, expires_at))
+
+    @staticmethod
+    def _parse_save(output: str) -> List[Tuple[str, int]]:
+        entries = []
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) < 3 or parts[0] != "add":
+                continue
+            timeout = 0
+            if "timeout" in parts:
+                index = parts.index("timeout")
+                if index + 1 < len(parts) and parts[index + 1].isdigit():
+                    timeout = int(parts[index + 1])
+            entries.append((parts[2], timeout))
+        return entries
+
+    async def _restore_or_reload(self, lines: List[str]):
+        """_restore; se falhar, relê o espelho do kernel
+
+        O 'ipset restore' para na primeira linha com erro sem desfazer as
+        anteriores (ex.: set cheio no meio do lote), então o kernel pode ter
+        ficado com parte das entradas.
+        """
+        try:
+            await self._restore(lines)
+        except Exception:
+            await self._load()
+            raise
+
+    async def _restore(self, lines: List[str]):
+        """Aplica as linhas numa única transação 'ipset restore -exist'"""
+        result = await self.system_utils.run_command_with_input(
+            [IPSET_BINARY, "restore", "-exist"], "\n".join(lines) + "\n"
+        )
+        if result.returncode != 0:
+            raise Exception(f"Falha no ipset restore: {result.stderr.strip()}")
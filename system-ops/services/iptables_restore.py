@@ -0,0 +1,244 @@
+"""
+Compilador de regras para iptables-restore
+Renderiza o estado desejado das chains NETPILOT e o aplica numa única chamada
+'iptables-restore --noflush' por família, com validação prévia, resultado por
+regra e rollback para o snapshot anterior em caso de falha
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.system import TrafficAction, TrafficRule
+from services.ip_blocklist import SET_PREFIX
+from utils.system import SystemUtils
+
+logger = logging.getLogger(__name__)
+
+# família -> (iptables-restore, iptables-save, iptables)
+FAMILY_BINARIES = {
+    4: (os.getenv("IPTABLES_RESTORE_BINARY", "iptables-restore"),
+        os.getenv("IPTABLES_SAVE_BINARY", "iptables-save"),
+        os.getenv("IPTABLES_BINARY", "iptables")),
+    6: (os.getenv("IP6TABLES_RESTORE_BINARY", "ip6tables-restore"),
+        os.getenv("IP6TABLES_SAVE_BINARY", "ip6tables-save"),
+        os.getenv("IP6TABLES_BINARY", "ip6tables")),
+}
+
+# tabela -> (chain da NetPilot, chain embutida que salta para ela)
+CHAINS = {
+    "filter": ("NETPILOT_INPUT", "INPUT"),
+    "nat": ("NETPILOT_PREROUTING", "PREROUTING"),
+}
+
+PORT_PROTOCOLS = ("tcp", "udp", "sctp")
+
+_ERROR_LINE = re.compile(r"line:? (\d+)", re.IGNORECASE)
+_UNSAFE_COMMENT = re.compile(r"[^A-Za-z0-9_.:\-]")
+
+
+def rule_family(rule: TrafficRule) -> int:
+    """Família da regra pelos endereços (regras sem endereço ficam em IPv4)"""
+    for address in (rule.source_ip, rule.destination_ip):
+        if address:
+            return ipaddress.ip_network(address, strict=False).version
+    return 4
+
+
+def render_rule(rule: TrafficRule) -> Tuple[str, List[str]]:
+    """(tabela, argumentos de cada linha '-A') de uma regra; ValueError se incompleta"""
+    match: List[str] = []
+    if rule.source_ip:
+        match += ["-s", rule.source_ip]
+    if rule.destination_ip and rule.action != TrafficAction.REDIRECT:
+        match += ["-d", rule.destination_ip]
+    # Sem portas, o protocolo padrão (tcp) não restringe a regra, como antes
+    has_ports = bool(rule.source_port or rule.destination_port) and rule.protocol in PORT_PROTOCOLS
+    if rule.protocol and (has_ports or rule.protocol != "tcp"):
+        match += ["-p", rule.protocol]
+    if has_ports:
+        if rule.source_port:
+            match += ["--sport", str(rule.source_port)]
+        if rule.destination_port:
+            match += ["--dport", str(rule.destination_port)]
+    match += ["-m", "comment", "--comment", f"netpilot:{_UNSAFE_COMMENT.sub('_', rule.rule_id or rule.name)}"]
+
+    chain = CHAINS["filter"][0]
+    if rule.action == TrafficAction.ALLOW:
+        return "filter", [" ".join([chain, *match, "-j", "ACCEPT"])]
+    if rule.action in (TrafficAction.DENY, TrafficAction.BLOCK):
+        return "filter", [" ".join([chain, *match, "-j", "DROP"])]
+    if rule.action == TrafficAction.RATE_LIMIT:
+        if not rule.rate_limit:
+            raise ValueError("Configuração de rate limiting não fornecida")
+        limit = int(rule.rate_limit.get("requests_per_minute", 60))
+        burst = int(rule.rate_limit.get("burst", limit))
+        # Dentro do limite aceita; o excedente do mesmo tráfego é descartado
+        return "filter", [
+            " ".join([chain, *match, "-m", "limit", "--limit", f"{limit}/min",
+                      "--limit-burst", str(burst), "-j", "ACCEPT"]),
+            " ".join([chain, *match, "-j", "DROP"]),
+        ]
+    if rule.action == TrafficAction.REDIRECT:
+        if not rule.redirect_to:
+            raise ValueError("Destino de redirecionamento não fornecido")
+        nat_chain = CHAINS["nat"][0]
+        return "nat", [" ".join([nat_chain, *match, "-j", "DNAT", "--to-destination", rule.redirect_to])]
+    raise ValueError(f"Ação não suportada: {rule.action}")
+
+
+class RenderedRuleset:
+    """Texto do iptables-restore e o mapa linha -> regra"""
+
+    def __init__(self, text: str, line_rules: Dict[int, str]):
+        self.text = text
+        self.line_rules = line_rules
+
+
+class IptablesRestoreCompiler:
+    """Aplica o conjunto completo de regras da NetPilot de forma atômica
+
+    Cada aplicação redeclara as chains NETPILOT_* (o que as esvazia com
+    --noflush) e as preenche de novo; as demais chains do sistema não são
+    tocadas. O estado desejado é sempre o conjunto inteiro de regras ativas.
+    """
+
+    def __init__(self, system_utils: Optional[SystemUtils] = None):
+        self.system_utils = system_utils or SystemUtils()
+        self._jumps_checked: Dict[Tuple[int, str], bool] = {}
+        # Famílias que já receberam regras: precisam ser reaplicadas (esvaziadas) mesmo sem regras
+        self._families_used = {4}
+        # Transações serializadas: snapshot, aplicação e rollback não se intercalam
+        self._lock = asyncio.Lock()
+
+    def render(self, rules: List[TrafficRule], jumps: Optional[Dict[str, int]] = None) -> RenderedRuleset:
+        """Uma seção por tabela; jumps dá, por tabela, a posição (1 em diante) onde inserir
+        o salto para a NetPilot na chain embutida, ou 0 se ele já existe"""
+        tables: Dict[str, List[Tuple[str, str]]] = {table: [] for table in CHAINS}
+        for rule in sorted(rules, key=lambda r: r.priority):
+            table, lines = render_rule(rule)
+            tables[table].extend((rule.rule_id, line) for line in lines)
+
+        text: List[str] = []
+        line_rules: Dict[int, str] = {}
+        for table, (chain, builtin) in CHAINS.items():
+            text.append(f"*{table}")
+            text.append(f":{chain} - [0:0]")
+            if jumps and jumps.get(table):
+                text.append(f"-I {builtin} {int(jumps[table])} -j {chain}")
+            for rule_id, line in tables[table]:
+                text.append(f"-A {line}")
+                line_rules[len(text)] = rule_id
+            text.append("COMMIT")
+        return RenderedRuleset("\n".join(text) + "\n", line_rules)
+
+    async def apply(self, rules: List[TrafficRule]) -> Dict[str, Dict[str, Any]]:
+        """Aplica o conjunto de regras; retorna {rule_id: {success, message}}
+
+        Regras que o iptables-restore rejeita em --test são separadas (uma
+        validação por regra inválida) e reportadas; as válidas são aplicadas numa
+        única chamada por família. Se a aplicação real falhar, as chains voltam
+        ao snapshot tirado antes e a exceção é propagada.
+        """
+        async with self._lock:
+            return await self._apply(rules)
+
+    async def _apply(self, rules: List[TrafficRule]) -> Dict[str, Dict[str, Any]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        by_family: Dict[int, List[TrafficRule]] = {4: [], 6: []}
+
+        for rule in rules:
+            try:
+                render_rule(rule)
+                by_family[rule_family(rule)].append(rule)
+            except ValueError as e:
+                results[rule.rule_id] = {"success": False, "message": str(e)}
+
+        snapshots: Dict[int, str] = {}
+        try:
+            for family, family_rules in by_family.items():
+                if not family_rules and family not in self._families_used:
+                    continue
+                self._families_used.add(family)
+                valid = await self._validate(family, family_rules, results)
+                jumps = await self._missing_jumps(family)
+                snapshots[family] = await self._snapshot(family)
+
+                ruleset = self.render(valid, jumps)
+                restore = FAMILY_BINARIES[family][0]
+                result = await self.system_utils.run_command_with_input([restore, "--noflush"], ruleset.text)
+                if result.returncode != 0:
+                    raise Exception(f"{restore} falhou: {result.stderr.strip()}")
+
+                self._jumps_checked.update({(family, table): True for table in CHAINS})
+                for rule in valid:
+                    results[rule.rule_id] = {"success": True, "message": "Regra aplicada"}
+
+        except Exception as e:
+            logger.error(f"❌ Falha ao aplicar regras, restaurando snapshot: {e}")
+            for family, snapshot in snapshots.items():
+                await self._rollback(family, snapshot)
+            raise Exception(f"Transação revertida: {e}")
+        return results
+
+    async def _validate(self, family: int, rules: List[TrafficRule],
+                        results: Dict[str, Dict[str, Any]]) -> List[TrafficRule]:
+        """Remove regras rejeitadas pelo 'iptables-restore --test', registrando o erro"""
+        restore = FAMILY_BINARIES[family][0]
+        valid = list(rules)
+        while valid:
+            ruleset = self.render(valid)
+            result = await self.system_utils.run_command_with_input(
+                [restore, "--test", "--noflush"], ruleset.text
+            )
+            if result.returncode == 0:
+                break
+
+            match = _ERROR_LINE.search(result.stderr)
+            rule_id = ruleset.line_rules.get(int(match.group(1))) if match else None
+            if rule_id is None:
+                # Erro fora das linhas de regra: não há como isolar uma regra culpada
+                raise Exception(f"{restore} --test falhou: {result.stderr.strip()}")
+
+            results[rule_id] = {"success": False, "message": result.stderr.strip()}
+            valid = [rule for rule in valid if rule.rule_id != rule_id]
+        return valid
+
+    async def _missing_jumps(self, family: int) -> Dict[str, int]:
+        """Posição do salto a inserir em cada chain embutida que ainda não o tem (0 = já existe)"""
+        iptables = FAMILY_BINARIES[family][2]
+        missing = {}
+        for table, (chain, builtin) in CHAINS.items():
+            if self._jumps_checked.get((family, table)):
+                continue
+            check = await self.system_utils.run_command([iptables, "-t", table, "-C", builtin, "-j", chain])
+            missing[table] = 0 if check.returncode == 0 else await self._jump_position(iptables, table, builtin)
+        return missing
+
+    async def _jump_position(self, iptables: str, table: str, builtin: str) -> int:
+        """Logo abaixo das regras do blocklist: um ALLOW da NetPilot não pode aceitar IP bloqueado"""
+        result = await self.system_utils.run_command([iptables, "-t", table, "-S", builtin])
+        rules = [line for line in result.stdout.splitlines() if line.startswith(f"-A {builtin} ")]
+        blocklist = [index for index, line in enumerate(rules, 1) if f"--match-set {SET_PREFIX}" in line]
+        return max(blocklist, default=0) + 1
+
+    async def _snapshot(self, family: int) -> str:
+        """Chains NETPILOT_* atuais no formato do iptables-restore"""
+        save = FAMILY_BINARIES[family][1]
+        text: List[str] = []
+        for table, (chain, _) in CHAINS.items():
+            result = await self.system_utils.run_command([save, "-t", table])
+            if result.returncode != 0:
+                raise Exception(f"{save} falhou: {result.stderr.strip()}")
+            rules = [line for line in result.stdout.splitlines() if line.startswith(f"-A {chain} ")]
+            text += [f"*{table}", f":{chain} - [0:0]", *rules, "COMMIT"]
+        return "\n".join(text) + "\n"
+
+    async def _rollback(self, family: int, snapshot: str):
+        restore = FAMILY_BINARIES[family][0]
+        result = await self.system_utils.run_command_with_input([restore, "--noflush"], snapshot)
+        if result.returncode != 0:
+            logger.error(f"❌ Rollback do {restore} falhou: {result.stderr.strip()}")
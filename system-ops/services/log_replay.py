@@ -0,0 +1,44 @@
+"""
+Buffer de replay de logs
+Anel em memória com as últimas linhas de um container, numeradas com uma
+sequência crescente para que clientes reconectados peçam só o que perderam
+"""
+
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Tuple
+
+
+class LogReplayBuffer:
+    """Últimas linhas publicadas de um container"""
+
+    def __init__(self, capacity: int, next_seq: int = 1):
+        self.capacity = capacity
+        self.next_seq = next_seq
+        self.lines: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+
+    @property
+    def first_seq(self) -> int:
+        """Sequência da linha mais antiga retida (next_seq se vazio)"""
+        return self.lines[0]["seq"] if self.lines else self.next_seq
+
+    def extend(self, lines: List[Dict[str, Any]]):
+        """Numera e retém as linhas (in-place, para irem no mesmo frame)"""
+        for line in lines:
+            line["seq"] = self.next_seq
+            self.next_seq += 1
+        self.lines.extend(lines)
+
+    def since(self, seq: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Linhas com sequência maior que seq e quantas já saíram do anel
+
+        seq <= 0 significa cliente sem cursor: recebe o que está retido, sem perdas.
+        """
+        first = self.first_seq
+        if seq <= 0:
+            return list(self.lines), 0
+        if seq + 1 >= self.next_seq:
+            return [], 0
+        if seq + 1 < first:
+            return list(self.lines), first - (seq + 1)
+        return list(islice(self.lines, seq + 1 - first, None)), 0
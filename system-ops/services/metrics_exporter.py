@@ -0,0 +1,227 @@
+"""
+Exportador OpenMetrics
+Gera a exposição em texto (Prometheus/OpenMetrics) diretamente do MetricsStore,
+convertendo os nomes pontuados em famílias com labels
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from services.docker_engine import LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+NAMESPACE = "netpilot"
+
+# Prefixo pontuado -> (prefixo da família, label); o último segmento é o campo
+LABELED_PREFIXES = (
+    ("docker.container.", "docker_container", "container"),
+    ("network.", "network", "interface"),
+    ("service.", "service", "service"),
+    ("process.top_cpu.", "process_top_cpu", "rank"),
+)
+
+# Famílias acumuladas (contadores); as demais são gauges
+COUNTER_FAMILIES = {
+    "network_bytes_sent", "network_bytes_recv",
+    "network_packets_sent", "network_packets_recv",
+}
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_:]")
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def parse_metric_name(metric_name: str) -> Tuple[str, Dict[str, str]]:
+    """Converte 'docker.container.web.cpu_percent' em ('docker_container_cpu_percent', {'container': 'web'})"""
+    for prefix, family_prefix, label in LABELED_PREFIXES:
+        if metric_name.startswith(prefix):
+            # O valor do label pode conter pontos (ex.: interface eth0.100)
+            label_value, _, field = metric_name[len(prefix):].rpartition(".")
+            if label_value and field:
+                return _sanitize(f"{family_prefix}_{field}"), {label: label_value}
+    return _sanitize(metric_name.replace(".", "_")), {}
+
+
+def _sanitize(name: str) -> str:
+    return _INVALID_NAME_CHARS.sub("_", name)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class MetricFamily:
+    """Família de métricas com seus samples"""
+
+    __slots__ = ("name", "type", "help", "samples")
+
+    def __init__(self, name: str, metric_type: str, help_text: str):
+        self.name = name
+        self.type = metric_type
+        self.help = help_text
+        self.samples: List[Sample] = []
+
+    def add(self, value: float, labels: Optional[Dict[str, str]] = None, suffix: str = ""):
+        self.samples.append((suffix, labels or {}, value))
+
+    def render(self, lines: List[str]):
+        full_name = f"{NAMESPACE}_{self.name}"
+        lines.append(f"# TYPE {full_name} {self.type}")
+        lines.append(f"# HELP {full_name} {_escape(self.help)}")
+        for suffix, labels, value in self.samples:
+            lines.append(f"{full_name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+
+class MetricsExporter:
+    """Renderiza /metrics; a parte do MetricsStore é cacheada por tick de coleta"""
+
+    def __init__(self):
+        self._cache_key: Optional[Tuple[int, int]] = None
+        self._cache_text = ""
+        self.render_count = 0
+        self.store_render_count = 0
+
+    def render(self) -> str:
+        """Exposição completa em formato OpenMetrics"""
+        from services.monitoring_service import monitoring_service
+
+        self.render_count += 1
+        store = monitoring_service.metrics_store
+
+        cache_key = (monitoring_service.collection_count, store.head)
+        if cache_key != self._cache_key:
+            self._cache_text = self._render_store(store)
+            self._cache_key = cache_key
+            self.store_render_count += 1
+
+        lines: List[str] = []
+        for family in self._internal_families(monitoring_service):
+            family.render(lines)
+        lines.append("# EOF")
+
+        return self._cache_text + "\n".join(lines) + "\n"
+
+    def _render_store(self, store) -> str:
+        """Último valor de cada métrica ainda coletada
+
+        Vale o tick atual ou o anterior (a coleta do atual pode estar em andamento);
+        séries mais antigas, como as de containers removidos, não são exportadas.
+        """
+        families: Dict[str, MetricFamily] = {}
+        if not store.size:
+            return ""
+        cutoff = store.timestamps[(store.head - 1) % store.capacity if store.size > 1 else store.head]
+
+        for metric_name in store.names():
+            latest = store.latest(metric_name)
+            if latest is None or latest[0] < cutoff:
+                continue
+
+            family_name, labels = parse_metric_name(metric_name)
+            family = families.get(family_name)
+            if family is None:
+                metric_type = "counter" if family_name in COUNTER_FAMILIES else "gauge"
+                family = families[family_name] = MetricFamily(
+                    family_name, metric_type, f"Métrica {family_name} coletada pelo monitoramento"
+                )
+            family.add(latest[1], labels, "_total" if family.type == "counter" else "")
+
+        lines: List[str] = []
+        for family in families.values():
+            family.render(lines)
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def _internal_families(self, monitoring_service) -> List[MetricFamily]:
+        """Contadores internos: coleta, API Docker e WebSockets"""
+        from services.docker_service import docker_service
+        from services.websocket_service import connection_manager
+
+        families = []
+
+        # Loop de coleta
+        runs = MetricFamily("collection_runs", "counter", "Execuções do loop de coleta")
+        runs.add(monitoring_service.collection_count, suffix="_total")
+        errors = MetricFamily("collection_errors", "counter", "Execuções do loop de coleta com erro")
+        errors.add(monitoring_service.collection_errors, suffix="_total")
+        duration = MetricFamily("collection_duration_seconds", "gauge", "Duração da última coleta")
+        duration.add(monitoring_service.last_collection_seconds)
+        duration_total = MetricFamily("collection_seconds", "counter", "Tempo total gasto em coletas")
+        duration_total.add(monitoring_service.collection_seconds_total, suffix="_total")
+        families.extend([runs, errors, duration, duration_total])
+
+        # Latência da API Docker
+        engine = docker_service.engine
+        latency = MetricFamily("docker_api_request_duration_seconds", "histogram",
+                               "Latência das chamadas à API Docker")
+        api_errors = MetricFamily("docker_api_errors", "counter", "Chamadas à API Docker com erro")
+        for operation, stats in sorted(engine.latency.items()):
+            labels = {"operation": operation, "category": stats.category}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                latency.add(cumulative, {**labels, "le": str(bound)}, "_bucket")
+            latency.add(stats.count, {**labels, "le": "+Inf"}, "_bucket")
+            latency.add(stats.count, labels, "_count")
+            latency.add(stats.total_seconds, labels, "_sum")
+            api_errors.add(stats.errors, labels, "_total")
+
+        in_flight = MetricFamily("docker_api_in_flight", "gauge", "Chamadas à API Docker em andamento")
+        in_use: Dict[str, int] = {category: 0 for category in engine.limits}
+        for stats in engine.latency.values():
+            in_use[stats.category] = in_use.get(stats.category, 0) + stats.in_flight
+        for category, count in in_use.items():
+            in_flight.add(count, {"category": category})
+
+        streams = MetricFamily("docker_streams_active", "gauge", "Streams da API Docker abertos")
+        for operation, count in engine.active_streams.items():
+            streams.add(count, {"operation": operation})
+        families.extend([latency, api_errors, in_flight, streams])
+
+        # Clientes WebSocket
+        clients = MetricFamily("websocket_clients", "gauge", "Clientes WebSocket conectados")
+        for stream, count in connection_manager.get_client_counts().items():
+            clients.add(count, {"stream": stream})
+        families.append(clients)
+
+        hub_metrics = connection_manager.hub.get_metrics()
+        frames = MetricFamily("websocket_frames", "counter", "Mensagens WebSocket por destino")
+        for outcome in ("sent", "dropped", "coalesced"):
+            frames.add(hub_metrics[outcome], {"outcome": outcome}, "_total")
+        lag = MetricFamily("websocket_client_lag_seconds", "gauge",
+                           "Maior atraso de envio entre os clientes do tópico")
+        depth = MetricFamily("websocket_client_queue_depth", "gauge",
+                             "Maior fila de envio entre os clientes do tópico")
+        for topic, topic_metrics in hub_metrics["topics"].items():
+            lag.add(topic_metrics["max_lag_seconds"], {"topic": topic})
+            depth.add(topic_metrics["max_depth"], {"topic": topic})
+        families.extend([frames, lag, depth])
+
+        # Exportador
+        renders = MetricFamily("metrics_scrapes", "counter", "Requisições a /metrics")
+        renders.add(self.render_count, suffix="_total")
+        families.append(renders)
+
+        return families
+
+
+# Instância global do exportador
+metrics_exporter = MetricsExporter()
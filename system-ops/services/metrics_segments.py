@@ -0,0 +1,269 @@
+"""
+Persistência de métricas em segmentos mapeados em memória
+Um arquivo por dia (AAAAMMDD.seg) com registros float64 de largura fixa, em
+uma região contígua por métrica, e um índice (AAAAMMDD.idx) com os nomes na
+ordem das regiões. Regiões novas só são acrescentadas ao fim do arquivo
+"""
+
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from services.metrics_store import downsample
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b"NPMETR01"
+# magic, versão, step (s), início do bloco (epoch), slots por região
+SEGMENT_HEADER = struct.Struct("<8sIIqq")
+SEGMENT_SECONDS = 86400
+NAN_RECORD = struct.pack("<d", float("nan"))
+
+
+class Segment:
+    """Segmento de um dia: uma região de 'slots' valores float64 por métrica"""
+
+    def __init__(self, path: str, block_start: int, step: int, create: bool = False):
+        self.path = path
+        self.index_path = path[:-4] + ".idx"
+        self.regions: Dict[str, int] = {}
+
+        if create and not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, 1, step, block_start, SEGMENT_SECONDS // step))
+
+        self._file = open(path, "r+b" if create else "rb")
+        magic, _, self.step, self.block_start, self.slots = SEGMENT_HEADER.unpack(
+            self._file.read(SEGMENT_HEADER.size)
+        )
+        if magic != SEGMENT_MAGIC:
+            self._file.close()
+            raise ValueError(f"Segmento inválido: {path}")
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for region, line in enumerate(f):
+                    self.regions[line.rstrip("\n")] = region
+
+        self.writable = create
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        self._map()
+
+    def _map(self):
+        """(Re)mapeia o arquivo inteiro; os valores são vistos como float64 sem cópia"""
+        self._unmap()
+        size = os.fstat(self._file.fileno()).st_size
+        expected = SEGMENT_HEADER.size + len(self.regions) * self.slots * 8
+        if size < expected:
+            # Índice à frente dos dados (escrita interrompida): ignorar regiões incompletas
+            complete = max(size - SEGMENT_HEADER.size, 0) // (self.slots * 8)
+            self.regions = {name: region for name, region in self.regions.items() if region < complete}
+            # O índice no disco também: regiões novas são numeradas por len(self.regions)
+            if self.writable:
+                self._rewrite_index()
+        if size <= SEGMENT_HEADER.size:
+            return
+
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        self._mmap = mmap.mmap(self._file.fileno(), size, access=access)
+        self._view = memoryview(self._mmap)[SEGMENT_HEADER.size:].cast("d")
+
+    def _rewrite_index(self):
+        """Regrava o .idx com as regiões conhecidas, na ordem (troca atômica)"""
+        names = sorted(self.regions, key=self.regions.get)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(f"{name}\n" for name in names)
+        os.replace(tmp_path, self.index_path)
+
+    def _unmap(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _add_region(self, name: str) -> int:
+        """Acrescenta uma região (preenchida com NaN) ao fim do arquivo"""
+        region = len(self.regions)
+        self._file.seek(SEGMENT_HEADER.size + region * self.slots * 8)
+        self._file.write(NAN_RECORD * self.slots)
+        self._file.flush()
+        with open(self.index_path, "a") as f:
+            f.write(f"{name}\n")
+        self.regions[name] = region
+        return region
+
+    def write(self, epoch: int, values: Dict[str, float]):
+        """Grava os valores de um tick"""
+        slot = (epoch - self.block_start) // self.step
+        if not 0 <= slot < self.slots:
+            return
+
+        new_names = [name for name in values if name not in self.regions]
+        for name in new_names:
+            self._add_region(name)
+        if new_names or self._view is None:
+            self._map()
+
+        for name, value in values.items():
+            self._view[self.regions[name] * self.slots + slot] = value
+
+    def read(self, name: str, start: float, end: float) -> List[Tuple[int, float]]:
+        """Pontos da métrica no intervalo (fatia direta do mapeamento)"""
+        region = self.regions.get(name)
+        if region is None or self._view is None:
+            return []
+
+        first = max(0, math.ceil((start - self.block_start) / self.step))
+        last = min(self.slots, math.floor((end - self.block_start) / self.step) + 1)
+        if first >= last:
+            return []
+
+        base = region * self.slots
+        values = self._view[base + first:base + last]
+        return [
+            (self.block_start + (first + offset) * self.step, value)
+            for offset, value in enumerate(values)
+            if value == value  # descarta NaN
+        ]
+
+    def close(self):
+        if self._mmap is not None and self.writable:
+            self._mmap.flush()
+        self._unmap()
+        self._file.close()
+
+
+class SegmentStore:
+    """Histórico de métricas em disco, organizado em segmentos diários"""
+
+    def __init__(self, directory: str, step: int = 60, retention_days: int = 30, max_open: int = 8):
+        self.directory = directory
+        self.step = step
+        self.retention_days = retention_days
+        self.max_open = max_open
+
+        self._segments: "OrderedDict[int, Optional[Segment]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def write_tick(self, epoch: int, values: Dict[str, float]):
+        """Persiste os valores de um tick de coleta"""
+        with self._lock:
+            segment = self._get_segment(epoch - epoch % SEGMENT_SECONDS, create=True)
+            segment.write(epoch, values)
+
+            if time.time() - self._last_cleanup > 3600:
+                self._cleanup()
+
+    def read(self, name: str, start: float, end: float) -> List[Tuple[int, float]]:
+        """Pontos da métrica no intervalo, de todos os segmentos envolvidos"""
+        points = []
+        block = int(start) - int(start) % SEGMENT_SECONDS
+        with self._lock:
+            while block <= end:
+                segment = self._get_segment(block)
+                if segment:
+                    points.extend(segment.read(name, start, end))
+                block += SEGMENT_SECONDS
+        return points
+
+    def query(self, name: str, start: float, end: float, step: int,
+              aggregation: str = "avg") -> List[Tuple[int, float]]:
+        """Pontos da métrica reagrupados em intervalos de 'step' segundos"""
+        points = self.read(name, start, end)
+        if step <= self.step:
+            return points
+        return downsample([(epoch, value, value, value, 1, value) for epoch, value in points], step, aggregation)
+
+    def names(self, start: float, end: float) -> List[str]:
+        """Métricas com dados nos segmentos do intervalo"""
+        names: Dict[str, None] = {}
+        block = int(start) - int(start) % SEGMENT_SECONDS
+        with self._lock:
+            while block <= end:
+                segment = self._get_segment(block)
+                if segment:
+                    names.update(dict.fromkeys(segment.regions))
+                block += SEGMENT_SECONDS
+        return list(names)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                if segment:
+                    segment.close()
+            self._segments.clear()
+
+    def get_status(self) -> Dict[str, object]:
+        files = [name for name in os.listdir(self.directory) if name.endswith(".seg")]
+        return {
+            "directory": self.directory,
+            "segments": len(files),
+            "bytes": sum(os.path.getsize(os.path.join(self.directory, name)) for name in files),
+            "retention_days": self.retention_days
+        }
+
+    def _segment_path(self, block_start: int) -> str:
+        day = datetime.fromtimestamp(block_start, tz=timezone.utc).strftime("%Y%m%d")
+        return os.path.join(self.directory, f"{day}.seg")
+
+    def _get_segment(self, block_start: int, create: bool = False) -> Optional[Segment]:
+        """Segmento do bloco (cache LRU de arquivos abertos)"""
+        segment = self._segments.get(block_start)
+        if segment is not None and (segment.writable or not create):
+            self._segments.move_to_end(block_start)
+            return segment
+
+        if segment is not None:
+            # Aberto só para leitura; reabrir para escrita
+            segment.close()
+
+        path = self._segment_path(block_start)
+        if not create and not os.path.exists(path):
+            return None
+
+        try:
+            segment = Segment(path, block_start, self.step, create=create)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"⚠️ Segmento de métricas ignorado ({path}): {e}")
+            if create:
+                raise
+            return None
+
+        self._segments[block_start] = segment
+        while len(self._segments) > self.max_open:
+            _, evicted = self._segments.popitem(last=False)
+            if evicted:
+                evicted.close()
+        return segment
+
+    def _cleanup(self):
+        """Remove segmentos fora da retenção"""
+        self._last_cleanup = time.time()
+        cutoff = self._segment_path(int(time.time()) - self.retention_days * SEGMENT_SECONDS)
+        cutoff_name = os.path.basename(cutoff)
+
+        for name in os.listdir(self.directory):
+            if name.endswith((".seg", ".idx")) and name[:8] < cutoff_name[:8]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError as e:
+                    logger.warning(f"⚠️ Erro ao remover segmento {name}: {e}")
+
+        for block_start in [block for block in self._segments if self._segment_path(block) < cutoff]:
+            segment = self._segments.pop(block_start)
+            if segment:
+                segment.close()
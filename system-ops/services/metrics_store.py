@@ -0,0 +1,316 @@
+"""
+Armazenamento de séries temporais em memória
+Buffers circulares colunares: uma coluna de timestamps (int64, epoch) por tick
+de coleta compartilhada por todas as métricas e uma coluna float64 por métrica,
+com agregados (rollups) de 5min e 1h atualizados a cada ponto
+"""
+
+import math
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+NAN = float("nan")
+
+# Níveis de agregação: (resolução em segundos, quantidade de buckets)
+DEFAULT_ROLLUP_TIERS = (
+    (300, 2016),   # 5min por 7 dias
+    (3600, 720),   # 1h por 30 dias
+)
+
+AGGREGATIONS = ("avg", "min", "max", "last")
+
+# Ponto agregado: (timestamp, min, max, soma, contagem, último)
+Aggregate = Tuple[int, float, float, float, int, float]
+
+
+def _aggregate_value(point: Aggregate, aggregation: str) -> float:
+    """Valor final de um ponto agregado"""
+    _, minimum, maximum, total, count, last = point
+    if aggregation == "min":
+        return minimum
+    if aggregation == "max":
+        return maximum
+    if aggregation == "last":
+        return last
+    return total / count
+
+
+def downsample(points: List[Aggregate], step: int, aggregation: str = "avg") -> List[Tuple[int, float]]:
+    """Reagrupa pontos agregados em intervalos de 'step' segundos"""
+    result = []
+    current = None
+    for point in points:
+        bucket = point[0] - point[0] % step
+        if current and current[0] == bucket:
+            current = (bucket, min(current[1], point[1]), max(current[2], point[2]),
+                       current[3] + point[3], current[4] + point[4], point[5])
+        else:
+            if current:
+                result.append((current[0], _aggregate_value(current, aggregation)))
+            current = (bucket,) + tuple(point[1:])
+    if current:
+        result.append((current[0], _aggregate_value(current, aggregation)))
+    return result
+
+
+class RollupTier:
+    """Buffer circular de agregados (min/max/soma/contagem/último) por bucket"""
+
+    FIELDS = 5
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.buckets = array("q", bytes(8 * capacity))
+        # Colunas intercaladas: [min, max, soma, contagem, último] por bucket
+        self.series: Dict[str, array] = {}
+
+        self.head = -1
+        self.size = 0
+        self._empty_column = array("d", [NAN, NAN, 0.0, 0.0, NAN]) * capacity
+
+        # Buckets abertos e último bucket com ponto por métrica (séries esgotadas são descartadas)
+        self.opened = 0
+        self._written: Dict[str, int] = {}
+
+    def advance(self, epoch: int):
+        """Abre o bucket que contém o timestamp, se ainda não aberto"""
+        bucket = epoch - epoch % self.resolution
+        if self.size and bucket <= self.buckets[self.head]:
+            return
+
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.buckets[self.head] = bucket
+        self.opened += 1
+
+        offset = self.head * self.FIELDS
+        for name, column in list(self.series.items()):
+            if self.opened - self._written[name] >= self.capacity:
+                del self.series[name]
+                del self._written[name]
+            else:
+                column[offset:offset + self.FIELDS] = self._empty_column[:self.FIELDS]
+
+    def add(self, name: str, value: float):
+        """Incorpora um ponto ao bucket atual"""
+        column = self.series.get(name)
+        if column is None:
+            column = self.series[name] = array("d", self._empty_column)
+        self._written[name] = self.opened
+
+        offset = self.head * self.FIELDS
+        if column[offset + 3]:
+            column[offset] = min(column[offset], value)
+            column[offset + 1] = max(column[offset + 1], value)
+        else:
+            column[offset] = value
+            column[offset + 1] = value
+        column[offset + 2] += value
+        column[offset + 3] += 1
+        column[offset + 4] = value
+
+    def oldest_timestamp(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return self.buckets[(self.head - self.size + 1) % self.capacity]
+
+    def range(self, name: str, start: float, end: float) -> List[Aggregate]:
+        """Buckets da métrica com start <= início do bucket <= end"""
+        column = self.series.get(name)
+        if column is None:
+            return []
+
+        points = []
+        for logical in range(self.size):
+            index = (self.head - self.size + 1 + logical) % self.capacity
+            bucket = self.buckets[index]
+            if bucket < start - self.resolution + 1:
+                continue
+            if bucket > end:
+                break
+            offset = index * self.FIELDS
+            count = int(column[offset + 3])
+            if count:
+                points.append((bucket, column[offset], column[offset + 1],
+                               column[offset + 2], count, column[offset + 4]))
+        return points
+
+    def memory_bytes(self) -> int:
+        item_bytes = self.buckets.itemsize * self.capacity
+        return item_bytes + sum(column.itemsize * len(column) for column in self.series.values())
+
+
+class MetricsStore:
+    """Buffer circular colunar de métricas (~8 bytes por ponto)"""
+
+    def __init__(self, capacity: int = 1440, resolution: int = 60, rollup_tiers=DEFAULT_ROLLUP_TIERS):
+        self.capacity = capacity
+        self.resolution = resolution
+        self.tiers = [RollupTier(tier_resolution, tier_capacity)
+                      for tier_resolution, tier_capacity in rollup_tiers]
+        self.timestamps = array("q", bytes(8 * capacity))
+        self.series: Dict[str, array] = {}
+
+        # Posição do tick atual e quantidade de ticks válidos
+        self.head = -1
+        self.size = 0
+        self._empty_column = array("d", [NAN]) * capacity
+
+        # Ticks abertos desde o início e último tick gravado por métrica: uma série
+        # sem gravação há 'capacity' ticks não tem mais valores no anel e é descartada
+        self.ticks = 0
+        self._written: Dict[str, int] = {}
+
+    def begin_tick(self, timestamp: float) -> int:
+        """Abre um novo tick; as métricas gravadas a seguir compartilham o timestamp"""
+        epoch = int(timestamp)
+        if self.size and epoch <= self.timestamps[self.head]:
+            # Coletas no mesmo segundo caem no mesmo tick
+            return self.head
+
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.timestamps[self.head] = epoch
+        self.ticks += 1
+
+        # Slot reaproveitado: limpar o valor antigo de todas as métricas
+        for name, column in list(self.series.items()):
+            if self.ticks - self._written[name] >= self.capacity:
+                # Ex.: container removido; a coluna inteira (8 bytes x capacity) é liberada
+                del self.series[name]
+                del self._written[name]
+            else:
+                column[self.head] = NAN
+
+        for tier in self.tiers:
+            tier.advance(epoch)
+
+        return self.head
+
+    def record(self, name: str, value: float):
+        """Grava o valor da métrica no tick atual"""
+        if self.head < 0:
+            self.begin_tick(time.time())
+
+        column = self.series.get(name)
+        if column is None:
+            column = self.series[name] = array("d", self._empty_column)
+        column[self.head] = value
+        self._written[name] = self.ticks
+
+        for tier in self.tiers:
+            tier.add(name, value)
+
+    def names(self) -> List[str]:
+        """Métricas conhecidas"""
+        return list(self.series)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.series
+
+    def latest(self, name: str) -> Optional[Tuple[int, float]]:
+        """Último ponto gravado da métrica"""
+        column = self.series.get(name)
+        if column is None:
+            return None
+
+        for offset in range(self.size):
+            index = (self.head - offset) % self.capacity
+            value = column[index]
+            if not math.isnan(value):
+                return self.timestamps[index], value
+        return None
+
+    def range(self, name: str, start: float, end: float) -> List[Tuple[int, float]]:
+        """Pontos da métrica com start <= timestamp <= end"""
+        column = self.series.get(name)
+        if column is None or not self.size:
+            return []
+        return [(self.timestamps[i], column[i]) for i in self._slots(start, end)
+                if not math.isnan(column[i])]
+
+    def tick_values(self) -> Dict[str, float]:
+        """Valores gravados no tick atual"""
+        if self.head < 0:
+            return {}
+        values = {}
+        for name, column in self.series.items():
+            value = column[self.head]
+            if not math.isnan(value):
+                values[name] = value
+        return values
+
+    def covers(self, epoch: float) -> bool:
+        """Indica se algum nível em memória alcança o timestamp"""
+        for level in [self] + self.tiers:
+            oldest = level.oldest_timestamp()
+            if oldest is not None and oldest <= epoch:
+                return True
+        return False
+
+    def oldest_timestamp(self) -> Optional[int]:
+        """Timestamp do tick mais antigo ainda em memória"""
+        if not self.size:
+            return None
+        return self.timestamps[self._physical(0)]
+
+    def query(self, name: str, start: float, end: float, step: int,
+              aggregation: str = "avg") -> List[Tuple[int, float]]:
+        """Série da métrica no intervalo, agregada em pontos de 'step' segundos
+
+        Usa o nível mais grosso cuja resolução não excede 'step' e que ainda
+        cobre o início do intervalo; o restante é reagrupado a partir dele.
+        """
+        step = max(int(step), self.resolution)
+        levels = [(self.resolution, self)] + [(tier.resolution, tier) for tier in self.tiers]
+
+        def covers(level) -> bool:
+            oldest = level.oldest_timestamp()
+            return oldest is not None and oldest <= start
+
+        eligible = [level for resolution, level in levels if resolution <= step]
+        chosen = next((level for level in reversed(eligible) if covers(level)), None)
+        if chosen is None:
+            # Nenhum nível fino cobre o intervalo: usar o de maior retenção
+            chosen = next((level for _, level in levels if covers(level)), levels[-1][1])
+
+        if chosen is self:
+            points = [(epoch, value, value, value, 1, value) for epoch, value in self.range(name, start, end)]
+            resolution = self.resolution
+        else:
+            points = chosen.range(name, start, end)
+            resolution = chosen.resolution
+
+        if step <= resolution:
+            return [(point[0], _aggregate_value(point, aggregation)) for point in points]
+        return downsample(points, step, aggregation)
+
+    def memory_bytes(self) -> int:
+        """Memória ocupada pelas colunas (incluindo os agregados)"""
+        item_bytes = self.timestamps.itemsize * self.capacity
+        raw_bytes = item_bytes + sum(column.itemsize * self.capacity for column in self.series.values())
+        return raw_bytes + sum(tier.memory_bytes() for tier in self.tiers)
+
+    def _physical(self, logical: int) -> int:
+        """Converte a posição lógica (0 = mais antigo) em índice no buffer"""
+        return (self.head - self.size + 1 + logical) % self.capacity
+
+    def _bisect(self, epoch: float) -> int:
+        """Primeira posição lógica com timestamp >= epoch (busca binária)"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self._physical(middle)] < epoch:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _slots(self, start: float, end: float) -> Iterator[int]:
+        """Índices físicos dos ticks no intervalo, em ordem cronológica"""
+        first = self._bisect(start)
+        last = self._bisect(math.floor(end) + 1)
+        for logical in range(first, last):
+            yield self._physical(logical)
@@ -5,12 +5,13 @@ Sistema completo para coleta de métricas, alertas e dashboards
 
 import asyncio
 import logging
+import math
+import os
 import psutil
 import time
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
-from collections import defaultdict, deque
 
 from models.monitoring import (
     SystemMetrics, NetworkMetrics, ProcessMetrics, ServiceMetrics,
@@ -19,6 +20,11 @@ from models.monitoring import (
     MetricsRequest, AlertsRequest, MonitoringResponse
 )
 from services.docker_service import docker_service
+from services.metrics_store import MetricsStore
+from services.metrics_segments import SegmentStore
+from services.alert_engine import AlertEngine
+from services.system_sampler import system_sampler
+from utils.process_table import process_table
 from utils.callbacks import callback_manager
 
 logger = logging.getLogger(__name__)
@@ -27,9 +33,11 @@ class MonitoringService:
     """Serviço principal de monitoramento"""
 
     def __init__(self):
-        self.metrics_storage: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1440))  # 24h com 1min
-        self.active_alerts: Dict[str, Alert] = {}
-        self.alert_rules: Dict[str, AlertRule] = {}
+        # Regras indexadas por métrica, avaliadas a cada ponto coletado
+        self.alert_engine = AlertEngine()
+        self.active_alerts: Dict[str, Alert] = self.alert_engine.active_alerts
+        self.alert_rules: Dict[str, AlertRule] = self.alert_engine.rules
+        self._pending_alerts: List[Alert] = []
         self.health_checks: Dict[str, HealthCheck] = {}
 
         # Configurações
@@ -37,9 +45,25 @@ class MonitoringService:
         self.retention_hours = 24
         self.is_running = False
 
+        # Séries temporais em buffers circulares (24h com 1min, agregados de 5min e 1h)
+        self.metrics_store = MetricsStore(
+            capacity=self.retention_hours * 3600 // self.collection_interval,
+            resolution=self.collection_interval
+        )
+
+        # Histórico persistente em disco (desativado com METRICS_DATA_DIR vazio)
+        self.metrics_data_dir = os.getenv("METRICS_DATA_DIR", "/var/lib/netpilot/metrics")
+        self.metrics_retention_days = int(os.getenv("METRICS_RETENTION_DAYS", 30))
+        self.metrics_segments: Optional[SegmentStore] = None
+
+        # Duração das coletas (exportada em /metrics)
+        self.collection_count = 0
+        self.collection_errors = 0
+        self.collection_seconds_total = 0.0
+        self.last_collection_seconds = 0.0
+
         # Tarefas assíncronas
         self.metrics_task: Optional[asyncio.Task] = None
-        self.alerts_task: Optional[asyncio.Task] = None
 
         # Inicializar regras de alerta padrão
         self._setup_default_alert_rules()
@@ -51,9 +75,18 @@ class MonitoringService:
 
             self.is_running = True
 
+            if self.metrics_data_dir and not self.metrics_segments:
+                try:
+                    self.metrics_segments = SegmentStore(
+                        self.metrics_data_dir,
+                        step=self.collection_interval,
+                        retention_days=self.metrics_retention_days
+                    )
+                except OSError as e:
+                    logger.warning(f"⚠️ Persistência de métricas desativada ({self.metrics_data_dir}): {e}")
+
             # Iniciar tarefas de coleta
             self.metrics_task = asyncio.create_task(self._metrics_collection_loop())
-            self.alerts_task = asyncio.create_task(self._alert_evaluation_loop())
 
             logger.info("✅ Serviço de monitoramento iniciado")
 
@@ -71,8 +104,10 @@ class MonitoringService:
             # Cancelar tarefas
             if self.metrics_task:
                 self.metrics_task.cancel()
-            if self.alerts_task:
-                self.alerts_task.cancel()
+
+            if self.metrics_segments:
+                self.metrics_segments.close()
+                self.metrics_segments = None
 
             logger.info("✅ Serviço de monitoramento parado")
 
@@ -86,7 +121,11 @@ class MonitoringService:
     async def _metrics_collection_loop(self):
         """Loop principal de coleta de métricas"""
         while self.is_running:
+            started = time.perf_counter()
             try:
+                # Todas as métricas desta coleta compartilham o mesmo timestamp
+                self.metrics_store.begin_tick(time.time())
+
                 # Coletar métricas do sistema
                 await self._collect_system_metrics()
                 await self._collect_network_metrics()
@@ -94,30 +133,36 @@ class MonitoringService:
                 await self._collect_docker_metrics()
                 await self._collect_service_metrics()
 
+                # Persistir o tick em disco
+                await self._persist_tick()
+
+                # Notificar alertas disparados/resolvidos durante a coleta
+                await self._evaluate_alerts()
+
                 # Health checks
                 await self._perform_health_checks()
 
                 logger.debug("📈 Métricas coletadas com sucesso")
 
             except Exception as e:
+                self.collection_errors += 1
                 logger.error(f"❌ Erro na coleta de métricas: {e}")
 
+            self.last_collection_seconds = time.perf_counter() - started
+            self.collection_seconds_total += self.last_collection_seconds
+            self.collection_count += 1
+
             await asyncio.sleep(self.collection_interval)
 
     async def _collect_system_metrics(self):
         """Coleta métricas básicas do sistema"""
         try:
-            # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
-
-            # Memória
-            memory = psutil.virtual_memory()
-
-            # Disco
-            disk = psutil.disk_usage('/')
-
-            # Load average
-            load_avg = list(psutil.getloadavg()) if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+            # CPU, memória, disco e load average do amostrador em segundo plano
+            snapshot = await system_sampler.get_snapshot()
+            cpu_percent = snapshot.cpu_percent
+            memory = snapshot.memory
+            disk = snapshot.disk
+            load_avg = snapshot.load_average
 
             # Uptime
             boot_time = psutil.boot_time()
@@ -137,11 +182,10 @@ class MonitoringService:
             )
 
             # Armazenar métricas individuais
-            timestamp = datetime.now()
-            self._store_metric("system.cpu_percent", timestamp, cpu_percent)
-            self._store_metric("system.memory_percent", timestamp, memory.percent)
-            self._store_metric("system.disk_percent", timestamp, (disk.used / disk.total) * 100)
-            self._store_metric("system.load_1m", timestamp, load_avg[0])
+            self._store_metric("system.cpu_percent", cpu_percent)
+            self._store_metric("system.memory_percent", memory.percent)
+            self._store_metric("system.disk_percent", (disk.used / disk.total) * 100)
+            self._store_metric("system.load_1m", load_avg[0])
 
         except Exception as e:
             logger.error(f"❌ Erro ao coletar métricas do sistema: {e}")
@@ -155,11 +199,10 @@ class MonitoringService:
                 if interface.startswith('lo'):  # Skip loopback
                     continue
 
-                timestamp = datetime.now()
-                self._store_metric(f"network.{interface}.bytes_sent", timestamp, stats.bytes_sent)
-                self._store_metric(f"network.{interface}.bytes_recv", timestamp, stats.bytes_recv)
-                self._store_metric(f"network.{interface}.packets_sent", timestamp, stats.packets_sent)
-                self._store_metric(f"network.{interface}.packets_recv", timestamp, stats.packets_recv)
+                self._store_metric(f"network.{interface}.bytes_sent", stats.bytes_sent)
+                self._store_metric(f"network.{interface}.bytes_recv", stats.bytes_recv)
+                self._store_metric(f"network.{interface}.packets_sent", stats.packets_sent)
+                self._store_metric(f"network.{interface}.packets_recv", stats.packets_recv)
 
         except Exception as e:
             logger.error(f"❌ Erro ao coletar métricas de rede: {e}")
@@ -167,27 +210,16 @@ class MonitoringService:
     async def _collect_process_metrics(self):
         """Coleta métricas de processos importantes"""
         try:
-            # Processos que consomem mais CPU/memória
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    proc_info = proc.info
-                    if proc_info['cpu_percent'] > 1.0 or proc_info['memory_percent'] > 1.0:
-                        processes.append(proc)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+            snapshot = await process_table.get_snapshot()
 
-            # Top 10 processos por CPU
-            top_cpu = sorted(processes, key=lambda x: x.info['cpu_percent'], reverse=True)[:10]
+            # Top 10 processos por CPU entre os que consomem mais CPU/memória
+            top_cpu = snapshot.top(
+                10, "cpu", predicate=lambda p: p.cpu_percent > 1.0 or p.memory_percent > 1.0
+            )
 
             for i, proc in enumerate(top_cpu):
-                try:
-                    info = proc.info
-                    timestamp = datetime.now()
-                    self._store_metric(f"process.top_cpu.{i}.cpu_percent", timestamp, info['cpu_percent'])
-                    self._store_metric(f"process.top_cpu.{i}.memory_percent", timestamp, info['memory_percent'])
-                except:
-                    continue
+                self._store_metric(f"process.top_cpu.{i}.cpu_percent", proc.cpu_percent)
+                self._store_metric(f"process.top_cpu.{i}.memory_percent", proc.memory_percent)
 
         except Exception as e:
             logger.error(f"❌ Erro ao coletar métricas de processos: {e}")
@@ -198,10 +230,9 @@ class MonitoringService:
             # Status geral do Docker
             health = await docker_service.get_health_status()
 
-            timestamp = datetime.now()
-            self._store_metric("docker.containers_running", timestamp, health.containers_running)
-            self._store_metric("docker.containers_total", timestamp, health.containers_total)
-            self._store_metric("docker.images_total", timestamp, health.images_total)
+            self._store_metric("docker.containers_running", health.containers_running)
+            self._store_metric("docker.containers_total", health.containers_total)
+            self._store_metric("docker.images_total", health.images_total)
 
             # Métricas de containers ativos
             try:
@@ -211,21 +242,21 @@ class MonitoringService:
                 total_cpu = 0
                 total_memory = 0
 
-                for container in containers[:5]:  # Top 5 para performance
-                    try:
-                        stats = await docker_service.get_container_stats(container.id)
-                        total_cpu += stats.cpu_usage
-                        total_memory += stats.memory_percent
+                stats_by_id = await docker_service.collect_container_stats(containers, consumer="monitoring")
+                for container in containers:
+                    stats = stats_by_id.get(container.id)
+                    if not stats:
+                        continue
 
-                        # Métricas por container
-                        self._store_metric(f"docker.container.{container.name}.cpu_percent", timestamp, stats.cpu_usage)
-                        self._store_metric(f"docker.container.{container.name}.memory_percent", timestamp, stats.memory_percent)
+                    total_cpu += stats.cpu_usage
+                    total_memory += stats.memory_percent
 
-                    except:
-                        continue
+                    # Métricas por container
+                    self._store_metric(f"docker.container.{container.name}.cpu_percent", stats.cpu_usage)
+                    self._store_metric(f"docker.container.{container.name}.memory_percent", stats.memory_percent)
 
-                self._store_metric("docker.total_cpu_usage", timestamp, total_cpu)
-                self._store_metric("docker.total_memory_usage", timestamp, total_memory)
+                self._store_metric("docker.total_cpu_usage", total_cpu)
+                self._store_metric("docker.total_memory_usage", total_memory)
 
             except Exception as docker_error:
                 logger.warning(f"⚠️ Erro ao coletar métricas detalhadas do Docker: {docker_error}")
@@ -238,6 +269,7 @@ class MonitoringService:
         try:
             # Verificar serviços importantes
             services = ['nginx', 'docker', 'postgresql', 'redis-server']
+            snapshot = await process_table.get_snapshot()
 
             for service_name in services:
                 try:
@@ -246,18 +278,16 @@ class MonitoringService:
                     cpu_usage = 0
                     memory_usage = 0
 
-                    for proc in psutil.process_iter(['name', 'cpu_percent', 'memory_percent']):
-                        if service_name.lower() in proc.info['name'].lower():
-                            running = True
-                            cpu_usage = proc.info['cpu_percent']
-                            memory_usage = proc.info['memory_percent']
-                            break
+                    matches = snapshot.find_by_name(service_name)
+                    if matches:
+                        running = True
+                        cpu_usage = matches[0].cpu_percent
+                        memory_usage = matches[0].memory_percent
 
-                    timestamp = datetime.now()
-                    self._store_metric(f"service.{service_name}.running", timestamp, 1 if running else 0)
+                    self._store_metric(f"service.{service_name}.running", 1 if running else 0)
                     if running:
-                        self._store_metric(f"service.{service_name}.cpu_percent", timestamp, cpu_usage)
-                        self._store_metric(f"service.{service_name}.memory_percent", timestamp, memory_usage)
+                        self._store_metric(f"service.{service_name}.cpu_percent", cpu_usage)
+                        self._store_metric(f"service.{service_name}.memory_percent", memory_usage)
 
                 except Exception as service_error:
                     logger.debug(f"Erro ao verificar serviço {service_name}: {service_error}")
@@ -325,9 +355,21 @@ class MonitoringService:
         except Exception as e:
             logger.error(f"❌ Erro nos health checks: {e}")
 
-    def _store_metric(self, metric_name: str, timestamp: datetime, value: float):
-        """Armazena uma métrica na memória"""
-        self.metrics_storage[metric_name].append((timestamp, value))
+    def _store_metric(self, metric_name: str, value: float):
+        """Armazena uma métrica no tick de coleta atual e avalia as regras de alerta dela"""
+        self.metrics_store.record(metric_name, value)
+        epoch = self.metrics_store.timestamps[self.metrics_store.head]
+        self._pending_alerts.extend(self.alert_engine.observe(metric_name, value, epoch))
+
+    async def _persist_tick(self):
+        """Grava os valores do tick atual nos segmentos em disco"""
+        if not self.metrics_segments:
+            return
+        try:
+            epoch = self.metrics_store.timestamps[self.metrics_store.head]
+            await asyncio.to_thread(self.metrics_segments.write_tick, epoch, self.metrics_store.tick_values())
+        except Exception as e:
+            logger.error(f"❌ Erro ao persistir métricas: {e}")
 
     # ===========================
     # SISTEMA DE ALERTAS
@@ -379,119 +421,17 @@ class MonitoringService:
         ]
 
         for rule in default_rules:
-            self.alert_rules[rule.id] = rule
-
-    async def _alert_evaluation_loop(self):
-        """Loop de avaliação de alertas"""
-        while self.is_running:
-            try:
-                await self._evaluate_alert_rules()
-                await asyncio.sleep(30)  # Avaliar a cada 30 segundos
-            except Exception as e:
-                logger.error(f"❌ Erro na avaliação de alertas: {e}")
-
-    async def _evaluate_alert_rules(self):
-        """Avalia todas as regras de alerta"""
-        for rule_id, rule in self.alert_rules.items():
-            if not rule.enabled:
-                continue
-
-            try:
-                await self._evaluate_single_rule(rule)
-            except Exception as e:
-                logger.error(f"❌ Erro ao avaliar regra {rule_id}: {e}")
-
-    async def _evaluate_single_rule(self, rule: AlertRule):
-        """Avalia uma regra de alerta específica"""
-        # Obter valores recentes da métrica
-        if rule.metric not in self.metrics_storage:
-            return
-
-        recent_values = list(self.metrics_storage[rule.metric])
-        if not recent_values:
-            return
-
-        # Verificar se a condição é atendida
-        current_value = recent_values[-1][1]  # Valor mais recente
-
-        condition_met = False
-        if rule.condition == ">":
-            condition_met = current_value > rule.threshold
-        elif rule.condition == "<":
-            condition_met = current_value < rule.threshold
-        elif rule.condition == "==":
-            condition_met = current_value == rule.threshold
-        elif rule.condition == ">=":
-            condition_met = current_value >= rule.threshold
-        elif rule.condition == "<=":
-            condition_met = current_value <= rule.threshold
-
-        alert_key = f"{rule.id}_{rule.metric}"
-
-        if condition_met:
-            # Verificar duração
-            duration_met = True
-            if rule.duration > 0:
-                duration_met = self._check_alert_duration(rule, recent_values)
-
-            if duration_met and alert_key not in self.active_alerts:
-                # Criar novo alerta
-                alert = Alert(
-                    id=alert_key,
-                    rule_id=rule.id,
-                    rule_name=rule.name,
-                    message=f"{rule.description} - Current: {current_value:.2f}, Threshold: {rule.threshold}",
-                    severity=rule.severity,
-                    status=AlertStatus.ACTIVE,
-                    started_at=datetime.now(),
-                    current_value=current_value,
-                    threshold=rule.threshold,
-                    labels=rule.labels
-                )
-
-                self.active_alerts[alert_key] = alert
-                await self._send_alert_notification(alert)
-
-                logger.warning(f"🚨 Novo alerta: {alert.message}")
-        else:
-            # Resolver alerta se existir
-            if alert_key in self.active_alerts:
-                alert = self.active_alerts[alert_key]
-                alert.status = AlertStatus.RESOLVED
-                alert.resolved_at = datetime.now()
-
-                await self._send_alert_notification(alert)
-                del self.active_alerts[alert_key]
-
-                logger.info(f"✅ Alerta resolvido: {alert.message}")
+            self.alert_engine.add_rule(rule)
 
-    def _check_alert_duration(self, rule: AlertRule, values: List[Tuple[datetime, float]]) -> bool:
-        """Verifica se a condição foi atendida pela duração necessária"""
-        if len(values) < 2:
-            return False
+    async def _evaluate_alerts(self):
+        """Envia notificações dos alertas que mudaram neste tick"""
+        # Métricas ausentes por três coletas (ex.: container removido) resolvem seus alertas
+        now = self.metrics_store.timestamps[self.metrics_store.head]
+        self._pending_alerts.extend(self.alert_engine.expire(now, self.collection_interval * 3))
 
-        cutoff_time = datetime.now() - timedelta(seconds=rule.duration)
-
-        for timestamp, value in reversed(values):
-            if timestamp < cutoff_time:
-                break
-
-            condition_met = False
-            if rule.condition == ">":
-                condition_met = value > rule.threshold
-            elif rule.condition == "<":
-                condition_met = value < rule.threshold
-            elif rule.condition == "==":
-                condition_met = value == rule.threshold
-            elif rule.condition == ">=":
-                condition_met = value >= rule.threshold
-            elif rule.condition == "<=":
-                condition_met = value <= rule.threshold
-
-            if not condition_met:
-                return False
-
-        return True
+        pending, self._pending_alerts = self._pending_alerts, []
+        for alert in pending:
+            await self._send_alert_notification(alert)
 
     async def _send_alert_notification(self, alert: Alert):
         """Envia notificação de alerta"""
@@ -524,11 +464,12 @@ class MonitoringService:
         """Obtém métricas atuais do sistema"""
         current_metrics = {}
 
-        for metric_name, values in self.metrics_storage.items():
-            if values:
+        for metric_name in self.metrics_store.names():
+            latest = self.metrics_store.latest(metric_name)
+            if latest:
                 current_metrics[metric_name] = {
-                    "value": values[-1][1],
-                    "timestamp": values[-1][0].isoformat()
+                    "value": latest[1],
+                    "timestamp": datetime.fromtimestamp(latest[0]).isoformat()
                 }
 
         return current_metrics
@@ -540,21 +481,40 @@ class MonitoringService:
         end_time = request.end_time or datetime.now()
         start_time = request.start_time or (end_time - timedelta(hours=1))
 
-        metrics_to_fetch = request.metrics or list(self.metrics_storage.keys())
+        # Resolução: step solicitado, aumentado para respeitar max_points
+        start_epoch, end_epoch = start_time.timestamp(), end_time.timestamp()
+        step = request.step or self.collection_interval
+        if request.max_points:
+            step = max(step, math.ceil((end_epoch - start_epoch) / request.max_points))
+
+        # Intervalo anterior ao que está em memória (ex.: após reinício): ler do disco
+        from_disk = self.metrics_segments is not None and not self.metrics_store.covers(start_epoch)
+
+        if from_disk:
+            metrics_to_fetch = request.metrics or await asyncio.to_thread(
+                self.metrics_segments.names, start_epoch, end_epoch
+            )
+        else:
+            metrics_to_fetch = request.metrics or self.metrics_store.names()
 
         for metric_name in metrics_to_fetch:
-            if metric_name in self.metrics_storage:
-                values = []
-                for timestamp, value in self.metrics_storage[metric_name]:
-                    if start_time <= timestamp <= end_time:
-                        values.append((timestamp, value))
-
-                if values:
-                    series.append(MetricSeries(
-                        metric_name=metric_name,
-                        labels=request.labels or {},
-                        values=values
-                    ))
+            if from_disk:
+                points = await asyncio.to_thread(
+                    self.metrics_segments.query, metric_name, start_epoch, end_epoch, step, request.aggregation
+                )
+            elif metric_name in self.metrics_store:
+                points = self.metrics_store.query(metric_name, start_epoch, end_epoch, step, request.aggregation)
+            else:
+                continue
+
+            values = [(datetime.fromtimestamp(epoch), value) for epoch, value in points]
+
+            if values:
+                series.append(MetricSeries(
+                    metric_name=metric_name,
+                    labels=request.labels or {},
+                    values=values
+                ))
 
         return series
 
@@ -600,7 +560,7 @@ class MonitoringService:
     async def add_alert_rule(self, rule: AlertRule) -> MonitoringResponse:
         """Adiciona nova regra de alerta"""
         try:
-            self.alert_rules[rule.id] = rule
+            self.alert_engine.add_rule(rule)
 
             return MonitoringResponse(
                 success=True,
@@ -0,0 +1,145 @@
+"""
+Amostrador de recursos do sistema
+Coleta CPU (total e por núcleo), memória, disco e rede em segundo plano a
+partir de diferenças entre amostras, sem bloquear o event loop
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class SystemSnapshot(NamedTuple):
+    """Última amostra de recursos do sistema"""
+    timestamp: float
+    cpu_percent: float
+    cpu_per_core: List[float]
+    memory: Any
+    swap: Any
+    disk: Any
+    disk_io: Dict[str, int]
+    disk_io_rates: Dict[str, float]
+    network_io: Dict[str, int]
+    network_rates: Dict[str, float]
+    load_average: List[float]
+
+
+def _busy_percent(current, previous) -> float:
+    """Percentual ocupado entre duas leituras de cpu_times"""
+    total = sum(current) - (sum(previous) if previous else 0)
+    idle = (current.idle + getattr(current, "iowait", 0)) - (
+        (previous.idle + getattr(previous, "iowait", 0)) if previous else 0
+    )
+    if total <= 0:
+        return 0.0
+    return round(max(0.0, min(100.0, (1 - idle / total) * 100)), 1)
+
+
+def _rates(current: Dict[str, int], previous: Optional[Dict[str, int]], elapsed: float) -> Dict[str, float]:
+    """Taxa por segundo de cada contador"""
+    if not previous or elapsed <= 0:
+        return {key: 0.0 for key in current}
+    return {key: round(max(value - previous.get(key, value), 0) / elapsed, 2)
+            for key, value in current.items()}
+
+
+class SystemSampler:
+    """Mantém um snapshot de recursos atualizado a cada intervalo"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or float(os.getenv("SYSTEM_SAMPLER_INTERVAL", 2))
+        self.snapshot: Optional[SystemSnapshot] = None
+
+        self._previous_times = None
+        self._previous_per_core = None
+        self._task: Optional[asyncio.Task] = None
+        self._tick: Optional[asyncio.Event] = None
+
+    async def start(self):
+        """Inicia a amostragem periódica"""
+        if self._task:
+            return
+        self._tick = asyncio.Event()
+        self.snapshot = await asyncio.to_thread(self._sample)
+        self._task = asyncio.create_task(self._sampling_loop())
+        logger.info(f"📈 Amostrador de sistema iniciado (intervalo {self.interval}s)")
+
+    async def stop(self):
+        """Para a amostragem"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            self._wake()
+
+    async def get_snapshot(self, fresh: bool = False) -> SystemSnapshot:
+        """Retorna o último snapshot; com fresh=True aguarda a próxima amostra"""
+        if not self._task:
+            # Amostrador parado: amostrar sob demanda, fora do event loop
+            self.snapshot = await asyncio.to_thread(self._sample)
+            return self.snapshot
+
+        if fresh or self.snapshot is None:
+            await self._tick.wait()
+        return self.snapshot
+
+    async def _sampling_loop(self):
+        """Loop de amostragem"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.snapshot = await asyncio.to_thread(self._sample)
+            except Exception as e:
+                logger.error(f"❌ Erro ao amostrar recursos do sistema: {e}")
+            finally:
+                # Acordar quem aguarda a próxima amostra (com a anterior, se esta falhou)
+                self._wake()
+
+    def _wake(self):
+        tick, self._tick = self._tick, asyncio.Event()
+        if tick is not None:
+            tick.set()
+
+    def _sample(self) -> SystemSnapshot:
+        """Lê os contadores do sistema (executado em thread)"""
+        now = time.monotonic()
+        previous = self.snapshot
+
+        cpu_times = psutil.cpu_times()
+        per_core_times = psutil.cpu_times(percpu=True)
+        cpu_percent = _busy_percent(cpu_times, self._previous_times)
+        if self._previous_per_core and len(self._previous_per_core) == len(per_core_times):
+            cpu_per_core = [_busy_percent(c, p) for c, p in zip(per_core_times, self._previous_per_core)]
+        else:
+            cpu_per_core = [_busy_percent(c, None) for c in per_core_times]
+        self._previous_times = cpu_times
+        self._previous_per_core = per_core_times
+
+        disk_counters = psutil.disk_io_counters()
+        net_counters = psutil.net_io_counters()
+        disk_io = disk_counters._asdict() if disk_counters else {}
+        network_io = net_counters._asdict() if net_counters else {}
+        elapsed = now - previous.timestamp if previous else 0
+
+        return SystemSnapshot(
+            timestamp=now,
+            cpu_percent=cpu_percent,
+            cpu_per_core=cpu_per_core,
+            memory=psutil.virtual_memory(),
+            swap=psutil.swap_memory(),
+            disk=psutil.disk_usage('/'),
+            disk_io=disk_io,
+            disk_io_rates=_rates(disk_io, previous.disk_io if previous else None, elapsed),
+            network_io=network_io,
+            network_rates=_rates(network_io, previous.network_io if previous else None, elapsed),
+            load_average=list(os.getloadavg()) if hasattr(os, "getloadavg") else [0, 0, 0]
+        )
+
+
+# Instância global do amostrador
+system_sampler = SystemSampler()
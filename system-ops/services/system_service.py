@@ -18,6 +18,8 @@ from models.system import (
 from utils.system import SystemUtils
 from utils.security import SecurityValidator
 from utils.callbacks import CallbackManager
+from services.system_sampler import system_sampler
+from utils.process_table import process_table
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +37,7 @@ class SystemService:
         self.memory_threshold = float(os.getenv("SYSTEM_ALERT_THRESHOLD_MEMORY", 85))
         self.disk_threshold = float(os.getenv("SYSTEM_ALERT_THRESHOLD_DISK", 90))
 
-    async def get_health(self) -> SystemHealth:
+    async def get_health(self, fresh: bool = False) -> SystemHealth:
         """Obter health check completo do sistema"""
         try:
             logger.info("Executando health check do sistema")
@@ -45,15 +47,12 @@ class SystemService:
             uptime_seconds = psutil.boot_time()
             uptime = self._format_uptime(uptime_seconds)
 
-            # Load average
-            load_avg = list(os.getloadavg())
-
-            # Recursos do sistema
-            cpu_usage = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            memory_usage = memory.percent
-            disk = psutil.disk_usage('/')
-            disk_usage = disk.percent
+            # Recursos do sistema (último snapshot do amostrador)
+            snapshot = await system_sampler.get_snapshot(fresh=fresh)
+            load_avg = snapshot.load_average
+            cpu_usage = snapshot.cpu_percent
+            memory_usage = snapshot.memory.percent
+            disk_usage = snapshot.disk.percent
 
             # Status dos serviços críticos
             services = await self._check_critical_services()
@@ -116,12 +115,14 @@ class SystemService:
             logger.error(f"Erro ao obter health check: {e}")
             raise
 
-    async def get_resources(self) -> SystemResources:
+    async def get_resources(self, fresh: bool = False) -> SystemResources:
         """Obter recursos detalhados do sistema"""
         try:
+            snapshot = await system_sampler.get_snapshot(fresh=fresh)
+
             # CPU
             cpu_count = psutil.cpu_count()
-            cpu_usage_per_core = psutil.cpu_percent(percpu=True, interval=1)
+            cpu_usage_per_core = snapshot.cpu_per_core
             cpu_freq = psutil.cpu_freq()
             cpu_frequency = {
                 "current": cpu_freq.current if cpu_freq else 0,
@@ -139,8 +140,8 @@ class SystemService:
                 pass
 
             # Memória
-            memory = psutil.virtual_memory()
-            swap = psutil.swap_memory()
+            memory = snapshot.memory
+            swap = snapshot.swap
 
             # Disco
             disk_partitions = []
@@ -160,7 +161,7 @@ class SystemService:
                     continue
 
             # I/O de disco
-            disk_io = psutil.disk_io_counters()._asdict() if psutil.disk_io_counters() else {}
+            disk_io = snapshot.disk_io
 
             # Rede
             network_interfaces = []
@@ -176,26 +177,22 @@ class SystemService:
                 network_interfaces.append(interface_info)
 
             # I/O de rede
-            network_io = psutil.net_io_counters()._asdict() if psutil.net_io_counters() else {}
+            network_io = snapshot.network_io
 
-            # Processos
-            processes = list(psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']))
+            # Processos (tabela compartilhada, CPU por diferença entre varreduras)
+            processes = await process_table.get_snapshot()
             process_count = len(processes)
 
-            # Top processos por CPU e memória
-            top_processes = sorted(processes, key=lambda p: p.info['cpu_percent'], reverse=True)[:10]
-            top_processes_info = []
-
-            for proc in top_processes:
-                try:
-                    top_processes_info.append({
-                        "pid": proc.info['pid'],
-                        "name": proc.info['name'],
-                        "cpu_percent": proc.info['cpu_percent'],
-                        "memory_percent": proc.info['memory_percent']
-                    })
-                except:
-                    continue
+            # Top processos por CPU
+            top_processes_info = [
+                {
+                    "pid": proc.pid,
+                    "name": proc.name,
+                    "cpu_percent": proc.cpu_percent,
+                    "memory_percent": proc.memory_percent
+                }
+                for proc in processes.top(10, "cpu")
+            ]
 
             return SystemResources(
                 cpu_count=cpu_count,
@@ -13,6 +13,10 @@ from typing import Dict, List, Optional, Any
 from collections import defaultdict
 
 from models.system import TrafficRule, TrafficStats, TrafficAction
+from services.ip_blocklist import IpBlocklist
+from services.firewall_backends import create_firewall_backend
+from services.heavy_hitters import HeavyHitterCollector, HeavyHitters
+from utils.connection_table import connection_table
 from utils.system import SystemUtils
 from utils.security import SecurityValidator
 from utils.callbacks import CallbackManager
@@ -27,45 +31,60 @@ class TrafficService:
         self.system_utils = SystemUtils()
         self.security = SecurityValidator()
         self.callback_manager = CallbackManager()
+        self.blocklist = IpBlocklist(self.system_utils)
+        self.firewall = create_firewall_backend(self.system_utils)
+        self.heavy_hitters = HeavyHitters()
+        self.heavy_hitter_collector = HeavyHitterCollector(self.heavy_hitters)
 
         # Cache de regras ativas
         self.active_rules: Dict[str, TrafficRule] = {}
+        self._rule_seq = 0
 
         # Estatísticas de tráfego
         self.traffic_stats = {
             "connections": defaultdict(int),
-            "blocked_ips": set(),
             "rate_limited_ips": set()
         }
 
+    async def start_service(self):
+        """Inicia a coleta de heavy hitters"""
+        await self.heavy_hitter_collector.start()
+
+    async def stop_service(self):
+        """Para a coleta de heavy hitters"""
+        await self.heavy_hitter_collector.stop()
+
     async def setup_traffic_rules(self, rules: List[TrafficRule]) -> Dict[str, Any]:
-        """Configurar regras de tráfego"""
+        """Configurar regras de tráfego (aplicadas junto com as ativas, numa transação)"""
         try:
             logger.info(f"Configurando {len(rules)} regras de tráfego")
 
+            for rule in rules:
+                if not rule.rule_id:
+                    self._rule_seq += 1
+                    rule.rule_id = f"rule_{self._rule_seq}"
+
+            # Estado desejado: regras ativas + novas (mesmo rule_id substitui; desativada sai)
+            desired = dict(self.active_rules)
+            for rule in rules:
+                if rule.enabled:
+                    desired[rule.rule_id] = rule
+                else:
+                    desired.pop(rule.rule_id, None)
+            applied = await self.firewall.apply(list(desired.values()))
+
             results = []
             for rule in rules:
-                try:
-                    result = await self._apply_traffic_rule(rule)
-                    results.append({
-                        "rule_name": rule.name,
-                        "success": result["success"],
-                        "message": result.get("message", "")
-                    })
-
-                    if result["success"]:
-                        # Armazenar regra ativa
-                        rule_id = rule.rule_id or f"rule_{len(self.active_rules)}"
-                        rule.rule_id = rule_id
-                        self.active_rules[rule_id] = rule
-
-                except Exception as e:
-                    logger.error(f"Erro ao aplicar regra {rule.name}: {e}")
-                    results.append({
-                        "rule_name": rule.name,
-                        "success": False,
-                        "error": str(e)
-                    })
+                result = applied.get(rule.rule_id) or {"success": False, "message": "Regra desativada"}
+                entry = {"rule_name": rule.name, "rule_id": rule.rule_id, "success": result["success"]}
+                entry["message" if result["success"] else "error"] = result["message"]
+                results.append(entry)
+
+            # Ativas passam a ser exatamente as que estão no kernel
+            self.active_rules = {
+                rule_id: rule for rule_id, rule in desired.items()
+                if applied.get(rule_id, {}).get("success")
+            }
 
             success_count = sum(1 for r in results if r["success"])
 
@@ -83,44 +102,76 @@ class TrafficService:
 
     async def block_ip(self, ip_address: str, duration_minutes: Optional[int] = None,
                       reason: str = "Manual block") -> Dict[str, Any]:
-        """Bloquear endereço IP"""
+        """Bloquear endereço IP (ou rede CIDR)"""
         try:
             logger.info(f"Bloqueando IP: {ip_address}")
 
-            # Validar IP
-            try:
-                ipaddress.ip_address(ip_address)
-            except ValueError:
-                raise Exception(f"Endereço IP inválido: {ip_address}")
-
-            # Comando iptables para bloquear IP
-            cmd = [
-                "iptables", "-I", "INPUT", "-s", ip_address, "-j", "DROP"
-            ]
+            # Desbloqueio automático pelo timeout da entrada no ipset
+            keys = await self.blocklist.add(
+                [ip_address], duration_minutes * 60 if duration_minutes else None, reason
+            )
 
-            result = await self.system_utils.run_command(cmd)
+            return {
+                "success": True,
+                "message": f"IP {keys[0]} bloqueado com sucesso",
+                "ip_address": keys[0],
+                "duration_minutes": duration_minutes,
+                "reason": reason,
+                "blocked_at": datetime.now().isoformat()
+            }
 
-            if result.returncode != 0:
-                raise Exception(f"Falha ao bloquear IP: {result.stderr}")
+        except Exception as e:
+            logger.error(f"Erro ao bloquear IP {ip_address}: {e}")
+            raise
 
-            # Adicionar às estatísticas
-            self.traffic_stats["blocked_ips"].add(ip_address)
+    async def block_ips(self, ip_addresses: List[str], duration_minutes: Optional[int] = None,
+                        reason: str = "Manual block") -> Dict[str, Any]:
+        """Bloquear vários IPs/redes numa única operação"""
+        try:
+            logger.info(f"Bloqueando {len(ip_addresses)} IPs")
 
-            # Configurar desbloqueio automático se especificado
-            if duration_minutes:
-                asyncio.create_task(self._auto_unblock_ip(ip_address, duration_minutes))
+            keys = await self.blocklist.add(
+                ip_addresses, duration_minutes * 60 if duration_minutes else None, reason
+            )
 
             return {
                 "success": True,
-                "message": f"IP {ip_address} bloqueado com sucesso",
-                "ip_address": ip_address,
+                "message": f"{len(keys)} IPs bloqueados com sucesso",
+                "blocked": len(keys),
                 "duration_minutes": duration_minutes,
                 "reason": reason,
                 "blocked_at": datetime.now().isoformat()
             }
 
         except Exception as e:
-            logger.error(f"Erro ao bloquear IP {ip_address}: {e}")
+            logger.error(f"Erro ao bloquear IPs em lote: {e}")
+            raise
+
+    async def unblock_ips(self, ip_addresses: List[str]) -> Dict[str, Any]:
+        """Desbloquear IPs/redes numa única operação"""
+        try:
+            logger.info(f"Desbloqueando {len(ip_addresses)} IPs")
+
+            removed = await self.blocklist.remove(ip_addresses)
+
+            return {
+                "success": True,
+                "message": f"{len(removed)} IPs desbloqueados",
+                "unblocked": removed
+            }
+
+        except Exception as e:
+            logger.error(f"Erro ao desbloquear IPs: {e}")
+            raise
+
+    async def list_blocked_ips(self) -> List[Dict[str, Any]]:
+        """Listar IPs bloqueados (espelho em memória do ipset)"""
+        try:
+            await self.blocklist.ensure()
+            return self.blocklist.list()
+
+        except Exception as e:
+            logger.error(f"Erro ao listar IPs bloqueados: {e}")
             raise
 
     async def setup_rate_limiting(self, ip_address: str, requests_per_minute: int,
@@ -186,57 +237,30 @@ class TrafficService:
     async def get_traffic_stats(self) -> TrafficStats:
         """Obter estatísticas de tráfego"""
         try:
-            # Obter estatísticas de conexões ativas
-            netstat_result = await self.system_utils.run_command([
-                "netstat", "-tuln"
-            ])
-
-            # Parsear conexões
-            active_connections = 0
-            if netstat_result.returncode == 0:
-                lines = netstat_result.stdout.split('\n')
-                active_connections = len([line for line in lines if 'ESTABLISHED' in line])
-
-            # Obter estatísticas de interface de rede
-            try:
-                import psutil
-                net_io = psutil.net_io_counters()
-                bytes_in = net_io.bytes_recv
-                bytes_out = net_io.bytes_sent
-
-                # Calcular largura de banda (estimativa simplificada)
-                bandwidth_in_mbps = (bytes_in / 1024 / 1024) / 60  # MB/min convertido para estimativa
-                bandwidth_out_mbps = (bytes_out / 1024 / 1024) / 60
-
-            except:
-                bytes_in = bytes_out = 0
-                bandwidth_in_mbps = bandwidth_out_mbps = 0
+            # Uma leitura de /proc/net/tcp{,6} compartilhada, com taxas pela diferença entre amostras
+            snapshot = await connection_table.get_snapshot()
 
-            # Top IPs de origem (simulado - em produção usar netstat/ss)
+            # Conexões novas nos últimos 5 minutos (a primeira coleta conta as já abertas)
             top_source_ips = [
-                {"ip": "192.168.1.100", "connections": 45, "bytes": 1024000},
-                {"ip": "10.0.0.50", "connections": 32, "bytes": 756000},
-                {"ip": "172.16.0.10", "connections": 28, "bytes": 634000}
+                {"ip": ip, "connections": count, "window": "5m"}
+                for ip, count in self.heavy_hitters.top("ip", "5m", 10)
             ]
-
-            # Top portas de destino
             top_destination_ports = [
-                {"port": 80, "connections": 150, "protocol": "tcp"},
-                {"port": 443, "connections": 120, "protocol": "tcp"},
-                {"port": 22, "connections": 25, "protocol": "tcp"}
+                {"port": port, "connections": count, "protocol": "tcp"}
+                for port, count in snapshot.top_local_ports(10)
             ]
 
             return TrafficStats(
-                total_connections=active_connections + 200,  # Simulado
-                active_connections=active_connections,
-                connections_per_second=5.2,  # Simulado
-                bytes_in=bytes_in,
-                bytes_out=bytes_out,
-                bandwidth_in_mbps=bandwidth_in_mbps,
-                bandwidth_out_mbps=bandwidth_out_mbps,
+                total_connections=snapshot.total,
+                active_connections=snapshot.established,
+                connections_per_second=snapshot.connections_per_second,
+                bytes_in=snapshot.bytes_in,
+                bytes_out=snapshot.bytes_out,
+                bandwidth_in_mbps=round(snapshot.bytes_in_per_second * 8 / 1_000_000, 3),
+                bandwidth_out_mbps=round(snapshot.bytes_out_per_second * 8 / 1_000_000, 3),
                 top_source_ips=top_source_ips,
                 top_destination_ports=top_destination_ports,
-                blocked_requests=len(self.traffic_stats["blocked_ips"]) * 10,  # Estimativa
+                blocked_requests=self.blocklist.count() * 10,  # Estimativa
                 rate_limited_requests=len(self.traffic_stats["rate_limited_ips"]) * 5
             )
 
@@ -244,6 +268,19 @@ class TrafficService:
             logger.error(f"Erro ao obter estatísticas de tráfego: {e}")
             raise
 
+    async def get_top_talkers(self, dimension: str = "ip", window: str = "5m",
+                              limit: int = 10) -> Dict[str, Any]:
+        """Top-N por conexões (ip, port) ou requisições HTTP (http_ip, path) na janela, por contagem estimada"""
+        return {
+            "dimension": dimension,
+            "window": window,
+            "top": [
+                {"key": key, "count": count}
+                for key, count in self.heavy_hitters.top(dimension, window, limit)
+            ],
+            "total_events": self.heavy_hitters.events.get(dimension, 0)
+        }
+
     async def list_active_rules(self) -> List[TrafficRule]:
         """Listar regras de tráfego ativas"""
         try:
@@ -261,16 +298,15 @@ class TrafficService:
 
             rule = self.active_rules[rule_id]
 
-            # Remover regra baseado no tipo
-            if rule.action == TrafficAction.BLOCK:
-                await self._remove_block_rule(rule)
-            elif rule.action == TrafficAction.RATE_LIMIT:
-                await self._remove_rate_limit_rule(rule)
-            elif rule.action == TrafficAction.ALLOW:
-                await self._remove_allow_rule(rule)
+            # Reaplicar o conjunto sem a regra (mesma transação das demais)
+            remaining = [r for r_id, r in self.active_rules.items() if r_id != rule_id]
+            applied = await self.firewall.apply(remaining)
 
-            # Remover da lista de regras ativas
+            # Remover da lista de regras ativas (e as que deixaram de ser aceitas)
             del self.active_rules[rule_id]
+            for r_id, result in applied.items():
+                if not result["success"]:
+                    self.active_rules.pop(r_id, None)
 
             return {
                 "success": True,
@@ -282,114 +318,6 @@ class TrafficService:
             logger.error(f"Erro ao remover regra {rule_id}: {e}")
             raise
 
-    async def _apply_traffic_rule(self, rule: TrafficRule) -> Dict[str, Any]:
-        """Aplicar regra específica de tráfego"""
-        if rule.action == TrafficAction.ALLOW:
-            return await self._apply_allow_rule(rule)
-        elif rule.action == TrafficAction.DENY or rule.action == TrafficAction.BLOCK:
-            return await self._apply_block_rule(rule)
-        elif rule.action == TrafficAction.RATE_LIMIT:
-            return await self._apply_rate_limit_rule(rule)
-        elif rule.action == TrafficAction.REDIRECT:
-            return await self._apply_redirect_rule(rule)
-        else:
-            raise Exception(f"Ação não suportada: {rule.action}")
-
-    async def _apply_allow_rule(self, rule: TrafficRule) -> Dict[str, Any]:
-        """Aplicar regra de permissão"""
-        cmd = ["iptables", "-I", "INPUT"]
-
-        if rule.source_ip:
-            cmd.extend(["-s", rule.source_ip])
-
-        if rule.destination_port:
-            cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-        cmd.extend(["-j", "ACCEPT"])
-
-        result = await self.system_utils.run_command(cmd)
-
-        return {
-            "success": result.returncode == 0,
-            "message": "Regra de permissão aplicada" if result.returncode == 0 else result.stderr
-        }
-
-    async def _apply_block_rule(self, rule: TrafficRule) -> Dict[str, Any]:
-        """Aplicar regra de bloqueio"""
-        cmd = ["iptables", "-I", "INPUT"]
-
-        if rule.source_ip:
-            cmd.extend(["-s", rule.source_ip])
-
-        if rule.destination_port:
-            cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-        cmd.extend(["-j", "DROP"])
-
-        result = await self.system_utils.run_command(cmd)
-
-        return {
-            "success": result.returncode == 0,
-            "message": "Regra de bloqueio aplicada" if result.returncode == 0 else result.stderr
-        }
-
-    async def _apply_rate_limit_rule(self, rule: TrafficRule) -> Dict[str, Any]:
-        """Aplicar regra de rate limiting"""
-        if not rule.rate_limit:
-            raise Exception("Configuração de rate limiting não fornecida")
-
-        await self._ensure_rate_limit_chain()
-
-        # Extrair configurações de rate limiting
-        rate_config = rule.rate_limit
-        limit = rate_config.get("requests_per_minute", 60)
-        burst = rate_config.get("burst", limit)
-
-        cmd = ["iptables", "-I", "NETPILOT_RATE_LIMIT"]
-
-        if rule.source_ip:
-            cmd.extend(["-s", rule.source_ip])
-
-        if rule.destination_port:
-            cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-        cmd.extend([
-            "-m", "limit",
-            "--limit", f"{limit}/min",
-            "--limit-burst", str(burst),
-            "-j", "ACCEPT"
-        ])
-
-        result = await self.system_utils.run_command(cmd)
-
-        return {
-            "success": result.returncode == 0,
-            "message": "Regra de rate limiting aplicada" if result.returncode == 0 else result.stderr
-        }
-
-    async def _apply_redirect_rule(self, rule: TrafficRule) -> Dict[str, Any]:
-        """Aplicar regra de redirecionamento"""
-        if not rule.redirect_to:
-            raise Exception("Destino de redirecionamento não fornecido")
-
-        # Para redirecionamentos, usar DNAT
-        cmd = ["iptables", "-t", "nat", "-I", "PREROUTING"]
-
-        if rule.source_ip:
-            cmd.extend(["-s", rule.source_ip])
-
-        if rule.destination_port:
-            cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-        cmd.extend(["-j", "DNAT", "--to-destination", rule.redirect_to])
-
-        result = await self.system_utils.run_command(cmd)
-
-        return {
-            "success": result.returncode == 0,
-            "message": "Regra de redirecionamento aplicada" if result.returncode == 0 else result.stderr
-        }
-
     async def _ensure_rate_limit_chain(self):
         """Garantir que a chain de rate limiting existe"""
         # Verificar se chain existe
@@ -405,75 +333,6 @@ class TrafficService:
             jump_cmd = ["iptables", "-I", "INPUT", "-j", "NETPILOT_RATE_LIMIT"]
             await self.system_utils.run_command(jump_cmd)
 
-    async def _remove_block_rule(self, rule: TrafficRule):
-        """Remover regra de bloqueio"""
-        cmd = ["iptables", "-D", "INPUT"]
-
-        if rule.source_ip:
-            cmd.extend(["-s", rule.source_ip])
-
-        if rule.destination_port:
-            cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-        cmd.extend(["-j", "DROP"])
-
-        await self.system_utils.run_command(cmd)
-
-    async def _remove_rate_limit_rule(self, rule: TrafficRule):
-        """Remover regra de rate limiting"""
-        # Remover da chain de rate limiting
-        if rule.rate_limit:
-            limit = rule.rate_limit.get("requests_per_minute", 60)
-            burst = rule.rate_limit.get("burst", limit)
-
-            cmd = ["iptables", "-D", "NETPILOT_RATE_LIMIT"]
-
-            if rule.source_ip:
-                cmd.extend(["-s", rule.source_ip])
-
-            if rule.destination_port:
-                cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-            cmd.extend([
-                "-m", "limit",
-                "--limit", f"{limit}/min",
-                "--limit-burst", str(burst),
-                "-j", "ACCEPT"
-            ])
-
-            await self.system_utils.run_command(cmd)
-
-    async def _remove_allow_rule(self, rule: TrafficRule):
-        """Remover regra de permissão"""
-        cmd = ["iptables", "-D", "INPUT"]
-
-        if rule.source_ip:
-            cmd.extend(["-s", rule.source_ip])
-
-        if rule.destination_port:
-            cmd.extend(["-p", rule.protocol, "--dport", str(rule.destination_port)])
-
-        cmd.extend(["-j", "ACCEPT"])
-
-        await self.system_utils.run_command(cmd)
-
-    async def _auto_unblock_ip(self, ip_address: str, duration_minutes: int):
-        """Desbloquear IP automaticamente após duração especificada"""
-        await asyncio.sleep(duration_minutes * 60)
-
-        try:
-            # Remover regra de bloqueio
-            cmd = ["iptables", "-D", "INPUT", "-s", ip_address, "-j", "DROP"]
-            await self.system_utils.run_command(cmd)
-
-            # Remover das estatísticas
-            self.traffic_stats["blocked_ips"].discard(ip_address)
-
-            logger.info(f"IP {ip_address} desbloqueado automaticamente")
-
-        except Exception as e:
-            logger.error(f"Erro ao desbloquear IP {ip_address}: {e}")
-
     async def _auto_remove_rate_limit(self, ip_address: str, duration_minutes: int):
         """Remover rate limiting automaticamente após duração especificada"""
         await asyncio.sleep(duration_minutes * 60)
@@ -493,4 +352,8 @@ class TrafficService:
             logger.info(f"Rate limiting removido para IP {ip_address}")
 
         except Exception as e:
-            logger.error(f"Erro ao remover rate limiting para IP {ip_address}: {e}")
\ No newline at end of file
+            logger.error(f"Erro ao remover rate limiting para IP {ip_address}: {e}")
+
+
+# Instância global do serviço
+traffic_service = TrafficService()
@@ -0,0 +1,379 @@
+"""
+Hub de fan-out WebSocket
+Cada cliente tem uma fila de envio limitada e uma tarefa escritora própria:
+um cliente lento acumula (ou perde) as próprias mensagens sem atrasar os demais
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Union
+
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except ImportError:  # Codificação binária opcional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+Payload = Union[str, bytes]
+
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Política padrão pelo prefixo do tópico (logs:<id>, metrics, events)
+DEFAULT_TOPIC_POLICIES = {
+    "logs": "drop_oldest",
+    "metrics": "coalesce",
+    "events": "drop_oldest",
+}
+
+# Código de fechamento quando o cliente não acompanha o stream (Try Again Later)
+CLOSE_CODE_SLOW_CLIENT = 1013
+
+ENCODINGS = ("json", "msgpack")
+
+
+def available_encoding(encoding: Optional[str]) -> str:
+    """Codificação efetiva: msgpack só se a biblioteca estiver instalada"""
+    if encoding == "msgpack" and msgpack is not None:
+        return "msgpack"
+    return "json"
+
+
+def encode_message(message: Dict[str, Any], encoding: str) -> Payload:
+    """Serializa a mensagem (texto JSON ou binário MessagePack)"""
+    if encoding == "msgpack":
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(",", ":"))
+
+
+def merge_patch(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Diferença no formato JSON Merge Patch (RFC 7386): None remove a chave"""
+    patch: Dict[str, Any] = {}
+    for key, value in current.items():
+        old = previous.get(key, _MISSING)
+        if old == value:
+            continue
+        if isinstance(value, dict) and isinstance(old, dict):
+            patch[key] = merge_patch(old, value)
+        else:
+            patch[key] = value
+    for key in previous:
+        if key not in current:
+            patch[key] = None
+    return patch
+
+
+_MISSING = object()
+
+
+class ClientChannel:
+    """Fila de envio de um cliente WebSocket"""
+
+    def __init__(self, websocket: WebSocket, maxsize: int, policy: str,
+                 encoding: str = "json", delta: bool = False):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de overflow inválida: {policy}")
+
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.encoding = available_encoding(encoding)
+        self.delta = delta
+        self.closed = False
+
+        # Tópico -> sequência do último frame enfileirado (base dos deltas)
+        self.delta_seq: Dict[str, int] = {}
+
+        # Entradas [chave, payload, instante em que entrou na fila]
+        self._queue: Deque[List[Any]] = deque()
+        self._keyed: Dict[str, List[Any]] = {}
+        self._ready = asyncio.Event()
+
+        # Métricas
+        self.sent = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.last_lag = 0.0
+
+        self._writer = asyncio.create_task(self._write_loop())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def lag(self) -> float:
+        """Há quanto tempo a mensagem mais antiga aguarda envio"""
+        return time.monotonic() - self._queue[0][2] if self._queue else 0.0
+
+    def push(self, payload: Payload, key: Optional[str] = None) -> bool:
+        """Enfileira sem bloquear; aplica a política se a fila estiver cheia"""
+        if self.closed:
+            return False
+
+        if key is not None and self.policy == "coalesce":
+            pending = self._keyed.get(key)
+            if pending is not None:
+                # Substitui o conteúdo mantendo a posição (e a idade) na fila
+                pending[1] = payload
+                self.coalesced += 1
+                # O frame substituído nunca chega: o próximo precisa ser completo
+                self.delta_seq.clear()
+                return True
+
+        if len(self._queue) >= self.maxsize:
+            if self.policy == "disconnect":
+                logger.warning(f"⚠️ Cliente WebSocket lento desconectado ({len(self._queue)} mensagens pendentes)")
+                self.close(CLOSE_CODE_SLOW_CLIENT)
+                return False
+            self._discard(self._queue.popleft())
+            self.dropped += 1
+            self.delta_seq.clear()
+
+        entry = [key, payload, time.monotonic()]
+        self._queue.append(entry)
+        if key is not None and self.policy == "coalesce":
+            self._keyed[key] = entry
+
+        if len(self._queue) > self.max_depth:
+            self.max_depth = len(self._queue)
+        self._ready.set()
+        return True
+
+    def send_message(self, message: Dict[str, Any]) -> bool:
+        """Enfileira uma mensagem só deste cliente, na codificação negociada"""
+        return self.push(encode_message(message, self.encoding))
+
+    def close(self, code: Optional[int] = None):
+        """Encerra a escrita; com code, fecha também o WebSocket"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._keyed.clear()
+        self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_websocket(code))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "encoding": self.encoding,
+            "delta": self.delta,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "lag_seconds": round(self.lag, 3),
+            "last_lag_seconds": round(self.last_lag, 3),
+            "sent": self.sent,
+            "sent_bytes": self.sent_bytes,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced
+        }
+
+    def _discard(self, entry: List[Any]):
+        if entry[0] is not None and self._keyed.get(entry[0]) is entry:
+            del self._keyed[entry[0]]
+
+    async def _write_loop(self):
+        """Envia a fila do cliente em ordem"""
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    entry = self._queue.popleft()
+                    self._discard(entry)
+                    payload = entry[1]
+
+                    if isinstance(payload, bytes):
+                        await self.websocket.send_bytes(payload)
+                    else:
+                        await self.websocket.send_text(payload)
+
+                    self.sent += 1
+                    self.sent_bytes += len(payload)
+                    self.last_lag = time.monotonic() - entry[2]
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Cliente WebSocket encerrado durante envio: {e}")
+            self.closed = True
+            self._queue.clear()
+            self._keyed.clear()
+
+    async def _close_websocket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            logger.debug(f"Erro ao fechar WebSocket: {e}")
+
+
+class WebSocketHub:
+    """Distribui mensagens por tópico para os canais dos clientes"""
+
+    def __init__(self, queue_size: Optional[int] = None, policy: Optional[str] = None):
+        self.queue_size = queue_size or int(os.getenv("WS_CLIENT_QUEUE_SIZE", 1000))
+        # Vazio: política padrão de cada tópico
+        self.policy = policy or os.getenv("WS_OVERFLOW_POLICY", "")
+
+        self.channels: Dict[WebSocket, ClientChannel] = {}
+        self.topics: Dict[str, Set[ClientChannel]] = {}
+
+        # Totais de clientes já desconectados, para os contadores não regredirem
+        self._closed_totals = {"sent": 0, "dropped": 0, "coalesced": 0, "sent_bytes": 0}
+        self.published = 0
+
+        # Tópico -> (sequência, última mensagem) para frames delta
+        self._delta_state: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+    def attach(self, websocket: WebSocket, policy: Optional[str] = None,
+               default_policy: str = "coalesce", encoding: str = "json", delta: bool = False) -> ClientChannel:
+        """Canal do WebSocket, criado na primeira chamada com as opções negociadas"""
+        channel = self.channels.get(websocket)
+        if channel is None or channel.closed:
+            channel = self.channels[websocket] = ClientChannel(
+                websocket, self.queue_size, policy or self.policy or default_policy, encoding, delta
+            )
+        return channel
+
+    def subscribe(self, websocket: WebSocket, topic: str, policy: Optional[str] = None,
+                  encoding: str = "json", delta: bool = False) -> ClientChannel:
+        """Inscreve o WebSocket no tópico (o canal é criado na primeira inscrição)"""
+        channel = self.attach(websocket, policy, self._topic_policy(topic), encoding, delta)
+        self.topics.setdefault(topic, set()).add(channel)
+        return channel
+
+    def topics_of(self, websocket: WebSocket) -> List[str]:
+        """Tópicos em que o WebSocket está inscrito"""
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return []
+        return [topic for topic, subscribers in self.topics.items() if channel in subscribers]
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        """Remove o WebSocket do tópico"""
+        channel = self.channels.get(websocket)
+        if channel is not None:
+            self._unsubscribe_channel(channel, topic)
+
+    def detach(self, websocket: WebSocket):
+        """Remove o WebSocket de todos os tópicos e encerra seu canal"""
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return
+        for topic in self.topics_of(websocket):
+            self._unsubscribe_channel(channel, topic)
+        del self.channels[websocket]
+        channel.close()
+        for name in self._closed_totals:
+            self._closed_totals[name] += getattr(channel, name)
+
+    def _unsubscribe_channel(self, channel: ClientChannel, topic: str):
+        subscribers = self.topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(channel)
+        if not subscribers:
+            del self.topics[topic]
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self.topics.get(topic, ()))
+
+    def publish(self, topic: str, message: Union[Dict[str, Any], Payload], key: Optional[str] = None,
+                delta: bool = False) -> int:
+        """Serializa uma vez por codificação e enfileira para cada inscrito
+
+        Mensagens dict recebem o campo 'topic', que identifica o frame no endpoint
+        multiplexado; texto JSON pronto é repassado sem alteração. Com delta=True
+        os frames levam 'seq'; clientes que pediram deltas recebem só o que mudou
+        ({'seq', 'base', 'delta'}) quando já têm o frame anterior, e o frame
+        completo caso contrário.
+        """
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            self._delta_state.pop(topic, None)
+            return 0
+
+        if isinstance(message, (str, bytes)):
+            # JSON já serializado segue como está; outras codificações partem do texto decodificado
+            full = None
+            frames = {"full": {"json": message}}
+            delta = False
+        else:
+            full = {"topic": topic, **message}
+            frames = {"full": {}}
+            if delta:
+                seq, previous = self._delta_state.get(topic, (0, None))
+                seq += 1
+                self._delta_state[topic] = (seq, message)
+                full["seq"] = seq
+                if previous is not None:
+                    frames["delta"] = {}
+                    patch = {"topic": topic, "seq": seq, "base": seq - 1, "delta": merge_patch(previous, message)}
+        self.published += 1
+
+        delivered = 0
+        for channel in list(subscribers):
+            kind = "full"
+            if delta:
+                # Fila cheia: o push descartaria um frame (talvez a base), então vai completo
+                if (channel.delta and "delta" in frames and channel.delta_seq.get(topic) == seq - 1
+                        and channel.depth < channel.maxsize):
+                    kind = "delta"
+            encoded = frames[kind]
+            payload = encoded.get(channel.encoding)
+            if payload is None:
+                if full is None:
+                    full = json.loads(message)
+                payload = encoded[channel.encoding] = encode_message(
+                    patch if kind == "delta" else full, channel.encoding
+                )
+
+            # Deltas não são coalescidos: substituir um delta pendente quebraria a cadeia
+            if channel.push(payload, None if kind == "delta" else key):
+                delivered += 1
+                # Um descarte durante o push zera a cadeia: o próximo frame vai completo
+                if delta and channel.delta and (kind == "full" or channel.delta_seq.get(topic) == seq - 1):
+                    channel.delta_seq[topic] = seq
+            elif channel.closed:
+                self._unsubscribe_channel(channel, topic)
+        return delivered
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Totais e pior atraso por tópico"""
+        totals = dict(self._closed_totals)
+        for channel in self.channels.values():
+            for name in totals:
+                totals[name] += getattr(channel, name)
+
+        topics = {}
+        for topic, subscribers in self.topics.items():
+            topics[topic] = {
+                "clients": len(subscribers),
+                "max_depth": max((c.depth for c in subscribers), default=0),
+                "max_lag_seconds": round(max((c.lag for c in subscribers), default=0.0), 3)
+            }
+
+        return {
+            "clients": len(self.channels),
+            "published": self.published,
+            **totals,
+            "topics": topics
+        }
+
+    def close_all(self):
+        """Encerra todos os canais"""
+        for websocket in list(self.channels):
+            self.detach(websocket)
+
+    @staticmethod
+    def _topic_policy(topic: str) -> str:
+        return DEFAULT_TOPIC_POLICIES.get(topic.split(":", 1)[0], "drop_oldest")
@@ -6,158 +6,362 @@ Gerencia conexões WebSocket para logs Docker e métricas do sistema
 import asyncio
 import json
 import logging
+import os
+import re
 from datetime import datetime
-from typing import Dict, Set, Optional, Any
-from fastapi import WebSocket, WebSocketDisconnect
-import websockets
-from websockets.exceptions import ConnectionClosed
+from typing import Dict, List, Optional, Any
+from fastapi import WebSocket
 
 from services.docker_service import docker_service
+from services.websocket_hub import WebSocketHub
+from services.log_replay import LogReplayBuffer
+from services.container_logs import LogTimestampParser, NS_PER_SECOND
 from models.docker import LogsRequest, ContainerListRequest
 
 logger = logging.getLogger(__name__)
 
-class ConnectionManager:
-    """Gerenciador de conexões WebSocket"""
+# Tópicos aceitos: metrics, events, logs:<container>, stats:<container>
+TOPIC_PATTERN = re.compile(r"^(metrics|events|(logs|stats):[\w.-]+)$")
 
-    def __init__(self):
-        # Conexões ativas por tipo de stream
-        self.docker_logs_connections: Dict[str, Set[WebSocket]] = {}  # container_id -> set de websockets
-        self.system_metrics_connections: Set[WebSocket] = set()
-        self.docker_events_connections: Set[WebSocket] = set()
-
-        # Tarefas de streaming ativas
-        self.active_log_streams: Dict[str, asyncio.Task] = {}  # container_id -> task
-        self.metrics_stream_task: Optional[asyncio.Task] = None
-        self.docker_events_task: Optional[asyncio.Task] = None
-
-    async def connect_docker_logs(self, websocket: WebSocket, container_id: str):
-        """Conecta WebSocket para logs de um container específico"""
-        await websocket.accept()
 
-        if container_id not in self.docker_logs_connections:
-            self.docker_logs_connections[container_id] = set()
+class ConnectionManager:
+    """Gerenciador de conexões WebSocket
 
-        self.docker_logs_connections[container_id].add(websocket)
+    Cada stream é um tópico do hub. Os produtores (follow de logs, eventos,
+    métricas, stats) são contados por referência: iniciam com o primeiro
+    inscrito e param quando o último sai.
+    """
+
+    def __init__(self):
+        # Fan-out com fila limitada por cliente
+        self.hub = WebSocketHub()
+
+        # Produtores ativos por tópico
+        self.producers: Dict[str, asyncio.Task] = {}
+        self._linger: Dict[str, asyncio.TimerHandle] = {}
+
+        # Lotes de logs: enviados a cada janela ou ao atingir o tamanho máximo
+        self.log_batch_window = float(os.getenv("WS_LOG_BATCH_MS", 50)) / 1000
+        self.log_batch_lines = int(os.getenv("WS_LOG_BATCH_LINES", 500))
+        self.log_batch_bytes = int(os.getenv("WS_LOG_BATCH_BYTES", 256 * 1024))
+
+        # Replay de logs por container e espera antes de encerrar um follow sem clientes
+        self.log_replay: Dict[str, LogReplayBuffer] = {}
+        self.log_replay_lines = int(os.getenv("WS_LOG_REPLAY_LINES", 1000))
+        self.log_stream_linger = float(os.getenv("WS_LOG_STREAM_LINGER", 30))
+        # Próxima sequência por container, preservada entre streams
+        self._log_next_seq: Dict[str, int] = {}
+        # Timestamp (ns) da última linha publicada: um follow reiniciado continua dali
+        self._log_resume_ns: Dict[str, int] = {}
+
+        self.max_topics_per_client = int(os.getenv("WS_MAX_TOPICS", 64))
+
+    # ===========================
+    # INSCRIÇÕES
+    # ===========================
+
+    def subscribe(self, websocket: WebSocket, topic: str, since_seq: Optional[int] = None,
+                  encoding: str = "json", delta: bool = False):
+        """Inscreve o WebSocket (já aceito) no tópico e garante seu produtor
+
+        encoding ('json' ou 'msgpack') e delta valem para o canal do cliente e são
+        definidos na primeira inscrição da conexão.
+        """
+        if not TOPIC_PATTERN.match(topic):
+            raise ValueError(f"Tópico inválido: {topic}")
+
+        channel = self.hub.subscribe(websocket, topic, encoding=encoding, delta=delta)
+
+        # Replay e inscrição sem await entre eles: nenhuma linha fica de fora ou duplicada
+        kind, _, container_id = topic.partition(":")
+        replay = self.log_replay.get(container_id) if kind == "logs" else None
+        if replay:
+            lines, missed = replay.since(since_seq or 0)
+            if lines or missed:
+                channel.send_message({
+                    "topic": topic,
+                    "type": "docker_logs",
+                    "container_id": container_id,
+                    "replay": True,
+                    "missed": missed,
+                    "lines": lines
+                })
+
+        self._acquire(topic)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        """Remove o WebSocket do tópico"""
+        self.hub.unsubscribe(websocket, topic)
+        self._release(topic)
+
+    def detach(self, websocket: WebSocket):
+        """Remove o WebSocket de todos os tópicos"""
+        topics = self.hub.topics_of(websocket)
+        self.hub.detach(websocket)
+        for topic in topics:
+            self._release(topic)
+
+    def _acquire(self, topic: str):
+        """Inicia o produtor do tópico, se ainda não estiver rodando"""
+        # Reconexão dentro da janela de espera: reaproveitar o produtor aquecido
+        linger = self._linger.pop(topic, None)
+        if linger:
+            linger.cancel()
+
+        task = self.producers.get(topic)
+        if task is None or task.done():
+            self.producers[topic] = asyncio.create_task(self._run_producer(topic))
+
+    def _release(self, topic: str):
+        """Para o produtor quando o tópico fica sem inscritos"""
+        if self.hub.subscriber_count(topic) or topic not in self.producers or topic in self._linger:
+            return
 
-        # Iniciar stream de logs se não existir
-        if container_id not in self.active_log_streams:
-            self.active_log_streams[container_id] = asyncio.create_task(
-                self._stream_docker_logs(container_id)
+        # Follows de logs ficam aquecidos por um tempo para absorver reconexões
+        if topic.startswith("logs:") and self.log_stream_linger > 0:
+            self._linger[topic] = asyncio.get_running_loop().call_later(
+                self.log_stream_linger, self._stop_producer, topic
             )
+        else:
+            self._stop_producer(topic)
 
-        logger.info(f"✅ WebSocket conectado para logs do container {container_id}")
+    def _stop_producer(self, topic: str):
+        self._linger.pop(topic, None)
+        if self.hub.subscriber_count(topic):
+            return
 
-    async def disconnect_docker_logs(self, websocket: WebSocket, container_id: str):
-        """Desconecta WebSocket dos logs de container"""
-        if container_id in self.docker_logs_connections:
-            self.docker_logs_connections[container_id].discard(websocket)
+        task = self.producers.pop(topic, None)
+        if task:
+            task.cancel()
+        if topic.startswith("logs:"):
+            self.log_replay.pop(topic.partition(":")[2], None)
+        logger.info(f"🛑 Stream {topic} parado")
 
-            # Se não há mais conexões para este container, parar o stream
-            if not self.docker_logs_connections[container_id]:
-                del self.docker_logs_connections[container_id]
+    async def _run_producer(self, topic: str):
+        """Executa o produtor do tópico"""
+        kind, _, argument = topic.partition(":")
+        try:
+            if kind == "logs":
+                await self._stream_docker_logs(argument)
+            elif kind == "stats":
+                await self._stream_container_stats(argument)
+            elif kind == "metrics":
+                await self._stream_system_metrics()
+            elif kind == "events":
+                await self._stream_docker_events()
+        finally:
+            # Produtor encerrado por conta própria (ex.: container parou): permitir reinício
+            if self.producers.get(topic) is asyncio.current_task():
+                del self.producers[topic]
 
-                if container_id in self.active_log_streams:
-                    self.active_log_streams[container_id].cancel()
-                    del self.active_log_streams[container_id]
+    # ===========================
+    # ENDPOINTS DEDICADOS
+    # ===========================
 
-                logger.info(f"🛑 Stream de logs parado para container {container_id}")
+    async def connect_docker_logs(self, websocket: WebSocket, container_id: str, since_seq: Optional[int] = None,
+                                  encoding: str = "json"):
+        """Conecta WebSocket para logs de um container específico
 
-    async def connect_system_metrics(self, websocket: WebSocket):
-        """Conecta WebSocket para métricas do sistema"""
+        Sem since_seq o cliente recebe as linhas retidas no buffer de replay; com
+        since_seq, apenas as linhas posteriores a essa sequência.
+        """
         await websocket.accept()
-        self.system_metrics_connections.add(websocket)
+        self.subscribe(websocket, f"logs:{container_id}", since_seq, encoding)
+        logger.info(f"✅ WebSocket conectado para logs do container {container_id}")
 
-        # Iniciar stream de métricas se necessário
-        if not self.metrics_stream_task:
-            self.metrics_stream_task = asyncio.create_task(self._stream_system_metrics())
+    async def disconnect_docker_logs(self, websocket: WebSocket, container_id: str):
+        """Desconecta WebSocket dos logs de container"""
+        self.detach(websocket)
 
+    async def connect_system_metrics(self, websocket: WebSocket, encoding: str = "json", delta: bool = False):
+        """Conecta WebSocket para métricas do sistema"""
+        await websocket.accept()
+        self.subscribe(websocket, "metrics", encoding=encoding, delta=delta)
         logger.info("✅ WebSocket conectado para métricas do sistema")
 
     async def disconnect_system_metrics(self, websocket: WebSocket):
         """Desconecta WebSocket das métricas do sistema"""
-        self.system_metrics_connections.discard(websocket)
-
-        # Parar stream se não há mais conexões
-        if not self.system_metrics_connections and self.metrics_stream_task:
-            self.metrics_stream_task.cancel()
-            self.metrics_stream_task = None
-            logger.info("🛑 Stream de métricas do sistema parado")
+        self.detach(websocket)
 
-    async def connect_docker_events(self, websocket: WebSocket):
+    async def connect_docker_events(self, websocket: WebSocket, encoding: str = "json"):
         """Conecta WebSocket para eventos do Docker"""
         await websocket.accept()
-        self.docker_events_connections.add(websocket)
-
-        # Iniciar stream de eventos se necessário
-        if not self.docker_events_task:
-            self.docker_events_task = asyncio.create_task(self._stream_docker_events())
-
+        self.subscribe(websocket, "events", encoding=encoding)
         logger.info("✅ WebSocket conectado para eventos do Docker")
 
     async def disconnect_docker_events(self, websocket: WebSocket):
         """Desconecta WebSocket dos eventos do Docker"""
-        self.docker_events_connections.discard(websocket)
+        self.detach(websocket)
 
-        # Parar stream se não há mais conexões
-        if not self.docker_events_connections and self.docker_events_task:
-            self.docker_events_task.cancel()
-            self.docker_events_task = None
-            logger.info("🛑 Stream de eventos do Docker parado")
+    # ===========================
+    # ENDPOINT MULTIPLEXADO
+    # ===========================
 
-    async def _stream_docker_logs(self, container_id: str):
-        """Stream contínuo de logs de um container específico"""
+    def open_stream(self, websocket: WebSocket, encoding: str = "json", delta: bool = False):
+        """Cria o canal da conexão multiplexada e informa as opções efetivas"""
+        channel = self.hub.attach(websocket, encoding=encoding, delta=delta)
+        channel.send_message({"type": "hello", "encoding": channel.encoding, "delta": channel.delta})
+
+    async def handle_stream_message(self, websocket: WebSocket, data: str):
+        """Processa um comando do protocolo multiplexado
+
+        {"action": "subscribe", "topic": "logs:<id>", "since_seq": 10}
+        {"action": "unsubscribe", "topic": "metrics"}
+        """
+        channel = self.hub.attach(websocket)
         try:
-            logger.info(f"📡 Iniciando stream de logs para container {container_id}")
-
-            # Configurar stream de logs
-            container = docker_service.client.containers.get(container_id)
-
-            # Stream de logs com follow=True
-            log_stream = container.logs(
-                stream=True,
-                follow=True,
-                timestamps=True,
-                stdout=True,
-                stderr=True
+            command = json.loads(data)
+            action = command.get("action")
+            topic = command.get("topic", "")
+
+            if action == "subscribe":
+                if topic not in self.hub.topics_of(websocket) and \
+                        len(self.hub.topics_of(websocket)) >= self.max_topics_per_client:
+                    raise ValueError(f"Limite de {self.max_topics_per_client} tópicos por conexão")
+                since_seq = command.get("since_seq")
+                self.subscribe(websocket, topic, int(since_seq) if since_seq is not None else None)
+                reply = {"type": "subscribed", "topic": topic}
+            elif action == "unsubscribe":
+                self.unsubscribe(websocket, topic)
+                reply = {"type": "unsubscribed", "topic": topic}
+            elif action == "ping":
+                reply = {"type": "pong"}
+            else:
+                raise ValueError(f"Ação inválida: {action}")
+
+        except (ValueError, TypeError, AttributeError) as e:
+            reply = {"type": "error", "message": str(e)}
+
+        # Pela mesma fila dos dados, para preservar a ordem
+        channel.send_message(reply)
+
+    async def _stream_docker_logs(self, container_id: str):
+        """Stream contínuo de logs de um container, enviado em lotes"""
+        topic = f"logs:{container_id}"
+        replay = self.log_replay[container_id] = LogReplayBuffer(
+            self.log_replay_lines, self._log_next_seq.get(container_id, 1)
+        )
+        batch: List[Dict[str, Any]] = []
+        batch_bytes = 0
+        has_lines = asyncio.Event()
+        batch_full = asyncio.Event()
+
+        timestamps = LogTimestampParser()
+        resume_ns = self._log_resume_ns.get(container_id)
+        if resume_ns is None:
+            position = {"tail": self.log_replay_lines}
+        else:
+            # Follow reiniciado (após o linger): só o que veio depois da última linha publicada,
+            # para as sequências novas não repetirem linhas que os clientes já têm
+            position = {"since": (resume_ns - 1000) / NS_PER_SECOND}
+
+        async def read_lines():
+            nonlocal batch_bytes
+            # O follow bloqueia no socket do daemon: ler em thread dedicada via DockerEngine
+            log_stream = docker_service.engine.stream(
+                "logs.follow",
+                lambda: docker_service.api_client.logs(
+                    container_id,
+                    stream=True,
+                    follow=True,
+                    timestamps=True,
+                    stdout=True,
+                    stderr=True,
+                    **position
+                )
             )
 
-            for log_line in log_stream:
-                if container_id not in self.docker_logs_connections:
-                    break
+            partial = ""
+            async for chunk in log_stream:
+                # Um chunk pode trazer várias linhas ou terminar no meio de uma
+                if isinstance(chunk, bytes):
+                    chunk = chunk.decode('utf-8', errors='replace')
+                lines = (partial + str(chunk)).split("\n")
+                partial = lines.pop()
+
+                for line in lines:
+                    entry = self._parse_log_line(line)
+                    if not entry:
+                        continue
+                    if resume_ns is not None:
+                        # 'since' é inclusivo e o float perde os nanossegundos: descartar o que já foi publicado
+                        timestamp_ns = timestamps.parse(entry["timestamp"])
+                        if timestamp_ns is not None and timestamp_ns <= resume_ns:
+                            continue
+                    batch.append(entry)
+                    batch_bytes += len(entry["message"])
 
-                # Processar linha do log
-                if isinstance(log_line, bytes):
-                    log_text = log_line.decode('utf-8').strip()
-                else:
-                    log_text = str(log_line).strip()
+                if batch:
+                    has_lines.set()
+                    if len(batch) >= self.log_batch_lines or batch_bytes >= self.log_batch_bytes:
+                        batch_full.set()
 
-                if log_text:
-                    # Criar mensagem WebSocket
-                    message = {
-                        "type": "docker_log",
-                        "container_id": container_id,
-                        "timestamp": datetime.now().isoformat(),
-                        "message": log_text
-                    }
+            entry = self._parse_log_line(partial)
+            if entry:
+                batch.append(entry)
+
+        logger.info(f"📡 Iniciando stream de logs para container {container_id}")
+        reader = asyncio.create_task(read_lines())
+        reader.add_done_callback(lambda _: has_lines.set())
 
-                    # Enviar para todas as conexões deste container
-                    await self._broadcast_to_container_connections(container_id, message)
+        try:
+            while True:
+                await has_lines.wait()
+
+                # Aguardar a janela do lote, a menos que ele já esteja cheio
+                if not reader.done() and not batch_full.is_set():
+                    try:
+                        await asyncio.wait_for(batch_full.wait(), self.log_batch_window)
+                    except asyncio.TimeoutError:
+                        pass
+
+                if batch:
+                    lines, batch = batch, []
+                    batch_bytes = 0
+                    # Numerar ao publicar: o replay contém exatamente o que foi enviado
+                    replay.extend(lines)
+                    self._log_next_seq[container_id] = replay.next_seq
+                    last_ns = timestamps.parse(lines[-1]["timestamp"])
+                    if last_ns is not None:
+                        self._log_resume_ns[container_id] = last_ns
+                    # Serializado uma única vez pelo hub para todos os inscritos
+                    self.hub.publish(topic, {
+                        "type": "docker_logs",
+                        "container_id": container_id,
+                        "lines": lines
+                    })
 
-                # Pequeno delay para não sobrecarregar
-                await asyncio.sleep(0.01)
+                has_lines.clear()
+                batch_full.clear()
+                if reader.done():
+                    reader.result()
+                    break
 
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
             logger.error(f"❌ Erro no stream de logs para {container_id}: {e}")
         finally:
+            reader.cancel()
             logger.info(f"🔚 Stream de logs finalizado para container {container_id}")
 
+    @staticmethod
+    def _parse_log_line(line: str) -> Optional[Dict[str, str]]:
+        """Separa o timestamp RFC3339 que o daemon prefixa em cada linha"""
+        line = line.rstrip("\r")
+        if not line.strip():
+            return None
+        timestamp, sep, message = line.partition(" ")
+        if not sep or not timestamp[:4].isdigit() or "T" not in timestamp:
+            return {"timestamp": datetime.now().isoformat(), "message": line.strip()}
+        return {"timestamp": timestamp, "message": message.rstrip()}
+
     async def _stream_system_metrics(self):
         """Stream contínuo de métricas do sistema"""
         try:
             logger.info("📡 Iniciando stream de métricas do sistema")
 
-            while self.system_metrics_connections:
+            while True:
                 try:
                     # Coletar métricas do Docker
                     docker_info = await docker_service.get_system_info()
@@ -167,19 +371,19 @@ class ConnectionManager:
                         ContainerListRequest(all=False)
                     )
 
+                    stats_by_id = await docker_service.collect_container_stats(containers, consumer="websocket")
                     container_stats = []
-                    for container in containers[:5]:  # Limite para performance
-                        try:
-                            stats = await docker_service.get_container_stats(container.id)
-                            container_stats.append({
-                                "id": container.id,
-                                "name": container.name,
-                                "cpu_usage": stats.cpu_usage,
-                                "memory_usage": stats.memory_usage,
-                                "memory_percent": stats.memory_percent
-                            })
-                        except:
+                    for container in containers:
+                        stats = stats_by_id.get(container.id)
+                        if not stats:
                             continue
+                        container_stats.append({
+                            "id": container.id,
+                            "name": container.name,
+                            "cpu_usage": stats.cpu_usage,
+                            "memory_usage": stats.memory_usage,
+                            "memory_percent": stats.memory_percent
+                        })
 
                     # Criar mensagem de métricas
                     message = {
@@ -195,8 +399,8 @@ class ConnectionManager:
                         "container_stats": container_stats
                     }
 
-                    # Broadcast para todas as conexões de métricas
-                    await self._broadcast_to_metrics_connections(message)
+                    # Broadcast para todas as conexões de métricas (clientes atrasados recebem só o último)
+                    self.hub.publish("metrics", message, key="system_metrics", delta=True)
 
                 except Exception as e:
                     logger.warning(f"⚠️ Erro ao coletar métricas: {e}")
@@ -214,13 +418,14 @@ class ConnectionManager:
         try:
             logger.info("📡 Iniciando stream de eventos do Docker")
 
-            # Stream de eventos do Docker
-            events = docker_service.client.events(decode=True)
-
-            for event in events:
-                if not self.docker_events_connections:
-                    break
+            # Stream de eventos do Docker, lido em thread dedicada via DockerEngine
+            filters = {"type": ["container", "image", "volume", "network"]}
+            events = docker_service.engine.stream(
+                "websocket.events",
+                lambda: docker_service.api_client.events(decode=True, filters=filters)
+            )
 
+            async for event in events:
                 # Filtrar eventos interessantes
                 if event.get('Type') in ['container', 'image', 'volume', 'network']:
                     message = {
@@ -233,88 +438,60 @@ class ConnectionManager:
                     }
 
                     # Broadcast para todas as conexões de eventos
-                    await self._broadcast_to_events_connections(message)
+                    self.hub.publish("events", message)
 
         except asyncio.CancelledError:
             logger.info("🔚 Stream de eventos do Docker cancelado")
         except Exception as e:
             logger.error(f"❌ Erro no stream de eventos: {e}")
 
-    async def _broadcast_to_container_connections(self, container_id: str, message: Dict[str, Any]):
-        """Envia mensagem para todas as conexões de um container específico"""
-        if container_id not in self.docker_logs_connections:
-            return
+    async def _stream_container_stats(self, container_id: str):
+        """Stream de estatísticas de um container (stream /stats compartilhado, ~1 Hz)"""
+        topic = f"stats:{container_id}"
+        try:
+            logger.info(f"📡 Iniciando stream de estatísticas para container {container_id}")
+
+            async for stats in docker_service.stream_container_stats(container_id):
+                message = {
+                    "type": "container_stats",
+                    "container_id": container_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "stats": stats.dict()
+                }
+                # Clientes atrasados recebem só a amostra mais recente
+                self.hub.publish(topic, message, key=topic, delta=True)
+
+        except asyncio.CancelledError:
+            logger.info(f"🔚 Stream de estatísticas cancelado para container {container_id}")
+        except Exception as e:
+            logger.error(f"❌ Erro no stream de estatísticas de {container_id}: {e}")
 
-        disconnected = set()
-
-        for websocket in self.docker_logs_connections[container_id].copy():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except (WebSocketDisconnect, ConnectionClosed):
-                disconnected.add(websocket)
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao enviar mensagem WebSocket: {e}")
-                disconnected.add(websocket)
-
-        # Remover conexões desconectadas
-        for websocket in disconnected:
-            self.docker_logs_connections[container_id].discard(websocket)
-
-    async def _broadcast_to_metrics_connections(self, message: Dict[str, Any]):
-        """Envia mensagem para todas as conexões de métricas"""
-        disconnected = set()
-
-        for websocket in self.system_metrics_connections.copy():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except (WebSocketDisconnect, ConnectionClosed):
-                disconnected.add(websocket)
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao enviar mensagem WebSocket: {e}")
-                disconnected.add(websocket)
-
-        # Remover conexões desconectadas
-        for websocket in disconnected:
-            self.system_metrics_connections.discard(websocket)
-
-    async def _broadcast_to_events_connections(self, message: Dict[str, Any]):
-        """Envia mensagem para todas as conexões de eventos"""
-        disconnected = set()
-
-        for websocket in self.docker_events_connections.copy():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except (WebSocketDisconnect, ConnectionClosed):
-                disconnected.add(websocket)
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao enviar mensagem WebSocket: {e}")
-                disconnected.add(websocket)
-
-        # Remover conexões desconectadas
-        for websocket in disconnected:
-            self.docker_events_connections.discard(websocket)
+    def get_client_counts(self) -> Dict[str, int]:
+        """Quantidade de clientes inscritos por tipo de stream"""
+        counts = {"docker_logs": 0, "system_metrics": 0, "docker_events": 0, "container_stats": 0}
+        names = {"logs": "docker_logs", "metrics": "system_metrics", "events": "docker_events",
+                 "stats": "container_stats"}
+        for topic, subscribers in self.hub.topics.items():
+            counts[names[topic.partition(":")[0]]] += len(subscribers)
+        return counts
 
     async def cleanup(self):
         """Limpa todas as conexões e tarefas ativas"""
         logger.info("🧹 Limpando conexões e tarefas WebSocket...")
 
         # Cancelar todas as tarefas de streaming
-        for task in self.active_log_streams.values():
+        for handle in self._linger.values():
+            handle.cancel()
+        for task in self.producers.values():
             task.cancel()
 
-        if self.metrics_stream_task:
-            self.metrics_stream_task.cancel()
-
-        if self.docker_events_task:
-            self.docker_events_task.cancel()
-
         # Limpar conexões
-        self.docker_logs_connections.clear()
-        self.system_metrics_connections.clear()
-        self.docker_events_connections.clear()
-        self.active_log_streams.clear()
+        self.hub.close_all()
+        self.producers.clear()
+        self._linger.clear()
+        self.log_replay.clear()
 
         logger.info("✅ Limpeza de WebSocket concluída")
 
 # Instância global do gerenciador de conexões
-connection_manager = ConnectionManager()
\ No newline at end of file
+connection_manager = ConnectionManager()
@@ -0,0 +1,88 @@
+"""
+NetPilot System Operations - Motor de alertas
+Índice de regras por métrica e transições de estado dos alertas
+"""
+
+import pytest
+
+from models.monitoring import AlertRule, AlertSeverity, AlertStatus
+from services.alert_engine import AlertEngine
+
+
+def _rule(rule_id="high_cpu", metric="system.cpu_percent", **kwargs):
+    fields = dict(id=rule_id, name=rule_id, description="CPU alta", metric=metric,
+                  condition=">", threshold=80.0, severity=AlertSeverity.MEDIUM, duration=60)
+    fields.update(kwargs)
+    return AlertRule(**fields)
+
+
+def test_alert_fires_after_duration_and_resolves():
+    engine = AlertEngine()
+    engine.add_rule(_rule())
+
+    assert engine.observe("system.cpu_percent", 90.0, 1000) == []
+    assert engine.observe("system.cpu_percent", 95.0, 1030) == []
+    fired = engine.observe("system.cpu_percent", 92.0, 1060)
+    assert [alert.status for alert in fired] == [AlertStatus.ACTIVE]
+    assert fired[0].current_value == 92.0
+
+    # Ainda acima do limite: nada muda
+    assert engine.observe("system.cpu_percent", 99.0, 1090) == []
+
+    resolved = engine.observe("system.cpu_percent", 10.0, 1120)
+    assert [alert.status for alert in resolved] == [AlertStatus.RESOLVED]
+    assert resolved[0].resolved_at is not None
+    assert engine.active_alerts == {}
+
+
+def test_condition_interrupted_restarts_duration():
+    engine = AlertEngine()
+    engine.add_rule(_rule())
+    engine.observe("system.cpu_percent", 90.0, 1000)
+    engine.observe("system.cpu_percent", 50.0, 1030)
+    assert engine.observe("system.cpu_percent", 90.0, 1060) == []
+    assert engine.observe("system.cpu_percent", 90.0, 1119) == []
+    assert len(engine.observe("system.cpu_percent", 90.0, 1120)) == 1
+
+
+def test_glob_rule_with_label_filter():
+    engine = AlertEngine()
+    engine.add_rule(_rule("web_cpu", "docker.container.*.cpu_percent", duration=0,
+                          match_labels={"container": "web-*"}))
+
+    assert engine.observe("docker.container.db.cpu_percent", 99.0, 1000) == []
+    fired = engine.observe("docker.container.web-1.cpu_percent", 99.0, 1000)
+    assert fired[0].id == "web_cpu_docker.container.web-1.cpu_percent"
+    assert fired[0].labels == {"container": "web-1"}
+    assert engine.get_status()["glob_rules"] == 1
+
+
+def test_disabled_rule_is_not_evaluated():
+    engine = AlertEngine()
+    engine.add_rule(_rule(duration=0, enabled=False))
+    assert engine.observe("system.cpu_percent", 99.0, 1000) == []
+
+
+def test_series_that_stops_reporting_is_resolved():
+    engine = AlertEngine()
+    engine.add_rule(_rule("web_cpu", "docker.container.*.cpu_percent", duration=0))
+    engine.observe("docker.container.web.cpu_percent", 99.0, 1000)
+    assert engine.expire(1100, 300) == []
+
+    expired = engine.expire(1400, 300)
+    assert [alert.status for alert in expired] == [AlertStatus.RESOLVED]
+    assert engine.get_status()["tracked_series"] == 0
+
+
+def test_remove_rule_and_invalid_condition():
+    engine = AlertEngine()
+    engine.add_rule(_rule(duration=0))
+    engine.observe("system.cpu_percent", 99.0, 1000)
+    resolved = engine.remove_rule("high_cpu")
+    assert [alert.status for alert in resolved] == [AlertStatus.RESOLVED]
+    assert engine.active_alerts == {}
+    assert engine.rules_for("system.cpu_percent") == ([], {})
+    assert engine.get_status()["tracked_series"] == 0
+
+    with pytest.raises(ValueError):
+        engine.add_rule(_rule(condition="=>"))
@@ -0,0 +1,86 @@
+"""
+NetPilot System Operations - Tabela de conexões
+Leitura de /proc/net/tcp{,6} e /proc/net/snmp a partir de um proc_root de teste
+"""
+
+import sys
+
+import pytest
+
+from utils.connection_table import ConnectionTable
+
+pytestmark = pytest.mark.skipif(sys.byteorder != "little", reason="fixture em ordem little-endian")
+
+HEADER = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+TAIL = " 00000000:00000000 00:00000000 00000000     0        0 1 1 0 100 0 0 10 0\n"
+
+# 10.0.0.5, 10.0.0.6 e 192.168.1.10 em hexa na ordem do host
+CLIENT_A = "0500000A"
+CLIENT_B = "0600000A"
+LOCAL = "0A01A8C0"
+MAPPED_A = "0000000000000000FFFF0000" + CLIENT_A
+V6_LOCAL = "00000000000000000000000001000000"
+V6_CLIENT = "B80D0120000000000000000005000000"
+
+
+def _line(index, local, remote, state):
+    return f"{index:4d}: {local} {remote} {state}{TAIL}"
+
+
+def _proc(tmp_path, tcp, tcp6=None, opens=(10, 5)):
+    net = tmp_path / "net"
+    net.mkdir(exist_ok=True)
+    (net / "tcp").write_text(HEADER + "".join(_line(i, *row) for i, row in enumerate(tcp)))
+    if tcp6 is not None:
+        (net / "tcp6").write_text(HEADER + "".join(_line(i, *row) for i, row in enumerate(tcp6)))
+    (net / "snmp").write_text(
+        "Tcp: RtoAlgorithm RtoMin RtoMax MaxConn ActiveOpens PassiveOpens AttemptFails\n"
+        f"Tcp: 1 200 120000 -1 {opens[0]} {opens[1]} 0\n"
+    )
+    return str(tmp_path)
+
+
+TCP = [
+    ("00000000:0050", "00000000:0000", "0A"),         # LISTEN :80
+    ("00000000:0016", "00000000:0000", "0A"),         # LISTEN :22
+    (f"{LOCAL}:0050", f"{CLIENT_A}:C350", "01"),      # 10.0.0.5 -> :80
+    (f"{LOCAL}:0050", f"{CLIENT_A}:C351", "06"),      # 10.0.0.5 -> :80 (TIME_WAIT)
+    (f"{LOCAL}:0016", f"{CLIENT_B}:D431", "01"),      # 10.0.0.6 -> :22
+    (f"{LOCAL}:A000", "08080808:01BB", "01"),         # saída para 8.8.8.8:443
+]
+TCP6 = [
+    ("00000000000000000000000000000000:0050", "00000000000000000000000000000000:0000", "0A"),
+    (f"{V6_LOCAL}:0050", f"{MAPPED_A}:C352", "01"),   # ::ffff:10.0.0.5 -> :80
+    (f"{V6_LOCAL}:0050", f"{V6_CLIENT}:C353", "01"),  # 2001:db8::5 -> :80
+]
+
+
+def test_scan_aggregates_inbound_connections(tmp_path):
+    table = ConnectionTable(max_age=1, proc_root=_proc(tmp_path, TCP, TCP6))
+    snapshot = table.scan()
+
+    assert snapshot.total == 6
+    assert snapshot.established == 5
+    assert snapshot.by_state == {"LISTEN": 3, "ESTABLISHED": 5, "TIME_WAIT": 1}
+    assert snapshot.listening_ports == [22, 80]
+    # IPv4 mapeado conta junto com o IPv4; a conexão de saída fica de fora
+    assert snapshot.by_remote_ip == {"10.0.0.5": 3, "10.0.0.6": 1, "2001:db8::5": 1}
+    assert snapshot.by_local_port == {80: 4, 22: 1}
+    assert snapshot.top_remote_ips(1) == [("10.0.0.5", 3)]
+    assert len(snapshot.inbound) == 5
+    assert sorted(table.decode_peer(peer) for peer in snapshot.inbound)[0] == ("10.0.0.5", 80)
+
+
+def test_missing_tcp6_is_ignored(tmp_path):
+    snapshot = ConnectionTable(proc_root=_proc(tmp_path, TCP)).scan()
+    assert snapshot.by_remote_ip == {"10.0.0.5": 2, "10.0.0.6": 1}
+
+
+def test_connection_rate_from_snmp_opens(tmp_path):
+    root = _proc(tmp_path, TCP, opens=(10, 5))
+    table = ConnectionTable(proc_root=root)
+    assert table.scan().connections_per_second == 0.0
+
+    _proc(tmp_path, TCP, opens=(30, 85))
+    table._previous_counters = (table._previous_counters[0] - 10, *table._previous_counters[1:])
+    assert 9.0 < table.scan().connections_per_second <= 10.0
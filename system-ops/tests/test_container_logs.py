@@ -0,0 +1,94 @@
+"""
+NetPilot System Operations - Leitura paginada de logs
+Demultiplexação do /logs, remontagem de linhas e cursores NDJSON
+"""
+
+import io
+
+import pytest
+
+from models.docker import LogsRequest
+from services.container_logs import (
+    FRAME_HEADER, ContainerLogReader, LogTimestampParser, format_cursor, iter_frames,
+    iter_lines, parse_cursor, parse_log_time
+)
+
+T = "2024-05-01T12:00:00"
+T_NS = 1714564800 * 1_000_000_000
+
+
+def _frame(stream_type: int, data: bytes) -> bytes:
+    return FRAME_HEADER.pack(stream_type, len(data)) + data
+
+
+def _body(*lines):
+    """Corpo multiplexado com uma linha por frame: (stream, texto)"""
+    return b"".join(_frame(2 if stream == "stderr" else 1, f"{text}\n".encode()) for stream, text in lines)
+
+
+def _reader(body: bytes, cursor=None, limit=None, pattern=None):
+    reader = ContainerLogReader(None, None, "c1", False, LogsRequest(), cursor=cursor, limit=limit, pattern=pattern)
+    return reader, list(reader._records(io.BytesIO(body).read))
+
+
+def test_timestamp_parser():
+    parser = LogTimestampParser()
+    assert parser.parse(f"{T}.123456789Z") == T_NS + 123456789
+    assert parser.parse(f"{T}.5Z") == T_NS + 500_000_000
+    assert parser.parse(f"{T}Z") == T_NS
+    assert parser.parse("not a timestamp") is None
+
+
+def test_cursor_and_time_parsing():
+    assert parse_cursor(format_cursor(T_NS, 3)) == (T_NS, 3)
+    with pytest.raises(ValueError):
+        parse_cursor("abc")
+    assert parse_log_time("1714564800") == "1714564800"
+    assert parse_log_time(f"{T}Z") == "1714564800.000000"
+    with pytest.raises(ValueError):
+        parse_log_time("ontem")
+
+
+def test_demux_reassembles_split_and_joined_frames():
+    body = (_frame(1, b"first li") + _frame(2, b"error\n") + _frame(1, b"ne\nsecond\nthi")
+            + _frame(0, b"") + _frame(1, b"rd"))
+    frames = iter_frames(io.BytesIO(body).read, tty=False)
+    assert list(iter_lines(frames)) == [
+        ("stderr", "error"), ("stdout", "first line"), ("stdout", "second"), ("stdout", "third"),
+    ]
+
+
+def test_tty_body_is_not_multiplexed():
+    frames = iter_frames(io.BytesIO(b"a\nb\n").read, tty=True)
+    assert list(iter_lines(frames)) == [("stdout", "a"), ("stdout", "b")]
+
+
+def test_page_stops_one_past_limit_with_cursor():
+    body = _body(("stdout", f"{T}.1Z one"), ("stderr", f"{T}.1Z two"), ("stdout", f"{T}.2Z three"))
+    _, records = _reader(body, limit=1)
+    # Uma linha além do limite indica has_more para records()
+    assert [record["message"] for record in records] == ["one", "two"]
+    assert records[0]["stream"] == "stdout" and records[1]["stream"] == "stderr"
+    assert records[1]["cursor"] == format_cursor(T_NS + 100_000_000, 2)
+
+
+def test_cursor_resumes_between_lines_with_same_timestamp():
+    body = _body(("stdout", f"{T}.1Z one"), ("stdout", f"{T}.1Z two"), ("stdout", f"{T}.2Z three"))
+    _, first_page = _reader(body, limit=1)
+    reader, records = _reader(body, cursor=first_page[0]["cursor"])
+    assert [record["message"] for record in records] == ["two", "three"]
+    assert reader.scanned == 2
+
+
+def test_pattern_filters_messages_but_counts_scanned():
+    body = _body(("stdout", f"{T}.1Z GET /"), ("stdout", f"{T}.2Z POST /login"), ("stdout", f"{T}.3Z GET /a"))
+    reader, records = _reader(body, pattern=r"^GET")
+    assert [record["message"] for record in records] == ["GET /", "GET /a"]
+    assert reader.scanned == 3
+
+
+def test_invalid_parameters_fail_before_reading():
+    with pytest.raises(ValueError):
+        ContainerLogReader(None, None, "c1", False, LogsRequest(), pattern="(")
+    with pytest.raises(ValueError):
+        ContainerLogReader(None, None, "c1", False, LogsRequest(), cursor="x-1")
@@ -0,0 +1,87 @@
+"""
+NetPilot System Operations - Estatísticas de containers
+CPU por consumidor e encerramento dos streams compartilhados
+"""
+
+import asyncio
+import itertools
+from datetime import datetime
+
+from models.docker import ContainerInfo
+from services.container_stats import ContainerStatsCollector, ContainerStatsStreams, cpu_percent_between
+
+
+class FakeEngine:
+    async def run(self, category, name, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+class FakeApiClient:
+    """Uso de CPU acumulado avança 1s a cada leitura"""
+
+    def __init__(self):
+        self.usage = itertools.count(0, 1_000_000_000)
+
+    def stats(self, container_id, stream=False, one_shot=None):
+        return {"cpu_stats": {"cpu_usage": {"total_usage": next(self.usage)}}}
+
+
+def _container(container_id):
+    return ContainerInfo(id=container_id, name=container_id, image="img", image_id="sha",
+                         status="running", state="running", created=datetime.now())
+
+
+def test_cpu_percent_between():
+    previous = {"cpu_usage": {"total_usage": 100}, "system_cpu_usage": 1000}
+    current = {"cpu_usage": {"total_usage": 200}, "system_cpu_usage": 2000, "online_cpus": 2}
+    assert cpu_percent_between(current, previous) == 20.0
+    assert cpu_percent_between(current, None) == 0.0
+
+
+def test_cpu_percent_uses_previous_sample():
+    previous = {}
+    assert ContainerStatsCollector._cpu_percent(previous, "c1", 10.0, 0) == 0.0
+    assert ContainerStatsCollector._cpu_percent(previous, "c1", 12.0, 1_000_000_000) == 50.0
+
+
+def test_consumers_keep_separate_cpu_baselines():
+    async def scenario():
+        collector = ContainerStatsCollector(FakeEngine())
+        collector.cgroup_v2 = False
+        collector.start(FakeApiClient())
+        containers = [_container("c1")]
+
+        await collector.collect(containers, consumer="monitoring")
+        # A coleta do WebSocket não pode virar a base da próxima coleta do monitoramento
+        first = await collector.collect(containers, consumer="websocket")
+        assert first["c1"].cpu_usage == 0.0
+        await collector.collect(containers, consumer="monitoring")
+
+        assert collector._previous_cpu["monitoring"]["c1"][1] == 2_000_000_000
+        assert collector._previous_cpu["websocket"]["c1"][1] == 1_000_000_000
+
+        # Container que sumiu deixa de ser acompanhado
+        await collector.collect([], consumer="monitoring")
+        assert collector._previous_cpu["monitoring"] == {}
+    asyncio.run(scenario())
+
+
+def test_stop_ends_stream_listeners():
+    async def scenario():
+        streams = ContainerStatsStreams(FakeEngine())
+        streams._run = lambda container_id: asyncio.sleep(3600)
+        received = []
+
+        async def listen():
+            async for stats in streams.subscribe("c1"):
+                received.append(stats)
+
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0)
+        assert streams.get_status()["streams"] == 1
+
+        await streams.stop()
+        await asyncio.wait_for(listener, 1)
+        assert received == []
+        assert streams.get_status() == {"streams": 0, "listeners": 0}
+    asyncio.run(scenario())
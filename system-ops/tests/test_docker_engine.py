@@ -0,0 +1,72 @@
+"""
+NetPilot System Operations - Docker Engine
+Histograma de latência e encerramento de streams bloqueantes
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+from docker.types.daemon import CancellableStream
+
+from services.docker_engine import LATENCY_BUCKETS, DockerEngine, OperationLatency
+
+
+def test_latency_histogram_has_overflow_bucket():
+    latency = OperationLatency("read")
+    for duration in (0.001, 0.005, 0.2, LATENCY_BUCKETS[-1], 120.0):
+        latency.observe(duration)
+
+    buckets = latency.to_dict()["buckets"]
+    assert buckets["0.005"] == 2
+    assert buckets["0.25"] == 1
+    assert buckets[str(LATENCY_BUCKETS[-1])] == 1
+    assert buckets["+Inf"] == 1
+    assert sum(buckets.values()) == latency.count
+
+
+def test_run_records_latency():
+    async def scenario():
+        engine = DockerEngine(max_workers=2)
+        try:
+            assert await engine.run("read", "ping", lambda: "OK") == "OK"
+        finally:
+            engine.shutdown()
+        return engine.latency["ping"]
+
+    latency = asyncio.run(scenario())
+    assert latency.count == 1 and latency.in_flight == 0
+
+
+def test_leaving_stream_unblocks_sdk_generator():
+    reader, writer = socket.socketpair()
+    # Mesma estrutura que o CancellableStream percorre até o socket
+    response = SimpleNamespace(raw=SimpleNamespace(closed=False, _fp=SimpleNamespace(fp=SimpleNamespace(_sock=reader))))
+
+    def stream_helper(response):
+        sock = response.raw._fp.fp._sock
+        while True:
+            data = sock.recv(1)
+            if not data:
+                return
+            yield data
+
+    async def scenario():
+        engine = DockerEngine(max_workers=1)
+        writer.sendall(b"a")
+        async for item in engine.stream("test.stream", lambda: CancellableStream(stream_helper(response), response)):
+            assert item == b"a"
+            break
+        return engine
+
+    engine = asyncio.run(scenario())
+    # A thread leitora estava bloqueada no recv: precisa terminar sem erro
+    deadline = time.monotonic() + 2
+    while any(t.name == "docker-stream-test.stream" for t in threading.enumerate()):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert engine.latency["test.stream"].errors == 0
+    assert engine.active_streams["test.stream"] == 0
+    writer.close()
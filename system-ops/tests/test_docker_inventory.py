@@ -0,0 +1,86 @@
+"""
+NetPilot System Operations - Inventário Docker
+Atualização do cache por eventos (criação, mudança e remoção de containers)
+"""
+
+import asyncio
+from datetime import timezone
+
+from models.docker import ContainerListRequest
+from services.docker_inventory import ContainerInventory
+
+
+class FakeEngine:
+    async def run(self, category, name, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+class FakeApiClient:
+    """Daemon com os containers configurados; registra os filtros de cada listagem"""
+
+    def __init__(self, *summaries):
+        self.daemon = {summary["Id"]: summary for summary in summaries}
+        self.queries = []
+
+    def containers(self, all=False, filters=None):
+        self.queries.append(filters)
+        ids = filters["id"] if filters else list(self.daemon)
+        return [self.daemon[container_id] for container_id in ids if container_id in self.daemon]
+
+    def images(self):
+        return [{"Id": "sha256:img", "RepoTags": ["web:1"]}]
+
+
+def summary(container_id, name, state="running"):
+    return {"Id": container_id, "Names": [f"/{name}"], "State": state, "ImageID": "sha256:img",
+            "Image": "web", "Created": 1714564800}
+
+
+def event(action, container_id):
+    return {"Type": "container", "Action": action, "Actor": {"ID": container_id}}
+
+
+def names(inventory):
+    return sorted(info.name for info in inventory.list(ContainerListRequest(all=True)))
+
+
+def test_events_add_update_and_remove_containers():
+    async def scenario():
+        client = FakeApiClient(summary("a", "web"))
+        inventory = ContainerInventory(FakeEngine(), refresh_delay=0)
+        inventory.api_client = client
+        await inventory.resync()
+        assert names(inventory) == ["web"]
+        assert inventory.list(ContainerListRequest(all=False))[0].created.tzinfo == timezone.utc
+
+        # Criação e renomeação próximas viram uma única listagem filtrada
+        client.daemon["b"] = summary("b", "worker")
+        client.daemon["a"] = summary("a", "web-renamed")
+        inventory._apply_event(event("create", "b"))
+        inventory._apply_event(event("rename", "a"))
+        inventory._apply_event(event("exec_start: sh", "a"))
+        await inventory._refresh_task
+        assert sorted(client.queries[-1]["id"]) == ["a", "b"]
+        assert names(inventory) == ["web-renamed", "worker"]
+
+        client.daemon["b"] = summary("b", "worker", state="exited")
+        inventory._apply_event(event("die", "b"))
+        await inventory._refresh_task
+        assert [info.name for info in inventory.list(ContainerListRequest(all=False))] == ["web-renamed"]
+
+        del client.daemon["b"]
+        inventory._apply_event(event("destroy", "b"))
+        assert names(inventory) == ["web-renamed"]
+        assert inventory.events_processed == 5
+    asyncio.run(scenario())
+
+
+def test_stop_waits_for_background_tasks():
+    async def scenario():
+        inventory = ContainerInventory(FakeEngine(), refresh_delay=60)
+        inventory.api_client = FakeApiClient()
+        inventory._schedule_refresh("a")
+        task = inventory._refresh_task
+        await inventory.stop()
+        assert task.done() and inventory._refresh_task is None
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+"""
+NetPilot System Operations - Sessões de exec
+Cópia entre WebSocket e a conexão do exec, frames de controle e limite de sessões
+"""
+
+import asyncio
+import json
+import socket
+
+from services.exec_sessions import CLOSE_CODE_TRY_AGAIN, ExecSessionManager
+
+
+class FakeEngine:
+    async def run(self, category, name, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+class FakeApiClient:
+    """Exec cujo lado do container é a outra ponta de um socketpair"""
+
+    def __init__(self):
+        self.container, self.daemon = socket.socketpair()
+        self.resizes = []
+
+    def exec_create(self, container, cmd, **kwargs):
+        return {"Id": "exec-1"}
+
+    def exec_start(self, exec_id, tty=False, socket=False):
+        return self.daemon
+
+    def exec_resize(self, exec_id, height=None, width=None):
+        self.resizes.append((width, height))
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": 0}
+
+
+class FakeWebSocket:
+    """Entrega os frames enfileirados e registra o que foi enviado"""
+
+    def __init__(self, *messages):
+        self.incoming = asyncio.Queue()
+        for message in messages:
+            self.incoming.put_nowait(message)
+        self.sent = []
+        self.closed_with = None
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=None, reason=None):
+        self.closed_with = code
+
+
+def text(control):
+    return {"type": "websocket.receive", "text": control if isinstance(control, str) else json.dumps(control)}
+
+
+def test_session_pumps_both_directions():
+    async def scenario():
+        client = FakeApiClient()
+        manager = ExecSessionManager(FakeEngine())
+        manager.start(client)
+        websocket = FakeWebSocket(
+            {"type": "websocket.receive", "bytes": b"ls\n"},
+            text({"type": "stdin", "data": "pwd\n"}),
+        )
+        run = asyncio.create_task(manager.run(websocket, "c1", "sh"))
+
+        loop = asyncio.get_running_loop()
+        received = b""
+        while received != b"ls\npwd\n":
+            received += await loop.run_in_executor(None, client.container.recv, 1024)
+        client.container.sendall(b"output")
+        client.container.close()
+        await run
+
+        assert websocket.sent[0] == {"type": "started", "exec_id": "exec-1"}
+        assert b"".join(m for m in websocket.sent if isinstance(m, bytes)) == b"output"
+        assert websocket.sent[-1] == {"type": "exit", "exit_code": 0}
+        assert manager.sessions == {}
+    asyncio.run(scenario())
+
+
+def test_malformed_control_frames_are_ignored():
+    async def scenario():
+        client = FakeApiClient()
+        manager = ExecSessionManager(FakeEngine())
+        manager.start(client)
+        websocket = FakeWebSocket(
+            text("[1, 2]"),
+            text("null"),
+            text({"type": "resize", "cols": "wide", "rows": 10}),
+            text({"type": "resize", "cols": None, "rows": 10}),
+            text({"type": "resize", "cols": 120, "rows": 40}),
+            {"type": "websocket.disconnect"},
+        )
+        await manager.run(websocket, "c1", "sh", cols=80, rows=24)
+        client.container.close()
+
+        # Só o tamanho inicial e o resize válido chegaram ao daemon
+        assert client.resizes == [(80, 24), (120, 40)]
+    asyncio.run(scenario())
+
+
+class SlowCreateEngine(FakeEngine):
+    """exec_create cede o loop, como a chamada real ao daemon"""
+
+    async def run(self, category, name, fn, *args, **kwargs):
+        if name == "exec.create":
+            await asyncio.sleep(0.01)
+        return fn(*args, **kwargs)
+
+
+def test_concurrent_connects_respect_the_limit():
+    async def scenario():
+        client = FakeApiClient()
+        manager = ExecSessionManager(SlowCreateEngine(), max_sessions=1)
+        manager.start(client)
+        first = FakeWebSocket({"type": "websocket.disconnect"})
+        second = FakeWebSocket({"type": "websocket.disconnect"})
+        await asyncio.gather(manager.run(first, "c1", "sh"), manager.run(second, "c1", "sh"))
+        client.container.close()
+
+        assert first.closed_with is None and first.sent[0]["type"] == "started"
+        assert second.closed_with == CLOSE_CODE_TRY_AGAIN and second.sent == []
+        assert manager.total_sessions == 1
+        assert manager._slots == 0
+    asyncio.run(scenario())
@@ -0,0 +1,107 @@
+"""
+NetPilot System Operations - Backend nftables
+Compila regras para um nft falso e confere o isolamento da regra inválida
+"""
+
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from models.system import TrafficRule
+from services.firewall_backends import FirewallBackend, NftablesBackend
+from utils.system import SystemUtils
+
+FAKE_NFT = """#!/bin/sh
+input=$(cat)
+printf '%s\\n' "$*" >> "{calls}"
+if [ "$1" = "-c" ]; then
+    line=$(printf '%s\\n' "$input" | grep -n 'dport 2222' | cut -d: -f1 | head -n 1)
+    if [ -n "$line" ]; then
+        echo "/dev/stdin:$line:3-22: Error: Could not parse port" >&2
+        exit 1
+    fi
+else
+    printf '%s' "$input" > "{loaded}"
+fi
+"""
+
+
+def test_nftables_backend_isolates_invalid_rule(tmp_path):
+    calls, loaded = tmp_path / "calls", tmp_path / "loaded"
+    fake = tmp_path / "nft"
+    fake.write_text(FAKE_NFT.format(calls=calls, loaded=loaded))
+    fake.chmod(0o755)
+
+    rules = [
+        TrafficRule(rule_id="ssh", name="ssh", action="allow", destination_port=22),
+        TrafficRule(rule_id="net", name="net", action="block", source_ip="10.0.0.0/8"),
+        TrafficRule(rule_id="web", name="web", action="rate_limit", destination_port=80,
+                    rate_limit={"requests_per_minute": 100}),
+        TrafficRule(rule_id="bad", name="bad", action="block", source_ip="1.2.3.4", destination_port=2222),
+    ]
+    backend = NftablesBackend(SystemUtils(), binary=str(fake))
+    results = asyncio.run(backend.apply(rules))
+
+    assert not results["bad"]["success"]
+    assert all(results[rule_id]["success"] for rule_id in ("ssh", "net", "web"))
+
+    ruleset = loaded.read_text()
+    assert "10.0.0.0/8 : drop" in ruleset
+    assert "tcp . 22 : accept" in ruleset
+    assert "meter rl_web_v4 { ip saddr limit rate over 100/minute" in ruleset
+    assert 'tcp dport 80 accept comment "netpilot:web"' in ruleset
+    assert "2222" not in ruleset
+    # Duas validações (com e sem a regra inválida) e uma única carga
+    assert calls.read_text().splitlines() == ["-c -f -", "-c -f -", "-f -"]
+
+
+def test_backend_requires_apply():
+    with pytest.raises(TypeError):
+        FirewallBackend()
+
+
+def test_nftables_render_follows_priority():
+    rules = [
+        TrafficRule(rule_id="ssh", name="ssh", action="deny", source_ip="10.0.0.0/8",
+                    destination_port=22, priority=100),
+        TrafficRule(rule_id="admin", name="admin", action="allow", source_ip="10.0.0.5", priority=1),
+        TrafficRule(rule_id="dns", name="dns", action="block", source_ip="192.0.2.1", protocol="udp", priority=120),
+    ]
+    chain = NftablesBackend().render(rules).text.split("chain input {")[1]
+
+    # O allow de prioridade 1 é consultado antes do deny explícito de prioridade 100
+    assert chain.index("vmap @src_v4_0") < chain.index('comment "netpilot:ssh"')
+    # Regra só de origem com outro protocolo não vira elemento de map (valeria para todo tráfego)
+    assert "ip saddr 192.0.2.1/32 meta l4proto udp drop" in chain
+    assert "192.0.2.1/32 : drop" not in NftablesBackend().render(rules).text
+
+
+def test_nftables_overlapping_networks_split_maps():
+    rules = [
+        TrafficRule(rule_id="host", name="host", action="allow", source_ip="10.0.0.5", priority=1),
+        TrafficRule(rule_id="net", name="net", action="block", source_ip="10.0.0.0/8", priority=2),
+    ]
+    text = NftablesBackend().render(rules).text
+    assert "map src_v4_0" in text and "map src_v4_1" in text
+
+
+def test_nftables_rejects_colliding_ids(tmp_path):
+    fake = tmp_path / "nft"
+    fake.write_text("#!/bin/sh\ncat > /dev/null\n")
+    fake.chmod(0o755)
+    rules = [
+        TrafficRule(rule_id="web.1", name="a", action="rate_limit", destination_port=80,
+                    rate_limit={"requests_per_minute": 10}),
+        TrafficRule(rule_id="web_1", name="b", action="rate_limit", destination_port=81,
+                    rate_limit={"requests_per_minute": 10}),
+    ]
+    results = asyncio.run(NftablesBackend(SystemUtils(), binary=str(fake)).apply(rules))
+    assert results["web.1"]["success"]
+    assert not results["web_1"]["success"]
+
+
+def test_nft_injection_is_rejected_by_the_model():
+    payload = "1.1.1.1 }\n}\ntable inet evil { chain x { type filter hook input priority -500; policy drop; } }\n#"
+    with pytest.raises(ValidationError):
+        TrafficRule(name="x", action="redirect", destination_port=80, redirect_to=payload)
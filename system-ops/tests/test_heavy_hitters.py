@@ -0,0 +1,136 @@
+"""
+NetPilot System Operations - Heavy hitters
+Count-min sketch, Space-Saving, janelas deslizantes e alimentação pela coleta
+"""
+
+import random
+
+import pytest
+
+from services.heavy_hitters import (
+    AccessLogTail, CountMinSketch, HeavyHitterCollector, HeavyHitters, SlidingTopK, SpaceSaving,
+    sketch_indexes
+)
+from utils.connection_table import ConnectionTable
+
+WIDTH, DEPTH = 256, 4
+
+
+def _indexes(key):
+    return sketch_indexes(key, WIDTH, DEPTH)
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(WIDTH, DEPTH)
+    rng = random.Random(7)
+    counts = {}
+    for _ in range(5000):
+        key = f"10.0.{rng.randrange(8)}.{rng.randrange(256)}"
+        counts[key] = counts.get(key, 0) + 1
+        sketch.add(_indexes(key))
+
+    errors = [sketch.estimate(_indexes(key)) - count for key, count in counts.items()]
+    assert min(errors) >= 0
+    # Erro esperado ~ N/width por linha; o mínimo entre linhas fica bem abaixo disso
+    assert sum(errors) / len(errors) < 5000 / WIDTH
+
+
+def test_sketch_indexes_spread_integer_keys():
+    rows = {tuple(_indexes(port)) for port in range(1000, 1100)}
+    assert len(rows) == 100
+    assert all(0 <= index < WIDTH for row in rows for index in row)
+
+
+def test_space_saving_keeps_frequent_keys():
+    summary = SpaceSaving(capacity=4)
+    for key in ["a"] * 50 + ["b"] * 30 + [f"noise{n}" for n in range(40)]:
+        summary.add(key)
+
+    assert len(summary.counts) == 4
+    assert {"a", "b"} <= set(summary.counts)
+    assert summary.counts["a"] >= 50 and summary.counts["b"] >= 30
+    assert summary.minimum() == min(summary.counts.values())
+
+
+def test_space_saving_replacement_inherits_minimum():
+    summary = SpaceSaving(capacity=2)
+    summary.add("a", 5)
+    summary.add("b", 3)
+    summary.add("c")
+    assert summary.counts == {"a": 5, "c": 4}
+
+
+def test_sliding_window_drops_old_buckets():
+    window = SlidingTopK(60, 6, WIDTH, DEPTH, capacity=8)
+    window.add("old", _indexes("old"), 10, now=1000)
+    window.add("new", _indexes("new"), 3, now=1055)
+    assert window.top(2, now=1055) == [("old", 10), ("new", 3)]
+    assert window.top(2, now=1061) == [("new", 3)]
+    assert window.estimate(_indexes("old"), now=1061) == 0
+
+
+def test_scan_does_not_evict_real_candidates():
+    window = SlidingTopK(60, 1, WIDTH, DEPTH, capacity=4)
+    for key in ("a", "b", "c", "d"):
+        window.add(key, _indexes(key), 20, now=0)
+    # Varredura: muitas chaves de contagem 1 com o resumo cheio
+    for n in range(200):
+        key = f"scan{n}"
+        window.add(key, _indexes(key), 1, now=0)
+    assert {key for key, _ in window.top(4, now=0)} == {"a", "b", "c", "d"}
+
+
+def test_heavy_hitters_rejects_unknown_dimension_and_window():
+    heavy_hitters = HeavyHitters(WIDTH, DEPTH, capacity=8)
+    heavy_hitters.add_many("ip", {"10.0.0.1": 3, "10.0.0.2": 1})
+    assert heavy_hitters.top("ip", "1m", 1) == [("10.0.0.1", 3)]
+    assert heavy_hitters.estimate("ip", "10.0.0.2", "1h") >= 1
+    with pytest.raises(ValueError):
+        heavy_hitters.top("asn")
+    with pytest.raises(ValueError):
+        heavy_hitters.top("ip", "2m")
+
+
+def test_access_log_tail_follows_rotation(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_text("old line\n")
+    tail = AccessLogTail(str(path))
+    # Primeira leitura começa no fim: histórico fica de fora
+    assert tail.read_lines() == []
+
+    with open(path, "a") as f:
+        f.write("first\nsec")
+    assert tail.read_lines() == ["first"]
+    with open(path, "a") as f:
+        f.write("ond\n")
+    assert tail.read_lines() == ["second"]
+
+    path.rename(tmp_path / "access.log.1")
+    path.write_text("rotated\n")
+    assert tail.read_lines() == ["rotated"]
+    tail.close()
+
+
+def test_collector_counts_new_connections_and_requests(tmp_path):
+    log = tmp_path / "access.log"
+    log.write_text("")
+    heavy_hitters = HeavyHitters(WIDTH, DEPTH, capacity=8)
+    collector = HeavyHitterCollector(heavy_hitters, ConnectionTable(), access_log=str(log))
+
+    # (porta local, "IP:porta" remotos) em hexa, como em ConnectionSnapshot.inbound
+    first = frozenset({("0050", "0500000A:C350"), ("0050", "0500000A:C351")})
+    collector._feed(first)
+    # Mesmas conexões na leitura seguinte não contam de novo; só a nova
+    collector._feed(first | {("0016", "0600000A:D431")})
+
+    with open(log, "a") as f:
+        f.write('10.0.0.9 - - [01/May/2024:12:00:00 +0000] "GET /login?next=/ HTTP/1.1" 200 10 "-" "-"\n')
+        f.write('10.0.0.9 - - [01/May/2024:12:00:01 +0000] "POST /login HTTP/1.1" 401 10 "-" "-"\n')
+        f.write("linha inválida\n")
+    collector._feed(first)
+
+    assert heavy_hitters.top("ip", "5m") == [("10.0.0.5", 2), ("10.0.0.6", 1)]
+    assert heavy_hitters.top("port", "5m") == [(80, 2), (22, 1)]
+    assert heavy_hitters.top("http_ip", "5m") == [("10.0.0.9", 2)]
+    assert heavy_hitters.top("path", "5m") == [("/login", 2)]
+    collector.access_log.close()
@@ -0,0 +1,91 @@
+"""
+NetPilot System Operations - Pulls de imagens
+Coalescência de pulls da mesma referência e progresso por camada
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from services.image_pull import ImagePullManager, image_reference
+
+
+class FakeEngine:
+    """Cada stream entrega as mensagens configuradas depois que o teste libera o gate"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.gate = asyncio.Event()
+        self.opened = []
+        self.limits = {"pull": 2}
+
+    async def stream(self, operation, factory, maxsize=1000, category=None):
+        self.opened.append(factory())
+        await self.gate.wait()
+        for message in self.messages:
+            yield message
+
+    async def run(self, category, name, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+def manager_for(engine):
+    manager = ImagePullManager(engine)
+    images = SimpleNamespace(get=lambda reference: SimpleNamespace(id="sha256:abc", tags=[reference]))
+    manager.start(SimpleNamespace(images=images), None)
+    manager._open = lambda repository, tag, auth: (repository, tag)
+    return manager
+
+
+def test_image_reference():
+    assert image_reference("nginx") == "nginx:latest"
+    assert image_reference("nginx", "1.25") == "nginx:1.25"
+    assert image_reference("registry:5000/app") == "registry:5000/app:latest"
+    assert image_reference("nginx@sha256:abc", "1.25") == "nginx@sha256:abc"
+
+
+def test_concurrent_pulls_share_one_stream():
+    async def scenario():
+        engine = FakeEngine([
+            {"status": "Pulling from library/nginx", "id": "latest"},
+            {"status": "Downloading", "id": "l1", "progressDetail": {"current": 5, "total": 10}},
+            {"status": "Download complete", "id": "l1"},
+        ])
+        manager = manager_for(engine)
+        first = manager.pull("nginx")
+        second = manager.pull("nginx", "latest")
+        assert first is second and manager.coalesced == 1
+
+        waiters = asyncio.gather(first.wait(), second.wait())
+        await asyncio.sleep(0)
+        engine.gate.set()
+        results = await waiters
+
+        assert engine.opened == [("nginx", "latest")]
+        assert results == [{"image_id": "sha256:abc", "tags": ["nginx:latest"]}] * 2
+        assert first.progress() == {"current": 10, "total": 10}
+        assert manager.pulls == {} and list(manager.recent) == ["nginx:latest"]
+    asyncio.run(scenario())
+
+
+def test_failed_pull_reports_error_to_every_waiter():
+    async def scenario():
+        engine = FakeEngine([{"error": "denied", "errorDetail": {"message": "pull access denied"}}])
+        manager = manager_for(engine)
+        pull = manager.pull("private/app")
+        waiters = asyncio.gather(pull.wait(), manager.pull("private/app").wait(), return_exceptions=True)
+        await asyncio.sleep(0)
+        engine.gate.set()
+
+        errors = await waiters
+        assert len(engine.opened) == 1
+        assert [str(error) for error in errors] == ["pull access denied"] * 2
+        assert all(isinstance(error, RuntimeError) for error in errors)
+        assert pull.to_dict()["status"] == "error"
+
+        # O pull que falhou não fica registrado: um novo pedido abre outro stream
+        engine.messages = []
+        retry = manager.pull("private/app")
+        assert retry is not pull
+        await retry.wait()
+        assert len(engine.opened) == 2
+    asyncio.run(scenario())
@@ -0,0 +1,156 @@
+"""
+NetPilot System Operations - Blocklist ipset
+Normalização dos alvos, linhas do 'ipset restore' e espelho em memória
+"""
+
+import asyncio
+
+import pytest
+
+from services.ip_blocklist import IpBlocklist, parse_target
+from utils.system import CommandResult
+
+
+class FakeSystemUtils:
+    """Registra os comandos; 'ipset save' devolve o conteúdo configurado por set"""
+
+    def __init__(self, saved=None):
+        self.saved = saved or {}
+        self.commands = []
+        self.restores = []
+
+    async def run_command(self, command, timeout=None, cwd=None, env=None):
+        self.commands.append(command)
+        if command[1:2] == ["save"]:
+            return CommandResult(0, self.saved.get(command[2], ""), "", 0.0)
+        return CommandResult(0, "", "", 0.0)
+
+    async def run_command_with_input(self, command, input_data, timeout=None, cwd=None):
+        self.restores.append(input_data.splitlines())
+        return CommandResult(0, "", "", 0.0)
+
+
+def test_parse_target():
+    assert parse_target(" 10.0.0.1 ") == ("10.0.0.1", "NETPILOT_BLOCK4_IP")
+    assert parse_target("10.0.0.9/24") == ("10.0.0.0/24", "NETPILOT_BLOCK4_NET")
+    assert parse_target("10.0.0.1/32") == ("10.0.0.1", "NETPILOT_BLOCK4_IP")
+    assert parse_target("2001:db8::/32") == ("2001:db8::/32", "NETPILOT_BLOCK6_NET")
+    with pytest.raises(ValueError):
+        parse_target("10.0.0.1 -j ACCEPT")
+    with pytest.raises(ValueError):
+        parse_target("0.0.0.0/0")
+
+
+def test_parse_save():
+    output = ("create NETPILOT_BLOCK4_IP hash:ip family inet timeout 0 maxelem 262144\n"
+              "add NETPILOT_BLOCK4_IP 10.0.0.1 timeout 120\n"
+              "add NETPILOT_BLOCK4_IP 10.0.0.2 timeout 0\n")
+    assert IpBlocklist._parse_save(output) == [("10.0.0.1", 120), ("10.0.0.2", 0)]
+
+
+def test_add_and_remove_batch_in_one_restore():
+    async def scenario():
+        utils = FakeSystemUtils()
+        blocklist = IpBlocklist(utils)
+        added = await blocklist.add(["10.0.0.1", "192.168.0.0/16"], timeout=60, reason="scan")
+        assert added == ["10.0.0.1", "192.168.0.0/16"]
+
+        # ensure(): sets e list:set por família numa transação, depois a regra por família
+        setup = utils.restores[0]
+        assert "create NETPILOT_BLOCK4_IP hash:ip family inet timeout 0 maxelem 262144" in setup
+        assert "add NETPILOT_BLOCK6 NETPILOT_BLOCK6_NET" in setup
+        assert ["iptables", "-C", "INPUT", "-m", "set", "--match-set", "NETPILOT_BLOCK4", "src",
+                "-j", "DROP"] in utils.commands
+        assert utils.restores[1] == [
+            "add NETPILOT_BLOCK4_IP 10.0.0.1 timeout 60",
+            "add NETPILOT_BLOCK4_NET 192.168.0.0/16 timeout 60",
+        ]
+
+        assert blocklist.contains("10.0.0.1")
+        assert blocklist.contains("192.168.4.4")
+        assert not blocklist.contains("172.16.0.1")
+
+        assert await blocklist.remove(["192.168.0.0/16", "10.9.9.9"]) == ["192.168.0.0/16"]
+        assert utils.restores[2] == ["del NETPILOT_BLOCK4_NET 192.168.0.0/16", "del NETPILOT_BLOCK4_IP 10.9.9.9"]
+        assert not blocklist.contains("192.168.4.4")
+        assert blocklist.count() == 1
+    asyncio.run(scenario())
+
+
+def test_mirror_loads_kernel_state_and_expires():
+    async def scenario():
+        utils = FakeSystemUtils({"NETPILOT_BLOCK4_NET": "add NETPILOT_BLOCK4_NET 10.1.0.0/16 timeout 0\n"})
+        blocklist = IpBlocklist(utils)
+        await blocklist.ensure()
+        assert blocklist.contains("10.1.2.3")
+
+        await blocklist.add(["10.0.0.1"], timeout=60)
+        # Simula o timeout do kernel: o espelho acompanha sem consultar o ipset
+        blocklist.entries["10.0.0.1"].expires_at = 0
+        blocklist._expiry = [(0, "10.0.0.1")]
+        assert not blocklist.contains("10.0.0.1")
+        assert [entry["ip_address"] for entry in blocklist.list()] == ["10.1.0.0/16"]
+    asyncio.run(scenario())
+
+
+def test_missing_ip6tables_keeps_ipv4_blocking():
+    class NoIp6tables(FakeSystemUtils):
+        async def run_command(self, command, timeout=None, cwd=None, env=None):
+            if command[0] == "ip6tables":
+                self.commands.append(command)
+                return CommandResult(127, "", "ip6tables: not found", 0.0)
+            return await super().run_command(command, timeout, cwd, env)
+
+    async def scenario():
+        blocklist = IpBlocklist(NoIp6tables())
+        assert await blocklist.add(["10.0.0.1"]) == ["10.0.0.1"]
+        assert blocklist.families == {4}
+        with pytest.raises(ValueError):
+            await blocklist.add(["2001:db8::1"])
+        assert blocklist.contains("10.0.0.1")
+    asyncio.run(scenario())
+
+
+class PartialRestore(FakeSystemUtils):
+    """O lote de 'add' falha no meio: o kernel fica só com a primeira entrada"""
+
+    async def run_command_with_input(self, command, input_data, timeout=None, cwd=None):
+        lines = input_data.splitlines()
+        self.restores.append(lines)
+        if lines[0].startswith("add NETPILOT_BLOCK4_IP 10.0.0."):
+            self.saved["NETPILOT_BLOCK4_IP"] += lines[0] + "\n"
+            return CommandResult(1, "", "ipset v7.1: Error in line 2: Hash is full", 0.0)
+        return CommandResult(0, "", "", 0.0)
+
+
+def test_failed_restore_reloads_mirror():
+    async def scenario():
+        utils = PartialRestore({"NETPILOT_BLOCK4_IP": "add NETPILOT_BLOCK4_IP 10.9.9.9 timeout 0\n"})
+        blocklist = IpBlocklist(utils)
+        await blocklist.ensure()
+        blocklist.entries["10.9.9.9"].reason = "scan"
+
+        with pytest.raises(Exception):
+            await blocklist.add(["10.0.0.1", "10.0.0.2"], reason="flood")
+        assert sorted(blocklist.entries) == ["10.0.0.1", "10.9.9.9"]
+        assert blocklist.entries["10.9.9.9"].reason == "scan"
+    asyncio.run(scenario())
+
+
+class YieldingSystemUtils(FakeSystemUtils):
+    """Cede o loop a cada comando, como um subprocesso de verdade"""
+
+    async def run_command(self, command, timeout=None, cwd=None, env=None):
+        await asyncio.sleep(0)
+        return await super().run_command(command, timeout, cwd, env)
+
+
+def test_concurrent_first_calls_prepare_once():
+    async def scenario():
+        utils = YieldingSystemUtils()
+        blocklist = IpBlocklist(utils)
+        await asyncio.gather(blocklist.add(["10.0.0.1"]), blocklist.add(["10.0.0.2"]))
+        setups = [lines for lines in utils.restores if lines[0].startswith("create ")]
+        assert len(setups) == 1
+        assert sorted(blocklist.entries) == ["10.0.0.1", "10.0.0.2"]
+    asyncio.run(scenario())
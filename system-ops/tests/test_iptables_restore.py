@@ -0,0 +1,94 @@
+"""
+NetPilot System Operations - Compilador iptables-restore
+Renderização das chains NETPILOT e validação dos campos que vão para o texto
+"""
+
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from models.system import TrafficRule
+from services.iptables_restore import IptablesRestoreCompiler, render_rule
+from utils.system import CommandResult
+
+
+def test_render_rule_actions():
+    assert render_rule(TrafficRule(rule_id="ssh", name="ssh", action="allow", source_ip="10.0.0.5",
+                                   destination_port=22)) == (
+        "filter", ["NETPILOT_INPUT -s 10.0.0.5 -p tcp --dport 22 -m comment --comment netpilot:ssh -j ACCEPT"]
+    )
+
+    table, lines = render_rule(TrafficRule(rule_id="dns", name="dns", action="rate_limit", protocol="udp",
+                                           destination_port=53, rate_limit={"requests_per_minute": 10}))
+    assert table == "filter"
+    assert lines[0].endswith("-m limit --limit 10/min --limit-burst 10 -j ACCEPT")
+    assert lines[1].endswith("-j DROP")
+
+    table, lines = render_rule(TrafficRule(rule_id="web", name="web", action="redirect", destination_port=80,
+                                           redirect_to="10.0.0.2:8080"))
+    assert table == "nat"
+    assert lines == ["NETPILOT_PREROUTING -p tcp --dport 80 -m comment --comment netpilot:web "
+                     "-j DNAT --to-destination 10.0.0.2:8080"]
+
+
+def test_render_maps_lines_to_rules():
+    rules = [
+        TrafficRule(rule_id="late", name="late", action="block", source_ip="10.0.0.0/8", priority=200),
+        TrafficRule(rule_id="early", name="early", action="allow", source_ip="10.0.0.5", priority=1),
+        TrafficRule(rule_id="web", name="web", action="redirect", destination_port=80, redirect_to="10.0.0.2"),
+    ]
+    ruleset = IptablesRestoreCompiler().render(rules, {"filter": True})
+    lines = ruleset.text.splitlines()
+
+    assert lines[:3] == ["*filter", ":NETPILOT_INPUT - [0:0]", "-I INPUT 1 -j NETPILOT_INPUT"]
+    # Ordem por prioridade e cada linha '-A' aponta para sua regra
+    assert [ruleset.line_rules[n] for n in sorted(ruleset.line_rules)] == ["early", "late", "web"]
+    for number, rule_id in ruleset.line_rules.items():
+        assert lines[number - 1].startswith("-A ") and f"netpilot:{rule_id}" in lines[number - 1]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("protocol", "icmp\n-A INPUT -j ACCEPT\n#"),
+    ("redirect_to", "10.0.0.1:8080\nCOMMIT\n*filter\n-F INPUT\n#"),
+    ("redirect_to", "10.0.0.1:70000"),
+    ("source_ip", "1.2.3.4 -j ACCEPT"),
+    ("destination_port", 0),
+    ("rate_limit", {"requests_per_minute": None}),
+    ("rate_limit", {"requests_per_minute": [10]}),
+    ("rate_limit", {"burst": 0}),
+])
+def test_rule_fields_are_validated(field, value):
+    with pytest.raises(ValidationError):
+        TrafficRule(name="x", action="redirect", **{field: value})
+
+
+def test_rule_field_normalization():
+    rule = TrafficRule(name="x", action="redirect", protocol="UDP", redirect_to="[2001:db8::1]:8080")
+    assert rule.protocol == "udp"
+    assert rule.redirect_to == "[2001:db8::1]:8080"
+    rule = TrafficRule(name="x", action="rate_limit", rate_limit={"requests_per_minute": "30"})
+    assert rule.rate_limit == {"requests_per_minute": 30}
+
+
+class ChainListing:
+    """'-C' falha (salto ausente) e '-S' devolve a listagem configurada"""
+
+    def __init__(self, listing):
+        self.listing = listing
+
+    async def run_command(self, command, timeout=None, cwd=None, env=None):
+        if "-S" in command:
+            return CommandResult(0, self.listing, "", 0.0)
+        return CommandResult(1, "", "Bad rule", 0.0)
+
+
+def test_jump_goes_below_blocklist_rules():
+    listing = ("-P INPUT ACCEPT\n"
+               "-A INPUT -m set --match-set NETPILOT_BLOCK4 src -j DROP\n"
+               "-A INPUT -i lo -j ACCEPT\n")
+    jumps = asyncio.run(IptablesRestoreCompiler(ChainListing(listing))._missing_jumps(4))
+    assert jumps == {"filter": 2, "nat": 1}
+    text = IptablesRestoreCompiler().render([], jumps).text
+    assert "-I INPUT 2 -j NETPILOT_INPUT" in text
+    assert "-I PREROUTING 1 -j NETPILOT_PREROUTING" in text
@@ -0,0 +1,41 @@
+"""
+NetPilot System Operations - Buffer de replay de logs
+Numeração das linhas e since() para clientes novos e reconectados
+"""
+
+from services.log_replay import LogReplayBuffer
+
+
+def _lines(count):
+    return [{"message": f"line {n}"} for n in range(count)]
+
+
+def test_extend_numbers_lines():
+    replay = LogReplayBuffer(capacity=3, next_seq=10)
+    replay.extend(_lines(2))
+    assert [line["seq"] for line in replay.lines] == [10, 11]
+    assert replay.first_seq == 10 and replay.next_seq == 12
+
+
+def test_since_resumes_after_cursor():
+    replay = LogReplayBuffer(capacity=5)
+    replay.extend(_lines(4))
+    lines, missed = replay.since(2)
+    assert [line["seq"] for line in lines] == [3, 4] and missed == 0
+    assert replay.since(4) == ([], 0)
+
+
+def test_since_reports_lines_that_left_the_ring():
+    replay = LogReplayBuffer(capacity=3)
+    replay.extend(_lines(10))
+    lines, missed = replay.since(2)
+    assert [line["seq"] for line in lines] == [8, 9, 10]
+    assert missed == 5
+
+
+def test_since_without_cursor_has_no_missed_lines():
+    replay = LogReplayBuffer(capacity=3)
+    replay.extend(_lines(10))
+    lines, missed = replay.since(0)
+    assert [line["seq"] for line in lines] == [8, 9, 10]
+    assert missed == 0
@@ -0,0 +1,61 @@
+"""
+NetPilot System Operations - Exportador OpenMetrics
+Nomes e labels das famílias e exposição em /metrics
+"""
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.metrics_exporter import MetricFamily, MetricsExporter, parse_metric_name
+from services.metrics_store import MetricsStore
+
+client = TestClient(app)
+
+
+def test_parse_metric_name():
+    assert parse_metric_name("docker.container.web.cpu_percent") == (
+        "docker_container_cpu_percent", {"container": "web"}
+    )
+    # O valor do label pode conter pontos
+    assert parse_metric_name("network.eth0.100.bytes_sent") == ("network_bytes_sent", {"interface": "eth0.100"})
+    assert parse_metric_name("system.cpu-percent") == ("system_cpu_percent", {})
+
+
+def test_metric_family_render():
+    family = MetricFamily("requests", "counter", "Requisições \"atendidas\"")
+    family.add(3, {"path": 'a"b'}, "_total")
+    family.add(0.5)
+    lines = []
+    family.render(lines)
+    assert lines == [
+        "# TYPE netpilot_requests counter",
+        '# HELP netpilot_requests Requisições \\"atendidas\\"',
+        'netpilot_requests_total{path="a\\"b"} 3',
+        "netpilot_requests 0.5",
+    ]
+
+
+def test_metrics_endpoint():
+    """Testar exposição OpenMetrics"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "application/openmetrics-text" in response.headers["content-type"]
+    assert response.text.endswith("# EOF\n")
+
+
+def test_store_render_skips_stale_series():
+    store = MetricsStore(capacity=10, resolution=60, rollup_tiers=())
+    store.begin_tick(1000)
+    store.record("docker.container.gone.cpu_percent", 5.0)
+    store.record("system.cpu_percent", 10.0)
+    store.begin_tick(1060)
+    store.record("system.cpu_percent", 11.0)
+    store.record("docker.container.web.cpu_percent", 2.0)
+    # Coleta do tick seguinte em andamento: valores do anterior ainda valem
+    store.begin_tick(1120)
+    store.record("system.cpu_percent", 12.0)
+
+    text = MetricsExporter()._render_store(store)
+    assert "netpilot_system_cpu_percent 12" in text
+    assert 'netpilot_docker_container_cpu_percent{container="web"} 2' in text
+    assert "gone" not in text
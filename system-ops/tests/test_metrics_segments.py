@@ -0,0 +1,46 @@
+"""
+NetPilot System Operations - Segmentos de métricas
+Gravação, leitura e reabertura dos segmentos diários
+"""
+
+import time
+
+from services.metrics_segments import SEGMENT_SECONDS, SegmentStore
+
+# Dia corrente: segmentos fora da retenção são removidos na gravação
+DAY = int(time.time()) - int(time.time()) % SEGMENT_SECONDS
+
+
+def test_write_and_read_back(tmp_path):
+    store = SegmentStore(str(tmp_path), step=60)
+    store.write_tick(DAY, {"cpu": 10.0, "memory": 50.0})
+    store.write_tick(DAY + 60, {"cpu": 20.0})
+    store.close()
+
+    store = SegmentStore(str(tmp_path), step=60)
+    assert store.read("cpu", DAY, DAY + 120) == [(DAY, 10.0), (DAY + 60, 20.0)]
+    assert store.read("memory", DAY, DAY + 120) == [(DAY, 50.0)]
+    assert sorted(store.names(DAY, DAY + 60)) == ["cpu", "memory"]
+    store.close()
+
+
+def test_reopen_with_index_ahead_of_data(tmp_path):
+    store = SegmentStore(str(tmp_path), step=60)
+    store.write_tick(DAY, {"cpu": 10.0})
+    store.close()
+
+    # Escrita interrompida: nome no índice sem a região correspondente no .seg
+    index = next(tmp_path.glob("*.idx"))
+    with open(index, "a") as f:
+        f.write("orphan\n")
+
+    store = SegmentStore(str(tmp_path), step=60)
+    store.write_tick(DAY, {"disk": 70.0})
+    store.close()
+
+    assert index.read_text().splitlines() == ["cpu", "disk"]
+    store = SegmentStore(str(tmp_path), step=60)
+    assert store.read("cpu", DAY, DAY) == [(DAY, 10.0)]
+    assert store.read("disk", DAY, DAY) == [(DAY, 70.0)]
+    assert store.read("orphan", DAY, DAY) == []
+    store.close()
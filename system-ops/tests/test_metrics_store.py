@@ -0,0 +1,127 @@
+"""
+NetPilot System Operations - MetricsStore
+Buffer circular colunar e agregados por nível de resolução
+"""
+
+from services.metrics_store import MetricsStore
+
+T0 = 1_700_000_000 - 1_700_000_000 % 3600
+
+
+def _store(capacity=4):
+    return MetricsStore(capacity=capacity, resolution=60, rollup_tiers=())
+
+
+def test_ticks_share_timestamp():
+    store = _store()
+    store.begin_tick(T0)
+    store.record("cpu", 10.0)
+    store.record("memory", 50.0)
+    # Coleta no mesmo segundo cai no mesmo tick
+    assert store.begin_tick(T0 + 0.5) == store.head
+    assert store.tick_values() == {"cpu": 10.0, "memory": 50.0}
+    assert store.latest("cpu") == (T0, 10.0)
+
+
+def test_ring_overwrites_oldest_ticks():
+    store = _store(capacity=4)
+    for n in range(6):
+        store.begin_tick(T0 + n * 60)
+        store.record("cpu", float(n))
+
+    assert store.size == 4
+    assert store.oldest_timestamp() == T0 + 120
+    assert store.range("cpu", 0, T0 + 3600) == [(T0 + n * 60, float(n)) for n in range(2, 6)]
+    assert store.range("cpu", T0 + 180, T0 + 240) == [(T0 + 180, 3.0), (T0 + 240, 4.0)]
+
+
+def test_reused_slot_clears_missing_metrics():
+    store = _store(capacity=2)
+    store.begin_tick(T0)
+    store.record("disk", 1.0)
+    store.begin_tick(T0 + 60)
+    store.record("cpu", 1.0)
+    # O tick seguinte reaproveita o slot de T0: 'disk' não pode reaparecer
+    store.begin_tick(T0 + 120)
+    store.record("cpu", 2.0)
+    assert store.range("disk", 0, T0 + 120) == []
+    assert "disk" not in store
+    assert store.latest("disk") is None
+
+
+def test_unknown_metric():
+    store = _store()
+    assert store.latest("missing") is None
+    assert store.range("missing", 0, T0) == []
+    assert "missing" not in store
+
+
+def _rollup_store():
+    store = MetricsStore(capacity=10, resolution=60, rollup_tiers=((300, 12), (3600, 4)))
+    # 30 minutos de pontos por minuto: valor = minuto
+    for minute in range(30):
+        store.begin_tick(T0 + minute * 60)
+        store.record("cpu", float(minute))
+    return store
+
+
+def test_rollup_tiers_aggregate_every_point():
+    store = _rollup_store()
+    five_minutes, hourly = store.tiers
+    assert five_minutes.range("cpu", T0, T0) == [(T0, 0.0, 4.0, 10.0, 5, 4.0)]
+    assert hourly.range("cpu", T0, T0) == [(T0, 0.0, 29.0, 435.0, 30, 29.0)]
+
+
+def test_query_uses_raw_points_while_covered():
+    store = _rollup_store()
+    # O buffer bruto guarda os últimos 10 minutos
+    assert store.query("cpu", T0 + 1200, T0 + 1320, 60) == [
+        (T0 + 1200, 20.0), (T0 + 1260, 21.0), (T0 + 1320, 22.0)
+    ]
+    assert store.query("cpu", T0 + 1200, T0 + 1740, 300, "max") == [
+        (T0 + 1200, 24.0), (T0 + 1500, 29.0)
+    ]
+
+
+def test_query_falls_back_to_rollups():
+    store = _rollup_store()
+    # Início fora do buffer bruto: o nível de 5min responde
+    assert store.query("cpu", T0, T0 + 1740, 300) == [
+        (T0 + n * 300, n * 5 + 2.0) for n in range(6)
+    ]
+    # Passo maior que o nível: reagrupado a partir dele
+    assert store.query("cpu", T0, T0 + 1740, 900, "min") == [(T0, 0.0), (T0 + 900, 15.0)]
+    assert store.query("cpu", T0, T0 + 1740, 3600, "last") == [(T0, 29.0)]
+    assert store.covers(T0) and not store.covers(T0 - 3600)
+
+
+def test_series_without_values_left_are_dropped():
+    store = _store(capacity=3)
+    store.begin_tick(T0)
+    store.record("docker.container.old.cpu_percent", 5.0)
+    store.record("cpu", 1.0)
+    for n in range(1, 3):
+        store.begin_tick(T0 + n * 60)
+        store.record("cpu", 1.0)
+    assert "docker.container.old.cpu_percent" in store
+
+    # O único valor sai do anel: a série (e a coluna pré-alocada) deixa de existir
+    store.begin_tick(T0 + 180)
+    store.record("cpu", 1.0)
+    assert "docker.container.old.cpu_percent" not in store
+    assert store.names() == ["cpu"]
+
+
+def test_rollup_series_without_buckets_left_are_dropped():
+    store = MetricsStore(capacity=2, resolution=60, rollup_tiers=((300, 2),))
+    tier = store.tiers[0]
+    store.begin_tick(T0)
+    store.record("docker.container.old.cpu_percent", 5.0)
+    store.begin_tick(T0 + 300)
+    store.record("cpu", 1.0)
+    assert "docker.container.old.cpu_percent" in tier.series
+
+    store.begin_tick(T0 + 600)
+    store.record("cpu", 1.0)
+    assert list(tier.series) == ["cpu"]
+    assert tier.range("docker.container.old.cpu_percent", 0, T0 + 600) == []
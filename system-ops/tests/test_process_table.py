@@ -0,0 +1,74 @@
+"""
+NetPilot System Operations - Tabela de processos
+CPU pela diferença de cpu_times entre varreduras e top-N
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils import process_table
+from utils.process_table import ProcessTable
+
+
+def fake_process(pid, cpu_seconds, rss, create_time=100.0, name=None):
+    return SimpleNamespace(info={
+        "pid": pid, "ppid": 1, "name": name or f"proc{pid}", "cmdline": [f"/bin/proc{pid}", "--run"],
+        "cpu_times": SimpleNamespace(user=cpu_seconds, system=0.0),
+        "memory_info": SimpleNamespace(rss=rss), "create_time": create_time,
+    })
+
+
+@pytest.fixture
+def fake_proc(monkeypatch):
+    """process_iter devolve a varredura configurada; o relógio avança 1s por leitura"""
+    state = {"processes": [], "clock": 0.0}
+
+    def monotonic():
+        state["clock"] += 1.0
+        return state["clock"]
+
+    monkeypatch.setattr(process_table.psutil, "process_iter", lambda attrs: iter(state["processes"]))
+    monkeypatch.setattr(process_table.psutil, "virtual_memory", lambda: SimpleNamespace(total=1000))
+    monkeypatch.setattr(process_table.time, "monotonic", monotonic)
+    monkeypatch.setattr(ProcessTable, "_read_container_id", staticmethod(lambda pid: None))
+    return state
+
+
+def test_cpu_is_delta_between_scans(fake_proc):
+    table = ProcessTable(max_age=5)
+    fake_proc["processes"] = [fake_process(10, 1.0, 100), fake_process(20, 5.0, 300)]
+    first = table.scan()
+    # Primeira varredura não tem amostra anterior
+    assert [p.cpu_percent for p in first.processes.values()] == [0.0, 0.0]
+    assert first.get(20).memory_percent == 30.0
+    assert first.get(10).command == "/bin/proc10 --run"
+
+    # Relógio: pid 10 lido em t=2 e t=6, pid 20 em t=3 e t=7 (4s entre leituras)
+    fake_proc["processes"] = [
+        fake_process(10, 3.0, 100),
+        fake_process(20, 5.4, 300),
+        # Processo novo: sem amostra anterior
+        fake_process(30, 9.0, 50),
+    ]
+    second = table.scan()
+    assert second.get(10).cpu_percent == 50.0
+    assert second.get(20).cpu_percent == 10.0
+    assert second.get(30).cpu_percent == 0.0
+    assert table.scan_count == 2
+
+    # PID reaproveitado (outro create_time): a amostra antiga é descartada
+    fake_proc["processes"] = [fake_process(10, 3.0, 100, create_time=200.0)]
+    assert table.scan().get(10).cpu_percent == 0.0
+
+
+def test_top_orders_by_cpu_and_memory(fake_proc):
+    table = ProcessTable(max_age=5)
+    fake_proc["processes"] = [fake_process(pid, 0.0, pid * 10) for pid in (1, 2, 3, 4)]
+    table.scan()
+    fake_proc["processes"] = [fake_process(pid, cpu, pid * 10) for pid, cpu in ((1, 2.0), (2, 0.5), (3, 4.0), (4, 1.0))]
+    snapshot = table.scan()
+
+    assert [p.pid for p in snapshot.top(3)] == [3, 1, 4]
+    assert [p.pid for p in snapshot.top(2, key="memory")] == [4, 3]
+    assert [p.pid for p in snapshot.top(10, predicate=lambda p: p.cpu_percent < 30)] == [4, 2]
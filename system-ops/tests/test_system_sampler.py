@@ -0,0 +1,65 @@
+"""
+NetPilot System Operations - Amostrador de sistema
+Percentuais por diferença de cpu_times e espera pela próxima amostra
+"""
+
+import asyncio
+from collections import namedtuple
+
+from services.system_sampler import SystemSampler, _busy_percent, _rates
+
+CpuTimes = namedtuple("CpuTimes", "user system idle iowait")
+
+
+def test_busy_percent_and_rates():
+    previous = CpuTimes(100, 50, 800, 50)
+    current = CpuTimes(160, 70, 860, 60)
+    # 80 de 150 ticks ocupados (idle e iowait contam como livres)
+    assert _busy_percent(current, previous) == 53.3
+    assert _busy_percent(previous, previous) == 0.0
+    assert _rates({"bytes": 300}, {"bytes": 100}, 2.0) == {"bytes": 100.0}
+    assert _rates({"bytes": 300}, None, 2.0) == {"bytes": 0.0}
+
+
+def test_sampler_loop_publishes_snapshots():
+    async def scenario():
+        sampler = SystemSampler(interval=0.01)
+        await sampler.start()
+        first = sampler.snapshot
+        fresh = await asyncio.wait_for(sampler.get_snapshot(fresh=True), 1)
+        await sampler.stop()
+        return first, fresh
+
+    first, fresh = asyncio.run(scenario())
+    assert fresh.timestamp > first.timestamp
+
+
+def test_failing_sample_does_not_block_fresh_waiters():
+    async def scenario():
+        sampler = SystemSampler(interval=0.01)
+        await sampler.start()
+        previous = sampler.snapshot
+
+        def broken():
+            raise OSError("/proc indisponível")
+
+        sampler._sample = broken
+        # Amostra falhou: quem aguardava recebe o snapshot anterior em vez de esperar para sempre
+        snapshot = await asyncio.wait_for(sampler.get_snapshot(fresh=True), 1)
+        await sampler.stop()
+        return previous, snapshot
+
+    previous, snapshot = asyncio.run(scenario())
+    assert snapshot is previous
+
+
+def test_stop_wakes_waiters():
+    async def scenario():
+        sampler = SystemSampler(interval=3600)
+        await sampler.start()
+        waiter = asyncio.create_task(sampler.get_snapshot(fresh=True))
+        await asyncio.sleep(0)
+        await sampler.stop()
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()) is not None
@@ -0,0 +1,176 @@
+"""
+NetPilot System Operations - Hub WebSocket
+Filas por cliente, políticas de overflow, frames delta/msgpack e o protocolo de /ws/stream
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.websocket_hub import ClientChannel, WebSocketHub, merge_patch
+
+
+class FakeWebSocket:
+    """WebSocket que só registra o que foi enviado"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, data):
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=None):
+        self.closed_with = code
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+def test_merge_patch():
+    previous = {"cpu": 10, "memory": {"used": 1, "free": 2}, "gone": True}
+    current = {"cpu": 10, "memory": {"used": 3, "free": 2}, "new": 1}
+    assert merge_patch(previous, current) == {"memory": {"used": 3}, "new": 1, "gone": None}
+
+
+def test_drop_oldest_keeps_newest():
+    async def scenario():
+        channel = ClientChannel(FakeWebSocket(), maxsize=2, policy="drop_oldest")
+        for n in range(4):
+            assert channel.push(str(n))
+        assert [entry[1] for entry in channel._queue] == ["2", "3"]
+        assert channel.dropped == 2
+        channel.close()
+    run(scenario)
+
+
+def test_coalesce_replaces_pending_frame():
+    async def scenario():
+        channel = ClientChannel(FakeWebSocket(), maxsize=10, policy="coalesce")
+        channel.push("a1", key="a")
+        channel.push("b1", key="b")
+        channel.push("a2", key="a")
+        assert [entry[1] for entry in channel._queue] == ["a2", "b1"]
+        assert channel.coalesced == 1
+        channel.close()
+    run(scenario)
+
+
+def test_disconnect_policy_closes_slow_client():
+    async def scenario():
+        websocket = FakeWebSocket()
+        channel = ClientChannel(websocket, maxsize=1, policy="disconnect")
+        assert channel.push("1")
+        assert not channel.push("2")
+        assert channel.closed
+        await asyncio.sleep(0)
+        assert websocket.closed_with == 1013
+    run(scenario)
+
+
+def test_slow_client_does_not_block_others():
+    async def scenario():
+        hub = WebSocketHub(queue_size=2, policy="drop_oldest")
+        fast, slow = FakeWebSocket(), FakeWebSocket()
+        hub.subscribe(fast, "events")
+        slow_channel = hub.subscribe(slow, "events")
+        # Escritor do cliente lento parado: a fila dele enche e descarta
+        slow_channel._writer.cancel()
+        for n in range(5):
+            assert hub.publish("events", {"n": n}) == 2
+            await asyncio.sleep(0)
+        assert [json.loads(frame)["n"] for frame in fast.sent] == [0, 1, 2, 3, 4]
+        assert slow_channel.dropped == 3
+        hub.detach(fast)
+        hub.detach(slow)
+    run(scenario)
+
+
+def test_delta_frames_follow_full_frame():
+    async def scenario():
+        hub = WebSocketHub(queue_size=10)
+        plain, deltas = FakeWebSocket(), FakeWebSocket()
+        hub.subscribe(plain, "metrics")
+        hub.subscribe(deltas, "metrics", delta=True)
+        hub.publish("metrics", {"cpu": 1, "memory": 5}, delta=True)
+        hub.publish("metrics", {"cpu": 2, "memory": 5}, delta=True)
+        await asyncio.sleep(0)
+
+        assert [json.loads(frame) for frame in plain.sent] == [
+            {"topic": "metrics", "cpu": 1, "memory": 5, "seq": 1},
+            {"topic": "metrics", "cpu": 2, "memory": 5, "seq": 2},
+        ]
+        assert [json.loads(frame) for frame in deltas.sent] == [
+            {"topic": "metrics", "cpu": 1, "memory": 5, "seq": 1},
+            {"topic": "metrics", "seq": 2, "base": 1, "delta": {"cpu": 2}},
+        ]
+        hub.detach(plain)
+        hub.detach(deltas)
+    run(scenario)
+
+
+def test_dropped_frame_resets_delta_chain():
+    async def scenario():
+        hub = WebSocketHub(queue_size=1, policy="drop_oldest")
+        websocket = FakeWebSocket()
+        channel = hub.subscribe(websocket, "metrics", delta=True)
+        channel._writer.cancel()
+        hub.publish("metrics", {"cpu": 1}, delta=True)
+        # Descarta o frame completo: o seguinte não pode ser delta
+        hub.publish("metrics", {"cpu": 2}, delta=True)
+        assert json.loads(channel._queue[0][1]) == {"topic": "metrics", "cpu": 2, "seq": 2}
+        hub.detach(websocket)
+    run(scenario)
+
+
+def test_preserialized_message_reaches_json_and_msgpack_clients():
+    msgpack = pytest.importorskip("msgpack")
+
+    async def scenario():
+        hub = WebSocketHub(queue_size=10)
+        text, binary = FakeWebSocket(), FakeWebSocket()
+        hub.subscribe(text, "events")
+        hub.subscribe(binary, "events", encoding="msgpack")
+        assert hub.publish("events", '{"type":"ping"}') == 2
+        await asyncio.sleep(0)
+        assert text.sent == ['{"type":"ping"}']
+        assert msgpack.unpackb(binary.sent[0]) == {"type": "ping"}
+        hub.detach(text)
+        hub.detach(binary)
+    run(scenario)
+
+
+def test_preserialized_message_with_delta_client():
+    async def scenario():
+        hub = WebSocketHub(queue_size=10)
+        websocket = FakeWebSocket()
+        hub.subscribe(websocket, "events", delta=True)
+        assert hub.publish("events", '{"type":"ping"}', delta=True) == 1
+        await asyncio.sleep(0)
+        assert websocket.sent == ['{"type":"ping"}']
+        hub.detach(websocket)
+    run(scenario)
+
+
+def test_websocket_stream_protocol():
+    """Testar protocolo do WebSocket multiplexado"""
+    with TestClient(app).websocket_connect("/ws/stream") as websocket:
+        assert websocket.receive_json()["type"] == "hello"
+        websocket.send_text('{"action": "subscribe", "topic": "invalid topic"}')
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_text('{"action": "ping"}')
+        assert websocket.receive_json()["type"] == "pong"
+        # since_seq inválido é um erro do comando, não derruba a conexão
+        websocket.send_text('{"action": "subscribe", "topic": "logs:c1", "since_seq": {}}')
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_text('{"action": "subscribe", "topic": 5}')
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_text('{"action": "ping"}')
+        assert websocket.receive_json()["type"] == "pong"
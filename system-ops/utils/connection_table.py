@@ -0,0 +1,217 @@
+"""
+NetPilot System Operations - Connection Table
+Tabela de conexões TCP lida de /proc/net/tcp{,6} numa única passada, com
+agregação por estado, IP remoto e porta local e taxas calculadas pela
+diferença entre amostras
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import sys
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Códigos de estado do kernel (include/net/tcp_states.h)
+TCP_STATES = {
+    "01": "ESTABLISHED",
+    "02": "SYN_SENT",
+    "03": "SYN_RECV",
+    "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2",
+    "06": "TIME_WAIT",
+    "07": "CLOSE",
+    "08": "CLOSE_WAIT",
+    "09": "LAST_ACK",
+    "0A": "LISTEN",
+    "0B": "CLOSING",
+    "0C": "NEW_SYN_RECV",
+}
+
+STATE_LISTEN = "0A"
+STATE_ESTABLISHED = "01"
+
+# ::ffff:0:0/96 como aparece no /proc (terceira palavra na ordem do host)
+_V4_MAPPED_PREFIX = "0000000000000000" + ("FFFF0000" if sys.byteorder == "little" else "0000FFFF")
+
+
+class ConnectionSnapshot(NamedTuple):
+    """Resultado de uma leitura da tabela de conexões"""
+    timestamp: float
+    total: int
+    established: int
+    by_state: Dict[str, int]
+    # Conexões de entrada (porta local em LISTEN), por IP remoto e por porta local
+    by_remote_ip: Dict[str, int]
+    by_local_port: Dict[int, int]
+    listening_ports: List[int]
+    # Identidade de cada conexão de entrada: (porta local, "IP:porta" remotos), em hexa do /proc
+    inbound: FrozenSet[Tuple[str, str]]
+    connections_per_second: float
+    bytes_in: int
+    bytes_out: int
+    bytes_in_per_second: float
+    bytes_out_per_second: float
+    scan_seconds: float
+
+    def top_remote_ips(self, n: int = 10) -> List[Tuple[str, int]]:
+        return heapq.nlargest(n, self.by_remote_ip.items(), key=lambda item: item[1])
+
+    def top_local_ports(self, n: int = 10) -> List[Tuple[int, int]]:
+        return heapq.nlargest(n, self.by_local_port.items(), key=lambda item: item[1])
+
+
+class ConnectionTable:
+    """Mantém a última leitura de /proc/net/tcp{,6}, compartilhada entre chamadas"""
+
+    def __init__(self, max_age: Optional[float] = None, proc_root: str = "/proc"):
+        self.max_age = max_age or float(os.getenv("CONNECTION_SCAN_INTERVAL", 1))
+        self.proc_root = proc_root
+        self.snapshot: Optional[ConnectionSnapshot] = None
+        self.scan_count = 0
+
+        # Endereços em hexa se repetem muito (mesmo cliente, mesma porta): decodificar uma vez
+        self._address_cache: Dict[str, str] = {}
+        self._port_cache: Dict[str, int] = {}
+        # (instante, aberturas TCP acumuladas, bytes recebidos, bytes enviados)
+        self._previous_counters: Optional[Tuple[float, int, int, int]] = None
+        self._scan_task: Optional[asyncio.Future] = None
+
+    async def get_snapshot(self, max_age: Optional[float] = None) -> ConnectionSnapshot:
+        """Retorna a leitura atual, refazendo-a se for mais antiga que max_age"""
+        max_age = self.max_age if max_age is None else max_age
+        if self.snapshot and time.monotonic() - self.snapshot.timestamp < max_age:
+            return self.snapshot
+
+        # Chamadas simultâneas aguardam a mesma leitura
+        if self._scan_task is None or self._scan_task.done():
+            self._scan_task = asyncio.ensure_future(asyncio.to_thread(self.scan))
+        return await asyncio.shield(self._scan_task)
+
+    def scan(self) -> ConnectionSnapshot:
+        """Lê as tabelas TCP uma vez (bloqueante)"""
+        start = time.monotonic()
+        states: Dict[str, int] = {}
+        listening: set = set()
+        # (porta local em hexa, "endereço:porta" remotos em hexa) das conexões não-LISTEN
+        peers: List[Tuple[str, str]] = []
+
+        for name in ("tcp", "tcp6"):
+            try:
+                with open(os.path.join(self.proc_root, "net", name)) as f:
+                    next(f, None)
+                    for line in f:
+                        # sl local rem st ... (só as quatro primeiras colunas interessam)
+                        fields = line.split(None, 4)
+                        if len(fields) < 4:
+                            continue
+                        state = fields[3]
+                        states[state] = states.get(state, 0) + 1
+                        local_port = fields[1][-4:]
+                        if state == STATE_LISTEN:
+                            listening.add(local_port)
+                        else:
+                            peers.append((local_port, fields[2]))
+            except OSError:
+                # tcp6 ausente com IPv6 desativado
+                continue
+
+        # Porta local em LISTEN: conexão de entrada (portas efêmeras de saída ficam de fora)
+        inbound = frozenset(peer for peer in peers if peer[0] in listening)
+
+        by_remote_ip: Dict[str, int] = {}
+        by_local_port: Dict[str, int] = {}
+        decode = self._decode_address
+        # Contagem em C primeiro: o laço em Python passa só pelos pares distintos
+        for (local_port, remote), count in Counter((port, remote[:-5]) for port, remote in inbound).items():
+            by_local_port[local_port] = by_local_port.get(local_port, 0) + count
+            address = decode(remote)
+            by_remote_ip[address] = by_remote_ip.get(address, 0) + count
+
+        if len(self._address_cache) > 65536:
+            self._address_cache.clear()
+
+        opens = self._read_tcp_opens()
+        net_io = psutil.net_io_counters()
+        bytes_in = net_io.bytes_recv if net_io else 0
+        bytes_out = net_io.bytes_sent if net_io else 0
+
+        connections_per_second = bytes_in_rate = bytes_out_rate = 0.0
+        previous = self._previous_counters
+        if previous and start > previous[0]:
+            elapsed = start - previous[0]
+            connections_per_second = round(max(opens - previous[1], 0) / elapsed, 2)
+            bytes_in_rate = round(max(bytes_in - previous[2], 0) / elapsed, 2)
+            bytes_out_rate = round(max(bytes_out - previous[3], 0) / elapsed, 2)
+        self._previous_counters = (start, opens, bytes_in, bytes_out)
+
+        port = self._decode_port
+        self.snapshot = ConnectionSnapshot(
+            timestamp=start,
+            total=sum(count for state, count in states.items() if state != STATE_LISTEN),
+            established=states.get(STATE_ESTABLISHED, 0),
+            by_state={TCP_STATES.get(state, state): count for state, count in states.items()},
+            by_remote_ip=by_remote_ip,
+            by_local_port={port(key): count for key, count in by_local_port.items()},
+            listening_ports=sorted({port(key) for key in listening}),
+            inbound=inbound,
+            connections_per_second=connections_per_second,
+            bytes_in=bytes_in,
+            bytes_out=bytes_out,
+            bytes_in_per_second=bytes_in_rate,
+            bytes_out_per_second=bytes_out_rate,
+            scan_seconds=round(time.monotonic() - start, 4)
+        )
+        self.scan_count += 1
+        return self.snapshot
+
+    def _read_tcp_opens(self) -> int:
+        """ActiveOpens + PassiveOpens do /proc/net/snmp (conta também conexões que já fecharam)"""
+        try:
+            with open(os.path.join(self.proc_root, "net", "snmp")) as f:
+                tcp_lines = [line.split() for line in f if line.startswith("Tcp:")]
+        except OSError:
+            return 0
+        if len(tcp_lines) < 2:
+            return 0
+        counters = dict(zip(tcp_lines[0][1:], tcp_lines[1][1:]))
+        return int(counters.get("ActiveOpens", 0)) + int(counters.get("PassiveOpens", 0))
+
+    def _decode_address(self, value: str) -> str:
+        """Endereço em hexa do /proc (palavras de 32 bits na ordem do host) para texto"""
+        address = self._address_cache.get(value)
+        if address is not None:
+            return address
+
+        if len(value) == 32 and value.startswith(_V4_MAPPED_PREFIX):
+            # ::ffff:a.b.c.d conta junto com o mesmo IPv4
+            address = self._decode_address(value[24:])
+        else:
+            raw = bytes.fromhex(value)
+            if sys.byteorder == "little":
+                raw = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+            address = socket.inet_ntop(socket.AF_INET if len(raw) == 4 else socket.AF_INET6, raw)
+        self._address_cache[value] = address
+        return address
+
+    def decode_peer(self, peer: Tuple[str, str]) -> Tuple[str, int]:
+        """(IP remoto, porta local) de uma entrada de ConnectionSnapshot.inbound"""
+        local_port, remote = peer
+        return self._decode_address(remote[:-5]), self._decode_port(local_port)
+
+    def _decode_port(self, value: str) -> int:
+        port = self._port_cache.get(value)
+        if port is None:
+            port = self._port_cache[value] = int(value, 16)
+        return port
+
+
+# Instância global compartilhada pelos coletores
+connection_table = ConnectionTable()
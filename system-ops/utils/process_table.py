@@ -0,0 +1,177 @@
+"""
+NetPilot System Operations - Process Table
+Tabela de processos compartilhada: uma única varredura do /proc por intervalo,
+com CPU calculada pela diferença de cpu_times entre varreduras
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# ID do container no caminho do cgroup (systemd e cgroupfs, v1 e v2)
+CONTAINER_CGROUP_PATTERN = re.compile(r"(?:docker-|/docker/)([0-9a-f]{64})")
+
+PROCESS_ATTRS = ['pid', 'ppid', 'name', 'cmdline', 'cpu_times', 'memory_info', 'create_time']
+
+
+class ProcessInfo(NamedTuple):
+    """Processo em uma varredura"""
+    pid: int
+    ppid: int
+    name: str
+    command: str
+    cpu_percent: float
+    memory_percent: float
+    rss: int
+    container_id: Optional[str]
+
+
+class ProcessSnapshot:
+    """Resultado de uma varredura, indexado por PID, nome e container"""
+
+    def __init__(self, processes: Dict[int, ProcessInfo], timestamp: float):
+        self.timestamp = timestamp
+        self.processes = processes
+        self.by_name: Dict[str, List[ProcessInfo]] = {}
+        self.by_container: Dict[str, List[ProcessInfo]] = {}
+
+        for process in processes.values():
+            self.by_name.setdefault(process.name.lower(), []).append(process)
+            if process.container_id:
+                self.by_container.setdefault(process.container_id, []).append(process)
+
+    def __len__(self) -> int:
+        return len(self.processes)
+
+    def get(self, pid: int) -> Optional[ProcessInfo]:
+        return self.processes.get(pid)
+
+    def find_by_name(self, name: str, exact: bool = False) -> List[ProcessInfo]:
+        """Processos cujo nome é (ou contém) o informado"""
+        name = name.lower()
+        if exact:
+            return list(self.by_name.get(name, []))
+        return [p for key, group in self.by_name.items() if name in key for p in group]
+
+    def find_by_command(self, pattern: str) -> List[ProcessInfo]:
+        """Processos cuja linha de comando casa com o padrão (equivalente a pgrep -f)"""
+        try:
+            regex = re.compile(pattern)
+        except re.error:
+            regex = re.compile(re.escape(pattern))
+        return [p for p in self.processes.values() if regex.search(p.command or p.name)]
+
+    def for_container(self, container_id: str) -> List[ProcessInfo]:
+        """Processos de um container (aceita ID curto)"""
+        if container_id in self.by_container:
+            return list(self.by_container[container_id])
+        return [p for cid, group in self.by_container.items() if cid.startswith(container_id) for p in group]
+
+    def top(self, n: int = 10, key: str = "cpu",
+            predicate: Optional[Callable[[ProcessInfo], bool]] = None) -> List[ProcessInfo]:
+        """Top-N por CPU ou memória (heap, sem ordenar a tabela inteira)"""
+        field = "cpu_percent" if key == "cpu" else "memory_percent"
+        candidates = self.processes.values()
+        if predicate:
+            candidates = filter(predicate, candidates)
+        return heapq.nlargest(n, candidates, key=lambda p: getattr(p, field))
+
+
+class ProcessTable:
+    """Mantém a última varredura do /proc, compartilhada entre os coletores"""
+
+    def __init__(self, max_age: Optional[float] = None):
+        self.max_age = max_age or float(os.getenv("PROCESS_SCAN_INTERVAL", 5))
+        self.snapshot: Optional[ProcessSnapshot] = None
+        self.scan_count = 0
+        self.last_scan_seconds = 0.0
+
+        # pid -> (create_time, cpu acumulada em segundos, instante da leitura)
+        self._cpu_samples: Dict[int, Tuple[float, float, float]] = {}
+        self._container_cache: Dict[Tuple[int, float], Optional[str]] = {}
+        self._scan_task: Optional[asyncio.Future] = None
+
+    async def get_snapshot(self, max_age: Optional[float] = None) -> ProcessSnapshot:
+        """Retorna a varredura atual, refazendo-a se for mais antiga que max_age"""
+        max_age = self.max_age if max_age is None else max_age
+        if self.snapshot and time.monotonic() - self.snapshot.timestamp < max_age:
+            return self.snapshot
+
+        # Chamadas simultâneas aguardam a mesma varredura
+        if self._scan_task is None or self._scan_task.done():
+            self._scan_task = asyncio.ensure_future(asyncio.to_thread(self.scan))
+        return await asyncio.shield(self._scan_task)
+
+    def scan(self) -> ProcessSnapshot:
+        """Varre o /proc uma vez (bloqueante)"""
+        start = time.monotonic()
+        memory_total = psutil.virtual_memory().total
+        processes: Dict[int, ProcessInfo] = {}
+        cpu_samples: Dict[int, Tuple[float, float, float]] = {}
+        container_cache: Dict[Tuple[int, float], Optional[str]] = {}
+
+        for proc in psutil.process_iter(PROCESS_ATTRS):
+            info = proc.info
+            pid = info['pid']
+            create_time = info['create_time'] or 0.0
+            now = time.monotonic()
+
+            cpu_percent = 0.0
+            cpu_times = info['cpu_times']
+            if cpu_times is not None:
+                cpu_total = cpu_times.user + cpu_times.system
+                previous = self._cpu_samples.get(pid)
+                # PID reaproveitado tem outro create_time: descartar a amostra antiga
+                if previous and previous[0] == create_time and now > previous[2]:
+                    cpu_percent = round(max(cpu_total - previous[1], 0) / (now - previous[2]) * 100, 1)
+                cpu_samples[pid] = (create_time, cpu_total, now)
+
+            memory_info = info['memory_info']
+            rss = memory_info.rss if memory_info else 0
+
+            cache_key = (pid, create_time)
+            if cache_key in self._container_cache:
+                container_id = self._container_cache[cache_key]
+            else:
+                container_id = self._read_container_id(pid)
+            container_cache[cache_key] = container_id
+
+            processes[pid] = ProcessInfo(
+                pid=pid,
+                ppid=info['ppid'] or 0,
+                name=info['name'] or "",
+                command=" ".join(info['cmdline'] or []),
+                cpu_percent=cpu_percent,
+                memory_percent=round(rss / memory_total * 100, 2) if memory_total else 0.0,
+                rss=rss,
+                container_id=container_id
+            )
+
+        self._cpu_samples = cpu_samples
+        self._container_cache = container_cache
+        self.snapshot = ProcessSnapshot(processes, start)
+        self.scan_count += 1
+        self.last_scan_seconds = time.monotonic() - start
+        return self.snapshot
+
+    @staticmethod
+    def _read_container_id(pid: int) -> Optional[str]:
+        """ID do container a partir do cgroup do processo"""
+        try:
+            with open(f"/proc/{pid}/cgroup") as f:
+                match = CONTAINER_CGROUP_PATTERN.search(f.read())
+        except OSError:
+            return None
+        return match.group(1) if match else None
+
+
+# Instância global compartilhada pelos coletores
+process_table = ProcessTable()
@@ -10,6 +10,8 @@ import logging
 from typing import List, Dict, Any, Optional, NamedTuple
 from pathlib import Path
 
+from utils.process_table import process_table
+
 logger = logging.getLogger(__name__)
 
 
@@ -314,30 +316,19 @@ class SystemUtils:
     async def find_process_by_name(self, process_name: str) -> List[Dict[str, Any]]:
         """Encontrar processos por nome"""
         try:
-            result = await self.run_command(["pgrep", "-f", process_name])
-
-            if result.returncode != 0:
-                return []
-
-            pids = [int(pid.strip()) for pid in result.stdout.split('\n') if pid.strip()]
-
-            processes = []
-            for pid in pids:
-                try:
-                    # Obter informações do processo
-                    cmd_result = await self.run_command(["ps", "-p", str(pid), "-o", "pid,ppid,cmd", "--no-headers"])
-                    if cmd_result.returncode == 0 and cmd_result.stdout.strip():
-                        parts = cmd_result.stdout.strip().split(None, 2)
-                        if len(parts) >= 3:
-                            processes.append({
-                                "pid": int(parts[0]),
-                                "ppid": int(parts[1]),
-                                "command": parts[2]
-                            })
-                except:
-                    continue
-
-            return processes
+            # Busca na tabela de processos compartilhada (equivalente a pgrep -f)
+            snapshot = await process_table.get_snapshot()
+            own_pid = os.getpid()
+
+            return [
+                {
+                    "pid": proc.pid,
+                    "ppid": proc.ppid,
+                    "command": proc.command or proc.name
+                }
+                for proc in snapshot.find_by_command(process_name)
+                if proc.pid != own_pid
+            ]
 
         except Exception as e:
             logger.error(f"Erro ao encontrar processo {process_name}: {e}")